@@ -0,0 +1,362 @@
+# analysis_graph.py
+
+from array import array
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class Rel(IntEnum):
+    """Types de relations du graphe d'analyse (stockés sur 16 bits dans la colonne rel)."""
+    SUCC = 0
+    POS = 1
+    DISAMBIGUATE = 2
+    REFERENCE = 3
+    AGENT = 4
+    AGENT_INV = 5
+    PATIENT = 6
+    PATIENT_INV = 7
+    CARAC = 8
+    LIEU = 9
+
+    @property
+    def label(self) -> str:
+        return _LABELS[self]
+
+
+_LABELS: List[str] = [
+    "r_succ", "r_pos:", "r_disambiguate", "r_reference",
+    "r_agent", "r_agent-1", "r_patient", "r_patient-1", "r_carac", "r_lieu",
+]
+_REL_IDS: Dict[str, int] = {label: i for i, label in enumerate(_LABELS)}
+
+
+def rel_id(label: str) -> int:
+    """
+    Identifiant d'une relation. Les relations inconnues de Rel (ex. produites par un
+    fichier de règles personnalisé) reçoivent un nouvel identifiant au premier usage.
+    """
+    rid = _REL_IDS.get(label)
+    if rid is None:
+        rid = _REL_IDS[label] = len(_LABELS)
+        _LABELS.append(label)
+    return rid
+
+
+def _rel_filter(label: Optional[str]) -> Optional[Tuple[int, ...]]:
+    """
+    Filtre de relation pour les lectures : None pour toutes, () pour un label jamais
+    enregistré (aucune arête ne peut l'avoir) ; une recherche n'enregistre pas de label.
+    """
+    if label is None:
+        return None
+    rid = _REL_IDS.get(label)
+    return () if rid is None else (rid,)
+
+
+def rel_label(rid: int) -> str:
+    return _LABELS[rid]
+
+
+class AnalysisGraph:
+    """
+    Multigraphe orienté et typé, stocké en colonnes.
+
+    - Les nœuds sont des entiers ; names[i] est la clé d'origine ("chat#2", "Nom:"...)
+      et tokens[i] le token porté par le nœud (None pour les nœuds POS ou sens).
+    - Chaque arête occupe une case dans quatre tableaux compacts : src, dst, rel, weight.
+      Deux arêtes de types différents entre les mêmes nœuds coexistent (r_agent et
+      r_agent-1 ne s'écrasent plus) ; une même arête (src, dst, rel) n'est stockée qu'une fois.
+    - L'adjacence est en CSR (lignes triées par nœud, indices d'arêtes), reconstruite
+      par doublement ; les arêtes ajoutées depuis sont dans une petite table d'attente.
+      csr(label) donne la CSR d'une seule relation, utilisable telle quelle (ou avec numpy)
+      pour des jointures vectorisées.
+    - Les suppressions (remove_node, remove_edge, pour la ré-analyse incrémentale) marquent
+      les nœuds et arêtes comme supprimés ; les tableaux sont compactés quand les cases
+      supprimées dépassent les cases vivantes.
+    """
+
+    MIN_PENDING = 1024  # arêtes en attente avant la première reconstruction de la CSR
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.tokens: List[Optional[str]] = []
+        self.src = array("i")
+        self.dst = array("i")
+        self.rel = array("H")
+        self.weight = array("f")
+        # CSR des arêtes [0, _built) dans les deux sens : (indptr, ids d'arêtes)
+        self._built = 0
+        self._out = (array("i", [0]), array("i"))
+        self._in = (array("i", [0]), array("i"))
+        # Arêtes plus récentes : nœud -> ids d'arêtes
+        self._out_pending: Dict[int, List[int]] = {}
+        self._in_pending: Dict[int, List[int]] = {}
+        self._rel_csr: Dict[Tuple[int, bool], tuple] = {}
+        # Nœuds et arêtes supprimés (leurs cases restent jusqu'au prochain compactage)
+        self._dead_nodes = set()
+        self._dead_edges = set()
+
+    # Nœuds
+
+    def add_node(self, name: str, token: Optional[str] = None) -> int:
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.tokens.append(token)
+        elif token is not None:
+            self.tokens[i] = token
+        return i
+
+    def has_node(self, name: str) -> bool:
+        return name in self.ids
+
+    __contains__ = has_node
+
+    def token(self, name: str) -> str:
+        """Token porté par le nœud (le nœud lui-même s'il n'en porte pas)."""
+        tk = self.tokens[self.ids[name]]
+        return name if tk is None else tk
+
+    def number_of_nodes(self) -> int:
+        return len(self.names) - len(self._dead_nodes)
+
+    def nodes(self, data=False, default=None) -> Iterator:
+        """Comme networkx : noms, ou (nom, token) avec data="token", ou (nom, attributs) avec data=True."""
+        names, tokens = self.names, self.tokens
+        if self._dead_nodes:
+            alive = [i for i in range(len(names)) if i not in self._dead_nodes]
+            names, tokens = [names[i] for i in alive], [tokens[i] for i in alive]
+        if not data:
+            return iter(names)
+        if data == "token":
+            return ((name, default if tk is None else tk) for name, tk in zip(names, tokens))
+        if data is True:
+            return ((name, {} if tk is None else {"token": tk}) for name, tk in zip(names, tokens))
+        return ((name, default) for name in names)
+
+    # Arêtes
+
+    def add_edge(self, u: str, v: str, label: str = "", weight: float = 1.0) -> int:
+        """Ajoute l'arête u -label-> v (les nœuds sont créés au besoin) ; renvoie son id."""
+        s, d, r = self.add_node(u), self.add_node(v), rel_id(label)
+        e = self._find_edge(s, d, r)
+        if e >= 0:
+            self.weight[e] = weight
+            return e
+        e = len(self.src)
+        self.src.append(s)
+        self.dst.append(d)
+        self.rel.append(r)
+        self.weight.append(weight)
+        self._out_pending.setdefault(s, []).append(e)
+        self._in_pending.setdefault(d, []).append(e)
+        if e + 1 - self._built > max(self.MIN_PENDING, self._built):
+            self._rebuild()
+        return e
+
+    def has_edge(self, u: str, v: str, label: Optional[str] = None) -> bool:
+        s, d = self.ids.get(u), self.ids.get(v)
+        if s is None or d is None:
+            return False
+        rels = _rel_filter(label)
+        return any(self.dst[e] == d for e in self._edge_ids(s, self._out, self._out_pending, rels))
+
+    def number_of_edges(self) -> int:
+        return len(self.src) - len(self._dead_edges)
+
+    def edges(self, data=False) -> Iterator:
+        """(u, v) ou (u, v, {"label", "weight"}) avec data=True, dans l'ordre d'ajout."""
+        names, dead = self.names, self._dead_edges
+        for e in range(len(self.src)):
+            if dead and e in dead:
+                continue
+            u, v = names[self.src[e]], names[self.dst[e]]
+            if data:
+                yield u, v, {"label": _LABELS[self.rel[e]], "weight": self.weight[e]}
+            else:
+                yield u, v
+
+    def successors(self, name: str, label: Optional[str] = None) -> List[str]:
+        return self._adjacent(name, label, self._out, self._out_pending, self.dst)
+
+    def predecessors(self, name: str, label: Optional[str] = None) -> List[str]:
+        return self._adjacent(name, label, self._in, self._in_pending, self.src)
+
+    def neighbors(self, name: str, label: Optional[str] = None) -> List[str]:
+        """Voisins dans les deux sens (sans doublon), ex. pour une distance le long de r_succ."""
+        return list(dict.fromkeys(self.successors(name, label) + self.predecessors(name, label)))
+
+    def _adjacent(self, name, label, csr, pending, other) -> List[str]:
+        i = self.ids.get(name)
+        if i is None:
+            return []
+        rels = _rel_filter(label)
+        return [self.names[other[e]] for e in self._edge_ids(i, csr, pending, rels)]
+
+    def _edge_ids(self, i: int, csr, pending, rels=None) -> List[int]:
+        indptr, eids = csr
+        found = list(eids[indptr[i]:indptr[i + 1]]) if i + 1 < len(indptr) else []
+        found.extend(pending.get(i, ()))
+        if self._dead_edges:
+            found = [e for e in found if e not in self._dead_edges]
+        if rels is not None:
+            found = [e for e in found if self.rel[e] in rels]
+        return found
+
+    def _find_edge(self, s: int, d: int, r: int) -> int:
+        for e in self._edge_ids(s, self._out, self._out_pending):
+            if self.dst[e] == d and self.rel[e] == r:
+                return e
+        return -1
+
+    # Suppressions
+
+    def remove_edge(self, u: str, v: str, label: Optional[str] = None) -> int:
+        """Supprime les arêtes u -> v (de ce label seulement si donné) ; renvoie leur nombre."""
+        s, d = self.ids.get(u), self.ids.get(v)
+        if s is None or d is None:
+            return 0
+        rels = _rel_filter(label)
+        removed = [e for e in self._edge_ids(s, self._out, self._out_pending, rels) if self.dst[e] == d]
+        self._dead_edges.update(removed)
+        self._maybe_compact()
+        return len(removed)
+
+    def remove_node(self, name: str) -> bool:
+        """Supprime un nœud et toutes ses arêtes ; renvoie False s'il n'existait pas."""
+        i = self.ids.pop(name, None)
+        if i is None:
+            return False
+        self._dead_edges.update(self._edge_ids(i, self._out, self._out_pending))
+        self._dead_edges.update(self._edge_ids(i, self._in, self._in_pending))
+        self._dead_nodes.add(i)
+        self._maybe_compact()
+        return True
+
+    def is_isolated(self, name: str) -> bool:
+        """Vrai si le nœud n'a plus aucune arête ; s'arrête à la première trouvée (nœuds POS très reliés)."""
+        i = self.ids.get(name)
+        if i is None:
+            return True
+        dead = self._dead_edges
+        for (indptr, eids), pending in ((self._out, self._out_pending), (self._in, self._in_pending)):
+            if i + 1 < len(indptr) and any(e not in dead for e in eids[indptr[i]:indptr[i + 1]]):
+                return False
+            if any(e not in dead for e in pending.get(i, ())):
+                return False
+        return True
+
+    def _maybe_compact(self):
+        dead = len(self._dead_edges) + len(self._dead_nodes)
+        if dead > max(self.MIN_PENDING, len(self.src) + len(self.names) - dead):
+            self._compact()
+
+    def _compact(self):
+        """Retire les cases supprimées : nœuds et arêtes sont renumérotés, la CSR reconstruite."""
+        dead_nodes, dead_edges = self._dead_nodes, self._dead_edges
+        new_id = array("i", [-1]) * len(self.names)
+        names, tokens = [], []
+        for i, (name, tk) in enumerate(zip(self.names, self.tokens)):
+            if i not in dead_nodes:
+                new_id[i] = len(names)
+                names.append(name)
+                tokens.append(tk)
+        alive = [e for e in range(len(self.src)) if e not in dead_edges]
+        self.src = array("i", (new_id[self.src[e]] for e in alive))
+        self.dst = array("i", (new_id[self.dst[e]] for e in alive))
+        self.rel = array("H", (self.rel[e] for e in alive))
+        self.weight = array("f", (self.weight[e] for e in alive))
+        self.names, self.tokens = names, tokens
+        self.ids = {name: i for i, name in enumerate(names)}
+        self._dead_nodes, self._dead_edges = set(), set()
+        self._rel_csr.clear()
+        self._rebuild()
+
+    # CSR
+
+    @staticmethod
+    def _counting_sort(keys: array, n_nodes: int, edge_ids) -> Tuple[array, array]:
+        indptr = array("i", [0]) * (n_nodes + 1)
+        for e in edge_ids:
+            indptr[keys[e] + 1] += 1
+        for i in range(n_nodes):
+            indptr[i + 1] += indptr[i]
+        fill = array("i", indptr)
+        order = array("i", [0]) * indptr[n_nodes]
+        for e in edge_ids:
+            k = keys[e]
+            order[fill[k]] = e
+            fill[k] += 1
+        return indptr, order
+
+    def _rebuild(self):
+        n, m = len(self.names), len(self.src)
+        self._out = self._counting_sort(self.src, n, range(m))
+        self._in = self._counting_sort(self.dst, n, range(m))
+        self._built = m
+        self._out_pending.clear()
+        self._in_pending.clear()
+
+    def csr(self, label: str, reverse: bool = False) -> Tuple[array, array]:
+        """
+        Adjacence CSR d'une relation : les voisins du nœud i sont
+        indices[indptr[i]:indptr[i + 1]] (successeurs, ou prédécesseurs avec reverse=True).
+        """
+        r = _REL_IDS.get(label)
+        if r is None:  # relation jamais enregistrée : aucune arête
+            return array("i", [0] * (len(self.names) + 1)), array("i")
+        version = (len(self.names), len(self.src), len(self._dead_edges))
+        cached = self._rel_csr.get((r, reverse))
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        keys, other = (self.dst, self.src) if reverse else (self.src, self.dst)
+        dead = self._dead_edges
+        edge_ids = [e for e in range(len(self.src)) if self.rel[e] == r and e not in dead]
+        indptr, order = self._counting_sort(keys, len(self.names), edge_ids)
+        indices = array("i", (other[e] for e in order))
+        self._rel_csr[(r, reverse)] = (version, indptr, indices)
+        return indptr, indices
+
+    # Sérialisation : les identifiants des relations hors de Rel dépendent du processus,
+    # on emporte donc leurs labels et on les renumérote au chargement.
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_rel_csr"] = {}
+        state["labels"] = list(_LABELS)
+        return state
+
+    def __setstate__(self, state):
+        labels = state.pop("labels")
+        state.setdefault("_dead_nodes", set())  # graphe sauvegardé avant les suppressions
+        state.setdefault("_dead_edges", set())
+        self.__dict__.update(state)
+        mapping = [rel_id(label) for label in labels]
+        if any(old != new for old, new in enumerate(mapping)):
+            self.rel = array("H", (mapping[r] for r in self.rel))
+
+    # Export
+
+    def to_networkx(self, multigraph: bool = True):
+        """
+        Copie networkx (pour l'affichage) : MultiDiGraph avec une arête par relation,
+        ou DiGraph où les relations parallèles sont regroupées dans un seul label.
+        """
+        import networkx as nx
+
+        g = nx.MultiDiGraph() if multigraph else nx.DiGraph()
+        for name, tk in self.nodes(data="token"):
+            if tk is None:
+                g.add_node(name)
+            else:
+                g.add_node(name, token=tk)
+        for u, v, data in self.edges(data=True):
+            if multigraph:
+                g.add_edge(u, v, key=data["label"], **data)
+            elif g.has_edge(u, v):
+                g[u][v]["label"] += ", " + data["label"]
+            else:
+                g.add_edge(u, v, **data)
+        return g
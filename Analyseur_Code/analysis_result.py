@@ -0,0 +1,60 @@
+# analysis_result.py
+
+from typing import List
+
+from analysis_graph import AnalysisGraph
+from anaphora_connector import SimpleAnaphoraLinker
+from semantic_rules import RuleEngine
+from text_tokenizer import TokenizedText
+
+
+class AnalysisResult:
+    """
+    État d'une analyse : le texte, ses tokens et le graphe qui lui est propre
+    (avec le moteur de règles et le module d'anaphores attachés à ce graphe).
+
+    En mode positionnel, chaque occurrence de token a son propre nœud "token#position",
+    ce qui évite de fusionner les "le" de deux endroits différents.
+    Le token d'origine est toujours disponible dans l'attribut de nœud "token".
+    """
+
+    def __init__(self, text: str = "", graph: AnalysisGraph = None, positional: bool = True):
+        self.text = text
+        self.g = graph if graph is not None else AnalysisGraph()
+        self.positional = positional
+        self.token_list: List[str] = []
+        self.nodes: List[str] = []  # nœud du graphe pour chaque entrée de token_list
+        self.tokenized = TokenizedText()  # positions et identifiants des tokens du texte
+        self.rules_engine = RuleEngine(self.g)
+        self.anaphora_module = SimpleAnaphoraLinker(self.g)
+
+    def node_for(self, position: int, token: str) -> str:
+        return f"{token}#{position}" if self.positional else token
+
+    def add_token_node(self, position: int, token: str) -> str:
+        node = self.node_for(position, token)
+        self.g.add_node(node, token)
+        self.rules_engine.index_token(node, token)
+        self.token_list.append(token)
+        self.nodes.append(node)
+        return node
+
+    def __getstate__(self):
+        # Le moteur de règles (plans compilés en fermetures) ne se picke pas :
+        # seuls le texte, les tokens et le graphe voyagent entre processus.
+        return {"text": self.text, "g": self.g, "positional": self.positional,
+                "token_list": self.token_list, "nodes": self.nodes, "tokenized": self.tokenized}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.rules_engine = RuleEngine(self.g)
+        for node, token in zip(self.nodes, self.token_list):
+            self.rules_engine.index_token(node, token)
+        # Index POS, r_succ et relations déjà dérivées, à partir des arêtes du graphe
+        self.rules_engine.build_index()
+        self.anaphora_module = SimpleAnaphoraLinker(self.g)
+
+    def link(self, u: str, v: str, label: str, **attrs):
+        """Ajoute une arête et tient à jour les index du moteur de règles."""
+        self.g.add_edge(u, v, label=label, **attrs)
+        self.rules_engine.index_edge(u, v, label)
@@ -1,83 +1,170 @@
 # anaphora_connector.py
 
-import networkx as nx
+from bisect import bisect_left
+from collections import deque
+from typing import List, Optional, Sequence
+
+from analysis_graph import AnalysisGraph
+
+DETERMINERS = {
+    "le", "la", "les", "l",
+    "un", "une", "des", "du",
+    "de la", "de l", "de les",
+}
+PRONOUNS = {"il", "elle", "ils", "elles", "le", "la", "les", "lui", "leur"}
 
 
 class SimpleAnaphoraLinker:
     """
     Traite la résolution anaphorique de base (pronoms -> antécédents).
+
+    La distance entre un pronom et un antécédent est la distance linéaire en tokens
+    le long de la chaîne r_succ, limitée à max_window tokens. Les antécédents candidats
+    (le token qui suit un déterminant) sont rangés par position dans un index trié :
+    chaque pronom ne regarde que ses deux voisins dans cet index.
     """
 
-    def __init__(self, nxgraph: nx.Graph):
-        self.graph = nxgraph
+    MAX_WINDOW = 30  # en tokens, environ deux phrases
+
+    def __init__(self, graph: AnalysisGraph, max_window: Optional[int] = None):
+        self.graph = graph
+        self.max_window = max_window or self.MAX_WINDOW
+        # Index des candidats : positions croissantes et nœuds correspondants
+        self._positions: List[int] = []
+        self._antecedents: List[str] = []
+        self._offset = 0  # position du premier token de la prochaine séquence
 
-    def link_pronouns(self):
+    def link_pronouns(self, sequence: Optional[Sequence[str]] = None):
         """
         Méthode principale : repère pronoms et antécédents, ajoute r_reference.
-        """
-        ants = self._locate_determiners()
-        pros = self._locate_pronouns()
-
-        for prn in pros:
-            best_ante = None
-            best_val = float("-inf")
-            for art, target in ants.items():
-                sc = self._evaluate_antecedent(target, prn)
-                if sc > best_val:
-                    best_val = sc
-                    best_ante = target
 
+        sequence : les nœuds de la chaîne r_succ dans l'ordre du texte. Les appels successifs
+        sur le même graphe se suivent, un pronom peut donc renvoyer à la séquence précédente.
+        Sans séquence, on se rabat sur un parcours en largeur borné depuis chaque pronom.
+        """
+        if sequence is None:
+            self._link_by_bfs()
+            return
+
+        pronouns = []
+        for i, node in enumerate(sequence):
+            token = self._token(node)
+            if token in PRONOUNS:
+                pronouns.append((self._offset + i, node))
+            if token in DETERMINERS and i + 1 < len(sequence):
+                self._positions.append(self._offset + i + 1)
+                self._antecedents.append(sequence[i + 1])
+        self._offset += len(sequence)
+
+        for pos, prn in pronouns:
+            best_ante = self._nearest_antecedent(pos, prn)
             if best_ante:
                 self.graph.add_edge(prn, best_ante, label="r_reference")
 
-        # Pour chaque pronom identifié :
-        # on cherche le meilleur antécédent possible en utilisant la fonction _evaluate_antecedent qui évalue la pertinence en fonction de la distance dans le graphe.
-        # si un antécédent est trouvé, une relation r_reference est ajoutée dans le graphe pour lier le pronom à son antécédent.
+        self._forget_before(self._offset - self.max_window)
 
+    def link_range(self, sequence: Sequence[str], lo: int, hi: int):
+        """
+        Relie à nouveau les pronoms de sequence[lo:hi] (ré-analyse incrémentale) : leurs liens
+        r_reference sont remplacés. Comme dans link_pronouns, seuls les candidats à moins de
+        max_window tokens comptent : on ne lit que cette partie de la séquence.
+        """
+        start, stop = max(0, lo - self.max_window - 1), min(len(sequence), hi + self.max_window)
+        positions, antecedents = [], []
+        for i in range(start, stop - 1):
+            if self._token(sequence[i]) in DETERMINERS:
+                positions.append(i + 1)
+                antecedents.append(sequence[i + 1])
+        saved = self._positions, self._antecedents
+        self._positions, self._antecedents = positions, antecedents
+        try:
+            for pos in range(lo, hi):
+                prn = sequence[pos]
+                if self._token(prn) not in PRONOUNS:
+                    continue
+                for old in self.graph.successors(prn, "r_reference"):
+                    self.graph.remove_edge(prn, old, "r_reference")
+                best_ante = self._nearest_antecedent(pos, prn)
+                if best_ante:
+                    self.graph.add_edge(prn, best_ante, label="r_reference")
+        finally:
+            self._positions, self._antecedents = saved
+
+    def _token(self, node: str) -> str:
+        return self.graph.token(node)
+
+    def _nearest_antecedent(self, pos: int, prn: str) -> Optional[str]:
+        """
+        Candidat le plus proche du pronom dans la fenêtre ; à distance égale, on préfère
+        celui qui précède le pronom.
+        """
+        k = bisect_left(self._positions, pos)
+        before = k - 1
+        after = k
+        if after < len(self._positions) and self._positions[after] == pos \
+                and self._antecedents[after] == prn:
+            after += 1  # un pronom n'est pas son propre antécédent
+
+        best, best_dist = None, self.max_window + 1
+        if before >= 0:
+            best, best_dist = before, pos - self._positions[before]
+        if after < len(self._positions) and self._positions[after] - pos < best_dist:
+            best, best_dist = after, self._positions[after] - pos
+        if best is None or best_dist > self.max_window:
+            return None
+        return self._antecedents[best]
+
+    def _forget_before(self, limit: int):
+        k = bisect_left(self._positions, limit)
+        if k:
+            del self._positions[:k]
+            del self._antecedents[:k]
+
+    def _link_by_bfs(self):
+        """
+        Sans ordre des tokens : un seul parcours en largeur par pronom, limité aux arêtes
+        r_succ et à max_window pas ; le premier candidat atteint est le plus proche.
+        """
+        candidates = set(self._locate_determiners().values())
+        for prn in self._locate_pronouns():
+            seen = {prn}
+            queue = deque([(prn, 0)])
+            best_ante = None
+            while queue and best_ante is None:
+                node, dist = queue.popleft()
+                if dist == self.max_window:
+                    continue
+                for nei in self.graph.neighbors(node, "r_succ"):
+                    if nei in seen:
+                        continue
+                    if nei in candidates:
+                        best_ante = nei
+                        break
+                    seen.add(nei)
+                    queue.append((nei, dist + 1))
+            if best_ante:
+                self.graph.add_edge(prn, best_ante, label="r_reference")
 
     def _locate_determiners(self):
-        determiner_list = {
-            "le", "la", "les", "l",
-            "un", "une", "des", "du",
-            "de la", "de l", "de les",
-        }
         found = {}
-        for node in self.graph.nodes:
-            if node in determiner_list:
-                for nei in self.graph.neighbors(node):
-                    edge_lab = self.graph[node][nei].get("label")
-                    if edge_lab == "r_succ":
-                        found[node] = nei
-        # Ici, on parcourt tous les nœuds du graphe.
-        # on cherche les déterminants parmi la liste determiner_list
+        for node, token in self.graph.nodes(data="token", default=None):
+            if (token or node) in DETERMINERS:
+                for nei in self.graph.successors(node, "r_succ"):
+                    found[node] = nei
+        # Ici, on parcourt tous les nœuds du graphe (on compare le token porté par le nœud,
+        # les nœuds positionnels s'appelant "le#3").
+        # on cherche les déterminants parmi la liste DETERMINERS
         # si un det est trouvé, son voisin immédiat dans la relation r_succ est enregistré comme un antécédent potentiel.
 
         return found
 
-
     def _locate_pronouns(self):
-        possible = {"il", "elle", "ils", "elles", "le", "la", "les", "lui", "leur"}
-        return [x for x in self.graph.nodes if x in possible]
-        # on recherche dans le graphe tous les nœuds qui correspondent à des pronoms personnels ou possessifs dans la liste "possible"
-
-    def _evaluate_antecedent(self, a_node, p_node):
-        dist = nx.shortest_path_length(self.graph, source=a_node, target=p_node)
-        return 1 / (1 + dist)
-        # Calcule la distance la plus courte entre un antécédent potentiel (a_node) et le pronom (p_node) dans le graphe.
-        # utilise une formule d'inversion de distance pour attribuer un score plus élevé aux antécédents plus proches.
-
-        # par ex : [le] → [chat] → [mange] → [la] → [souris] → [.] → [il] → [est] → [rapide]
-        # si on cherche à relier il :
-        # distance entre chat et il = 3
-        # score = 1 / (1 + 3) = 0.25
-        # distance entre souris et il = 2
-        # score = 1 / (1 + 2) = 0.33
-        # on choisira donc souris comme antécédent de il
-
-
-        # IL FAUT TENIR COMPTE DU GENRE
-
-
-
+        return [x for x, token in self.graph.nodes(data="token", default=None) if (token or x) in PRONOUNS]
+        # on recherche dans le graphe tous les nœuds qui correspondent à des pronoms personnels ou possessifs dans la liste PRONOUNS
 
+    # par ex : [le] → [chat] → [mange] → [la] → [souris] → [.] → [il] → [est] → [rapide]
+    # si on cherche à relier il :
+    # distance entre chat et il = 5, distance entre souris et il = 2
+    # on choisira donc souris comme antécédent de il
 
+    # IL FAUT TENIR COMPTE DU GENRE
@@ -0,0 +1,119 @@
+# async_analyzer.py
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+import instrumentation
+from analysis_result import AnalysisResult
+from semantic_pipeline import GlobalAnalyzer
+
+
+class AnalyzerBusy(RuntimeError):
+    """Trop d'analyses en attente : la demande est refusée tout de suite (ex. HTTP 503)."""
+
+
+class AsyncAnalyzer:
+    """
+    API asyncio au-dessus de GlobalAnalyzer, pour un serveur web :
+
+        service = AsyncAnalyzer()
+        result = await service.analyze("Le chat boit du lait.")
+
+    - Chaque analyse a son propre graphe (GlobalAnalyzer.analyze) ; les ressources lexicales
+      (caches, vocabulaire, automate, index des sens) sont partagées et protégées par leurs verrous.
+      Les téléchargements d'un même mot demandé par plusieurs analyses sont regroupés
+      (voir InflightRequests dans http_pool.py).
+    - Les analyses tournent dans un pool de max_concurrency threads : la boucle asyncio
+      n'est jamais bloquée par le réseau ou le disque.
+    - Contre-pression : au-delà de max_pending analyses en cours ou en attente,
+      analyze() lève AnalyzerBusy au lieu d'allonger la file.
+    - Chaque demande a un délai (timeout, attente comprise) : au-delà, asyncio.TimeoutError.
+      L'analyse abandonnée finit dans son thread (ses téléchargements remplissent le cache)
+      et garde sa place dans le pool jusque-là, pour que la limite reste réelle.
+    """
+
+    def __init__(self, analyzer: Optional[GlobalAnalyzer] = None, max_concurrency: int = 8,
+                 max_pending: int = 64, timeout: Optional[float] = 10.0):
+        self.analyzer = analyzer if analyzer is not None else GlobalAnalyzer()
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="analyze")
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._warm_lock = threading.Lock()
+        self._warm = False
+
+    def _warm_up(self):
+        # Les ressources sont créées et leurs caches chargés une seule fois, avant la première analyse
+        with self._warm_lock:
+            if self._warm:
+                return
+            analyzer = self.analyzer
+            analyzer.vocabulary, analyzer.jdm_data, analyzer.pos_tagger
+            analyzer.multiw_store.automaton
+            analyzer.sense_storage.sense_map
+            self._warm = True
+
+    def _analyze(self, text: str) -> AnalysisResult:
+        self._warm_up()
+        return self.analyzer.analyze(text)
+
+    def _release(self, job: asyncio.Future):
+        self._slots.release()
+        if not job.cancelled():
+            job.exception()  # erreur d'une demande expirée : lue ici pour ne pas être signalée comme perdue
+
+    async def start(self):
+        """Charge les ressources à l'avance (sinon fait par la première analyse)."""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._warm_up)
+
+    async def analyze(self, text: str, timeout: Optional[float] = None) -> AnalysisResult:
+        """Analyse text dans un graphe neuf ; timeout remplace le délai par défaut."""
+        if self._pending >= self.max_pending:
+            instrumentation.METRICS.count("analyses_rejected")
+            raise AnalyzerBusy(f"{self._pending} analyses already pending")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        self._pending += 1
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout)
+            except asyncio.TimeoutError:
+                instrumentation.METRICS.count("analyses_timed_out")
+                raise
+            job = loop.run_in_executor(self._executor, self._analyze, text)
+            # La place n'est rendue qu'à la fin du thread, même si la demande a expiré
+            job.add_done_callback(self._release)
+            remaining = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                return await asyncio.wait_for(asyncio.shield(job), remaining)
+            except asyncio.TimeoutError:
+                instrumentation.METRICS.count("analyses_timed_out")
+                raise
+        finally:
+            self._pending -= 1
+
+    async def analyze_many(self, texts: Iterable[str], timeout: Optional[float] = None) -> List[AnalysisResult]:
+        """Analyse plusieurs textes en parallèle (dans la limite de max_concurrency)."""
+        return list(await asyncio.gather(*(self.analyze(text, timeout) for text in texts)))
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def close(self):
+        """Attend la fin des analyses en cours et libère les threads."""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -1,27 +1,311 @@
 # base_store.py
 
+import os
 import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections.abc import MutableMapping
 from datetime import datetime, timedelta
 from pathlib import Path
 from abc import ABC, abstractmethod
-from typing import TypeVar, Optional
+from typing import Any, Callable, Hashable, TypeVar, Optional, Tuple, Type
+
+from memo_cache import MemoCache, SHARED_MEMO
+from vocabulary import Vocabulary, shared_vocabulary
 
 DATA_REPO = Path("data")
 T = TypeVar("T")
 
 
+class CacheBackend(ABC):
+    """
+    Stockage persistant d'un cache : charge et sauvegarde (données, date de sauvegarde).
+    Avec un vocabulaire, les clés sont les identifiants des termes (voir vocabulary.py).
+    """
+
+    def __init__(self, path: Path, vocabulary: Optional[Vocabulary] = None):
+        self.path = path
+        self.vocabulary = vocabulary
+
+    @abstractmethod
+    def load(self) -> Optional[Tuple[T, datetime]]:
+        """Renvoie (données, last_save), ou None si rien d'exploitable sur disque."""
+        pass
+
+    @abstractmethod
+    def save(self, data: T, last_save: datetime) -> T:
+        """Sauvegarde tout le contenu ; renvoie la vue à utiliser ensuite comme resource_data."""
+        pass
+
+    def touch(self, last_save: datetime):
+        """Met à jour la date de sauvegarde après des écritures incrémentales."""
+        pass
+
+    @contextmanager
+    def batch(self):
+        """Regroupe plusieurs écritures en un seul commit (sans effet par défaut)."""
+        yield
+
+
+class PickleBackend(CacheBackend):
+    """
+    Un seul fichier pickle, réécrit entièrement à chaque sauvegarde.
+    L'écriture passe par un fichier temporaire renommé : un crash ne corrompt pas le cache.
+    """
+
+    def load(self) -> Optional[Tuple[T, datetime]]:
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                return pickle.load(f)
+        except (EOFError, pickle.UnpicklingError):
+            return None
+
+    def save(self, data: T, last_save: datetime) -> T:
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump((data, last_save), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        return data
+
+
+class SQLiteMapping(MutableMapping):
+    """
+    Dictionnaire clé -> valeur (picklée) stocké dans une table SQLite.
+    Chaque écriture est validée immédiatement, sauf à l'intérieur d'un batch().
+    Avec un vocabulaire, une clé peut être un identifiant provisoire : il est traduit en
+    identifiant durable, écrit dans le vocabulaire seulement quand l'entrée est écrite.
+    """
+
+    def __init__(self, backend: "SQLiteBackend"):
+        self._backend = backend
+        self._batch_depth = 0
+
+    def _stored_key(self, key):
+        vocabulary = self._backend.vocabulary
+        return key if vocabulary is None else vocabulary.stored_id(key)
+
+    def __getitem__(self, key):
+        with self._backend.lock:
+            row = self._backend.conn.execute(
+                f"SELECT value FROM {self._backend.table} WHERE key = ?", (self._stored_key(key),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(row[0])
+
+    def __setitem__(self, key, value):
+        vocabulary = self._backend.vocabulary
+        with self._backend.lock:
+            self._backend.conn.execute(
+                f"INSERT OR REPLACE INTO {self._backend.table} (key, value) VALUES (?, ?)",
+                (key if vocabulary is None else vocabulary.persistent(key),
+                 pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+            )
+            self._commit()
+
+    def __delitem__(self, key):
+        with self._backend.lock:
+            cur = self._backend.conn.execute(
+                f"DELETE FROM {self._backend.table} WHERE key = ?", (self._stored_key(key),)
+            )
+            self._commit()
+        if cur.rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        with self._backend.lock:
+            return self._backend.conn.execute(
+                f"SELECT 1 FROM {self._backend.table} WHERE key = ?", (self._stored_key(key),)
+            ).fetchone() is not None
+
+    def __iter__(self):
+        with self._backend.lock:
+            keys = [k for (k,) in self._backend.conn.execute(f"SELECT key FROM {self._backend.table}")]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self._backend.lock:
+            return self._backend.conn.execute(f"SELECT COUNT(*) FROM {self._backend.table}").fetchone()[0]
+
+    def _commit(self):
+        if not self._batch_depth:
+            # Les identifiants écrits dans la table doivent être durables dans le vocabulaire
+            if self._backend.vocabulary is not None:
+                self._backend.vocabulary.sync()
+            self._backend.conn.commit()
+
+    @contextmanager
+    def batch(self):
+        with self._backend.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._backend.conn.rollback()
+                raise
+            self._batch_depth -= 1
+            self._commit()
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Cache clé-valeur dans une base SQLite (journal WAL) : lectures et écritures par clé,
+    commits groupés, écritures atomiques. Un ancien cache pickle est migré au premier chargement.
+    Après un fork, le processus enfant ouvre sa propre connexion (une connexion SQLite
+    ne doit pas être partagée entre processus).
+
+    Avec un vocabulaire, les entrées sont dans la table term_kv, indexées par identifiant
+    de terme (INTEGER PRIMARY KEY, soit le rowid) ; les entrées d'un ancien cache indexé
+    par chaîne (table kv) y sont migrées au chargement.
+    """
+
+    def __init__(self, path: Path, vocabulary: Optional[Vocabulary] = None):
+        super().__init__(path.with_suffix(".sqlite"), vocabulary)
+        self.legacy_path = path
+        self.table = "kv" if vocabulary is None else "term_kv"
+        self._pid = None
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.mapping = SQLiteMapping(self)
+
+    def _connect(self):
+        if self._conn is not None and self._pid == os.getpid():
+            return
+        if self._pid is not None and self._pid != os.getpid():
+            # Connexion et verrou hérités du parent : on ne les touche pas
+            self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS term_kv (key INTEGER PRIMARY KEY, value BLOB NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        self._connect()
+        return self._conn
+
+    @property
+    def lock(self) -> threading.RLock:
+        self._connect()
+        return self._lock
+
+    def _read_last_save(self) -> Optional[datetime]:
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'last_save'").fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def load(self) -> Optional[Tuple[T, datetime]]:
+        fresh_db = not self.path.exists()
+        self._connect()
+        if fresh_db and self.legacy_path.exists():
+            legacy = PickleBackend(self.legacy_path).load()
+            if legacy is not None:
+                self.save(*legacy)
+        if self.vocabulary is not None:
+            self._migrate_string_keys()
+        last_save = self._read_last_save()
+        if last_save is None:
+            return None
+        return self.mapping, last_save
+
+    def _migrate_string_keys(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT key, value FROM kv").fetchall()
+        if not rows:
+            return
+        ids = self.vocabulary.persist_all(key for key, _ in rows)
+        self.vocabulary.sync()
+        with self.mapping.batch():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO term_kv (key, value) VALUES (?, ?)",
+                ((i, value) for i, (_, value) in zip(ids, rows)),
+            )
+            self.conn.execute("DELETE FROM kv")
+
+    def save(self, data: T, last_save: datetime) -> T:
+        with self.mapping.batch():
+            if data is not self.mapping:
+                self.conn.execute(f"DELETE FROM {self.table}")
+                items = list(data.items())
+                if self.vocabulary is not None:
+                    # Clés données sous forme de termes (ex. ancien cache) : converties en identifiants
+                    # (les identifiants provisoires sont rendus durables par le mapping)
+                    ids = iter(self.vocabulary.persist_all(k for k, _ in items if not isinstance(k, int)))
+                    items = [(k if isinstance(k, int) else next(ids), v) for k, v in items]
+                for key, value in items:
+                    self.mapping[key] = value
+            self.touch(last_save)
+        return self.mapping
+
+    def touch(self, last_save: datetime):
+        with self.mapping.batch():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('last_save', ?)",
+                (last_save.isoformat(),),
+            )
+
+    @contextmanager
+    def batch(self):
+        with self.mapping.batch():
+            yield
+
+
 class StorableResource(ABC):
     """
     Classe de base pour gérer des ressources mise en cache (cache local).
+    Le format sur disque est délégué à un CacheBackend (pickle par défaut).
+    Le cache n'est chargé qu'au premier accès à resource_data. S'il a expiré, la copie
+    périmée est servie pendant qu'un thread la reconstruit en arrière-plan.
+    Les recherches par token passent par memo() : un cache LRU en mémoire partagé
+    entre les ressources, vidé quand la ressource est reconstruite.
+    Les termes sont désignés par leur identifiant dans le vocabulaire partagé du dossier
+    data/ ; avec TERM_KEYS, le cache lui-même est indexé par ces identifiants.
+    Hors-ligne (OFFLINE, ou ANALYSEUR_OFFLINE=1 au démarrage), les caches n'expirent pas
+    et les mots absents ne sont pas demandés au réseau (ex. nœud démarré depuis un
+    instantané, voir warmup.py).
     """
 
+    BACKEND: Type[CacheBackend] = PickleBackend
+    TERM_KEYS = False
+    MEMO: MemoCache = SHARED_MEMO
+    REFRESH_IN_BACKGROUND = True
+    OFFLINE = os.environ.get("ANALYSEUR_OFFLINE") == "1"
+    REFRESH_RETRY = timedelta(minutes=10)  # délai avant de retenter un rafraîchissement échoué
+
     def __init__(self, cache_filename: str, *, validity: Optional[timedelta] = None):
         self.cache_path = DATA_REPO / cache_filename
         self._init_data_folder()
-        self.resource_data: T = None
+        self._memo_ns = str(self.cache_path.resolve())
+        self.vocabulary = shared_vocabulary(DATA_REPO)
+        self.backend = self.BACKEND(self.cache_path, self.vocabulary if self.TERM_KEYS else None)
+        self._batch_depth = 0
+        self._dirty = False
+        self._resource_data: T = None
+        self._loaded = False
+        self._load_lock = threading.RLock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_attempt: Optional[datetime] = None
         self.last_save: Optional[datetime] = None
         self.EXPIRE = validity or timedelta(days=7)
-        self._activate()
+
+    @property
+    def resource_data(self) -> T:
+        if not self._loaded:
+            self._activate()
+        return self._resource_data
+
+    @resource_data.setter
+    def resource_data(self, value: T):
+        self._resource_data = value
 
     @staticmethod
     def _init_data_folder():
@@ -30,40 +314,123 @@ class StorableResource(ABC):
 
     def _activate(self):
         """Charge le cache ou le (re)construit."""
-        if not self._read_cache():
-            self._build_and_store()
+        with self._load_lock:
+            if self._loaded:
+                return
+            if not self._read_cache():
+                if self._resource_data is not None and self.REFRESH_IN_BACKGROUND:
+                    self._refresh_in_background()
+                else:
+                    self._build_and_store()
+            self._loaded = True
+
+    def _refresh_in_background(self):
+        with self._load_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            now = datetime.now()
+            if self._refresh_attempt and now - self._refresh_attempt < self.REFRESH_RETRY:
+                return
+            self._refresh_attempt = now
+            # Thread daemon : il ne retient pas le processus à la sortie. L'écriture du cache
+            # est atomique, un rafraîchissement interrompu laisse donc l'ancien cache intact ;
+            # l'appelant qui veut le résultat frais attend avec wait_for_refresh().
+            self._refresh_thread = threading.Thread(
+                target=self._refresh, name=f"refresh-{self.cache_path.name}", daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _refresh(self):
+        try:
+            fresh = self._fetch_resource()
+        except Exception as e:
+            print(f"Background refresh of {self.cache_path} failed: {e}")
+            return
+        with self._load_lock:
+            self._resource_data = fresh
+            self.last_save = datetime.now()
+            self._write_cache()
+            self.MEMO.clear(self._memo_ns)
+
+    def wait_for_refresh(self, timeout: Optional[float] = None):
+        """Attend la fin d'un éventuel rafraîchissement en arrière-plan."""
+        thread = self._refresh_thread
+        if thread is not None:
+            thread.join(timeout)
 
     def _read_cache(self) -> bool:
-        if self.cache_path.exists():
-            try:
-                with open(self.cache_path, "rb") as f:
-                    self.resource_data, self.last_save = pickle.load(f)
-                if not self._is_outdated():
-                    return True
-            except (EOFError, pickle.UnpicklingError):
-                return False
-            except Exception as e:
-                print(f"Could not load from {self.cache_path}: {e}")
-        return False
+        try:
+            loaded = self.backend.load()
+        except Exception as e:
+            print(f"Could not load from {self.backend.path}: {e}")
+            return False
+        if loaded is None:
+            return False
+        self.resource_data, self.last_save = loaded
+        return not self._is_outdated()
 
     def _is_outdated(self) -> bool:
         if not self.last_save:
             return True
+        if self.OFFLINE:
+            return False
         return (datetime.now() - self.last_save) > self.EXPIRE
 
     def _build_and_store(self):
-        self.resource_data = self._fetch_resource()
+        self._resource_data = self._fetch_resource()
         self.last_save = datetime.now()
         self._write_cache()
+        self.MEMO.clear(self._memo_ns)
 
     def _write_cache(self):
-        with open(self.cache_path, "wb") as f:
-            pickle.dump((self.resource_data, self.last_save), f)
+        self.vocabulary.sync()
+        self._resource_data = self.backend.save(self._resource_data, self.last_save)
+
+    def put(self, key, value):
+        """
+        Ajoute une entrée au cache. Avec un backend clé-valeur, seule cette entrée est écrite.
+        """
+        # Un identifiant provisoire devient durable ici (voir SQLiteMapping), rendu sûr au commit
+        self.resource_data[key] = value
+        self.MEMO.invalidate((self._memo_ns, key))
+        self.last_save = datetime.now()
+        if self._batch_depth:
+            self._dirty = True
+        else:
+            self._flush_entries()
+
+    def _flush_entries(self):
+        if isinstance(self.resource_data, SQLiteMapping):
+            self.backend.touch(self.last_save)
+        else:
+            self._write_cache()
+
+    @contextmanager
+    def batch(self):
+        """Regroupe plusieurs put() en une seule écriture (un seul commit)."""
+        with self.backend.batch():
+            self._batch_depth += 1
+            try:
+                yield
+            finally:
+                self._batch_depth -= 1
+            if not self._batch_depth and self._dirty:
+                self._dirty = False
+                self._flush_entries()
+
+    def memo(self, key: Hashable, loader: Callable[[], Any], **kwargs) -> Any:
+        """Recherche d'une clé servie par le cache mémoire partagé (voir MemoCache.get)."""
+        return self.MEMO.get((self._memo_ns, key), loader, **kwargs)
 
     def retrieve(self) -> T:
+        data = self.resource_data
         if self._is_outdated():
-            self._build_and_store()
-        return self.resource_data
+            if self.REFRESH_IN_BACKGROUND:
+                self._refresh_in_background()
+            else:
+                self._build_and_store()
+                data = self._resource_data
+        return data
 
     @abstractmethod
     def _fetch_resource(self) -> T:
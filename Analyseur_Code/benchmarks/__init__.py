@@ -0,0 +1 @@
+# benchmarks : mesures de performance hors-ligne (lancer depuis Analyseur_Code, ex. python -m benchmarks.bench_fetcher)
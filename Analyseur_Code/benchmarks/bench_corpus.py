@@ -0,0 +1,36 @@
+# bench_corpus.py : débit de CorpusRunner selon le nombre de processus (caches synthétiques)
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import corpus, make_data_dir
+from corpus_runner import CorpusRunner
+
+
+def run(n_documents: int = 400, processes=(1, 2, 4, 8)):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        make_data_dir(tmp)
+        os.chdir(tmp)
+        try:
+            docs = corpus(n_documents)
+            for n in processes:
+                if n > (os.cpu_count() or 1):
+                    break
+                runner = CorpusRunner(processes=n)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = list(runner.run(docs))
+                elapsed = time.perf_counter() - start
+                assert [r.text for r in results] == docs
+                print(f"processus={n:2d}  {n_documents} documents en {elapsed:.2f}s  "
+                      f"({n_documents / elapsed:.1f} docs/s)")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,86 @@
+# bench_dumps.py : reconstruction de l'index de sens depuis un dump LEXICALNET synthétique
+
+import io
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from disambiguator_storage import LexicalSenseStorage
+from dump_parser import build_sense_index
+from sense_index import SenseIndex
+from benchmarks.fake_jdm_server import FakeJDMServer
+from benchmarks.fixtures import r1_dump, zipped
+
+REGEX_LINE = re.compile(r"^(.*?)\s;\s(.*?)\s;\s(\d+)$")
+
+
+def legacy_parse(raw: bytes) -> dict:
+    """Ancien chemin : tout le fichier en mémoire, une regex par ligne."""
+    data_map = defaultdict(list)
+    for line in io.BytesIO(raw):
+        match = REGEX_LINE.match(line.decode("latin1").strip().lower())
+        if match:
+            splitted = match.group(2).split(">")
+            if len(splitted) >= 2:
+                data_map[match.group(1)].append((splitted[1], int(match.group(3))))
+    return dict(data_map)
+
+
+def _measure(func):
+    """Durée (sans traçage), puis pic mémoire Python sur une seconde exécution tracée."""
+    start = time.perf_counter()
+    func().close()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(n_terms: int = 100000):
+    raw = r1_dump(n_terms)
+    mb = len(raw) / 1e6
+    with tempfile.TemporaryDirectory() as tmp:
+        txt = Path(tmp) / "r1.txt"
+        txt.write_bytes(raw)
+
+        legacy, t_legacy, m_legacy = _measure(lambda: SenseIndex.build(
+            Path(tmp) / "legacy.bin", legacy_parse(raw), datetime.now()))
+        print(f"regex + dict  : {t_legacy:.2f}s  ({mb / t_legacy:.1f} Mo/s)  pic Python {m_legacy / 1e6:.0f} Mo")
+
+        for workers, budget in ((1, 256 << 20), (1, 16 << 20), (os.cpu_count(), 256 << 20)):
+            index, elapsed, peak = _measure(lambda: build_sense_index(
+                txt, Path(tmp) / "stream.bin", datetime.now(), workers=workers, memory_budget=budget))
+            same = all(index.get(term) == legacy.get(term) for term in ("mot1", "été0", "mot4242", "été7"))
+            print(f"flux workers={workers} budget={budget >> 20} Mo : {elapsed:.2f}s  ({mb / elapsed:.1f} Mo/s)  "
+                  f"pic Python {peak / 1e6:.0f} Mo  identique : {same and len(index) == len(legacy)}")
+            index.close()
+        legacy.close()
+
+        os.chdir(tmp)
+        with FakeJDMServer(latency=0) as server:
+            LexicalSenseStorage.SOURCE_URL = server.add_file("R1.txt.zip", zipped("R1.txt", raw))
+            storage = LexicalSenseStorage()
+            start = time.perf_counter()
+            storage.sense_map
+            print(f"premier téléchargement + index : {time.perf_counter() - start:.2f}s  "
+                  f"{server.bytes_sent / 1e6:.1f} Mo reçus")
+            sent = server.bytes_sent
+            start = time.perf_counter()
+            storage._build_and_store()
+            print(f"rafraîchissement, dump inchangé : {time.perf_counter() - start:.3f}s  "
+                  f"{(server.bytes_sent - sent) / 1e6:.1f} Mo reçus")
+
+
+if __name__ == "__main__":
+    cwd = os.getcwd()
+    try:
+        run()
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,53 @@
+# bench_fetcher.py : JDMFetcher séquentiel (1 thread) contre parallèle, sur un serveur local,
+# et requêtes regroupées quand plusieurs analyses demandent les mêmes mots en même temps
+
+import os
+import tempfile
+import threading
+import time
+
+from jdm_fetcher import JDMFetcher
+from benchmarks.fake_jdm_server import FakeJDMServer
+
+
+def run(n_words: int = 500, latency: float = 0.02, workers=(1, 4, 8, 16)):
+    words = [f"mot{i}" for i in range(n_words)]
+    with FakeJDMServer(latency=latency) as server:
+        dump_url = server.base_url + "/rezo-dump.php?gotermsubmit=Chercher&gotermrel={word}&rel="
+        for n in workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                os.chdir(tmp)
+                fetcher = JDMFetcher(max_workers=n, requests_per_second=0)
+                fetcher.DUMP_URL = dump_url
+                start = time.perf_counter()
+                fetcher.fetch_entries_for_words(words)
+                elapsed = time.perf_counter() - start
+                print(f"workers={n:3d}  {n_words} mots en {elapsed:.2f}s  ({n_words / elapsed:.0f} mots/s)")
+
+
+def run_coalescing(n_words: int = 100, n_analyses: int = 8, latency: float = 0.02):
+    """n_analyses threads demandent les mêmes mots : chaque mot ne doit être téléchargé qu'une fois."""
+    words = [f"mot{i}" for i in range(n_words)]
+    with FakeJDMServer(latency=latency) as server, tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        fetcher = JDMFetcher(requests_per_second=0)
+        fetcher.DUMP_URL = server.base_url + "/rezo-dump.php?gotermsubmit=Chercher&gotermrel={word}&rel="
+        threads = [threading.Thread(target=fetcher.fetch_entries_for_words, args=(words,))
+                   for _ in range(n_analyses)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        print(f"{n_analyses} analyses concurrentes, {n_words} mots : {server.hits} requêtes "
+              f"({fetcher.inflight.coalesced} regroupées) en {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    cwd = os.getcwd()
+    try:
+        run()
+        run_coalescing()
+    finally:
+        os.chdir(cwd)
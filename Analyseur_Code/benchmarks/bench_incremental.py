@@ -0,0 +1,134 @@
+# bench_incremental.py : latence d'une modification d'un mot, ré-analyse complète contre IncrementalAnalyzer,
+# et vérification que les deux donnent le même graphe
+
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from base_store import StorableResource
+from benchmarks.fixtures import FUNCTION_WORDS, corpus, make_data_dir, vocabulary
+from incremental_analyzer import IncrementalAnalyzer
+from semantic_pipeline import GlobalAnalyzer
+
+
+def canonical(graph):
+    """
+    Nœuds et arêtes du graphe, les nœuds de tokens renommés "token#position" le long de r_succ
+    (les composés d'après leur premier token) : IncrementalAnalyzer numérote ses nœuds à la création.
+    """
+    start = next(name for name, tk in graph.nodes(data="token") if tk == "_START")
+    rank, node = {}, start
+    while node is not None:
+        rank[node] = len(rank)
+        node = next((v for v in graph.successors(node, "r_succ") if " " not in graph.token(v)), None)
+
+    def name(n):
+        if n in rank:
+            return f"{graph.token(n)}#{rank[n]}"
+        if " " in graph.token(n):
+            first = min(rank[u] for u in graph.predecessors(n, "r_succ") if u in rank) + 1
+            return f"{graph.token(n)}#{first}"
+        return n
+
+    nodes = {name(n) for n in graph.nodes()}
+    edges = {(name(u), name(v), d["label"], d["weight"]) for u, v, d in graph.edges(data=True)}
+    return nodes, edges
+
+
+def check_equivalence(analyzer, doc, text):
+    expected, got = canonical(analyzer.analyze(text).g), canonical(doc.g)
+    if got != expected:
+        missing, extra = expected[1] - got[1], got[1] - expected[1]
+        raise AssertionError(f"IncrementalAnalyzer disagrees with analyze(): "
+                             f"{len(missing)} arêtes manquantes (ex. {sorted(missing)[:3]}), "
+                             f"{len(extra)} en trop (ex. {sorted(extra)[:3]})")
+
+
+def random_edit(rng, text, vocab):
+    """Remplacement, insertion ou suppression d'un mot, ou modification d'un caractère."""
+    words = text.split(" ")
+    k = rng.randrange(len(words))
+    kind = rng.randrange(4)
+    if kind == 0:
+        words[k] = rng.choice(vocab)
+    elif kind == 1:
+        words.insert(k, rng.choice(vocab))
+    elif kind == 2 and len(words) > 1:
+        del words[k]
+    else:
+        c = rng.randrange(len(text))
+        return text[:c] + rng.choice(" .abcé") + text[c + 1:]
+    return " ".join(words)
+
+
+def check(n_tokens: int = 200, n_edits: int = 100, vocab_size: int = 2000, seed: int = 0):
+    """
+    Compare le graphe incrémental à une analyse complète après chaque modification.
+    Hors-ligne : les mots inventés par les modifications de caractères restent inconnus.
+    """
+    cwd, offline = os.getcwd(), StorableResource.OFFLINE
+    with tempfile.TemporaryDirectory() as tmp:
+        make_data_dir(tmp, vocab_size=vocab_size)
+        os.chdir(tmp)
+        StorableResource.OFFLINE = True
+        try:
+            rng = random.Random(seed)
+            vocab = vocabulary(vocab_size) + sorted(FUNCTION_WORDS)
+            text = " ".join(" ".join(corpus(n_tokens // 60 + 1, vocab_size=vocab_size,
+                                            function_words=0.3)).split(" ")[:n_tokens])
+            for window in (None, 2):
+                analyzer = GlobalAnalyzer()
+                analyzer.SENSE_CONTEXT_WINDOW = window
+                doc = IncrementalAnalyzer(analyzer)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    doc.update(text)
+                    check_equivalence(analyzer, doc, text)
+                    edited = text
+                    for _ in range(n_edits):
+                        edited = random_edit(rng, edited, vocab)
+                        doc.update(edited)
+                        check_equivalence(analyzer, doc, edited)
+                print(f"fenêtre de sens {window} : {n_edits} modifications, graphe identique à analyze()")
+        finally:
+            StorableResource.OFFLINE = offline
+            os.chdir(cwd)
+
+
+def run(sizes=(1000, 10000, 50000), n_edits: int = 50, vocab_size: int = 2000):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        make_data_dir(tmp, vocab_size=vocab_size)
+        os.chdir(tmp)
+        try:
+            rng = random.Random(0)
+            vocab = vocabulary(vocab_size)
+            analyzer = GlobalAnalyzer()
+            for n_tokens in sizes:
+                words = " ".join(corpus(n_tokens // 60 + 1, vocab_size=vocab_size, function_words=0.3)).split(" ")
+                words = words[:n_tokens]
+                doc = IncrementalAnalyzer(analyzer)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    doc.update(" ".join(words))
+                    first = time.perf_counter() - start
+                    start = time.perf_counter()
+                    analyzer.analyze(" ".join(words))
+                    full = time.perf_counter() - start
+                    start = time.perf_counter()
+                    for _ in range(n_edits):
+                        words[rng.randrange(len(words))] = rng.choice(vocab)
+                        doc.update(" ".join(words))
+                    edit = (time.perf_counter() - start) / n_edits
+                    check_equivalence(analyzer, doc, " ".join(words))
+                print(f"{n_tokens:7d} tokens  analyse complète {full * 1000:9.1f} ms  "
+                      f"(première mise à jour {first * 1000:9.1f} ms)  modification d'un mot {edit * 1000:7.2f} ms")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    check()
+    run()
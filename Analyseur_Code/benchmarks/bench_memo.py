@@ -0,0 +1,39 @@
+# bench_memo.py : recherches POS et sens par token, avec et sans le cache mémoire partagé
+
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import corpus, make_data_dir
+from disambiguator_storage import LexicalSenseStorage
+from memo_cache import SHARED_MEMO
+from pos_retrieve import POSTagger
+from text_tokenizer import custom_tokenize
+
+
+def run(n_documents: int = 2000, vocab_size: int = 20000):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        make_data_dir(tmp, vocab_size=vocab_size)
+        os.chdir(tmp)
+        try:
+            tokens = [tk for doc in corpus(n_documents, vocab_size=vocab_size) for tk in custom_tokenize(doc.lower())]
+            tagger, senses = POSTagger(), LexicalSenseStorage()
+            for maxsize in (0, 1000, 100000):
+                SHARED_MEMO.clear()
+                SHARED_MEMO.maxsize = maxsize
+                SHARED_MEMO.hits = SHARED_MEMO.misses = SHARED_MEMO.negative_hits = SHARED_MEMO.evictions = 0
+                start = time.perf_counter()
+                for tk in tokens:
+                    tagger.get_pos_tags(tk)
+                    senses.find_best_sense(tk)
+                elapsed = time.perf_counter() - start
+                stats = SHARED_MEMO.stats()
+                print(f"maxsize={maxsize:6d}  {len(tokens)} tokens en {elapsed:.2f}s  "
+                      f"({len(tokens) / elapsed:.0f} tokens/s)  taux de succès {stats['hit_rate']:.1%}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,47 @@
+# bench_render.py : disposition, exports et rendu plafonné de graphes d'analyse de grande taille
+
+import os
+import tempfile
+import time
+
+import graph_export
+from analysis_graph import AnalysisGraph
+
+
+def chain_graph(n_tokens: int, vocab_size: int = 2000, n_pos: int = 30) -> AnalysisGraph:
+    """Graphe de la forme produite par analyze : chaîne r_succ, un POS et un sens par token."""
+    g = AnalysisGraph()
+    prev = g.names[g.add_node("_START#0", "_START")]
+    for i in range(1, n_tokens):
+        word = f"mot{i % vocab_size}"
+        node = f"{word}#{i}"
+        g.add_node(node, word)
+        g.add_edge(prev, node, "r_succ")
+        g.add_edge(node, f"POS{i % n_pos}:", "r_pos")
+        g.add_edge(node, f"sens{i % vocab_size}", "r_disambiguate")
+        prev = node
+    return g
+
+
+def run(sizes=(1000, 10000, 50000), max_nodes: int = 300):
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_tokens in sizes:
+            g = chain_graph(n_tokens)
+            steps = [
+                ("disposition", lambda: graph_export.layered_layout(g)),
+                ("json", lambda: graph_export.export(g, os.path.join(tmp, "g.json"))),
+                ("graphml", lambda: graph_export.export(g, os.path.join(tmp, "g.graphml"))),
+                ("dot", lambda: graph_export.export(g, os.path.join(tmp, "g.dot"))),
+                (f"png ({max_nodes} nœuds)", lambda: graph_export.render(g, os.path.join(tmp, "g.png"),
+                                                                          max_nodes=max_nodes)),
+            ]
+            timings = []
+            for name, step in steps:
+                start = time.perf_counter()
+                step()
+                timings.append(f"{name} {time.perf_counter() - start:6.2f}s")
+            print(f"{n_tokens:7d} tokens  " + "  ".join(timings))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,62 @@
+# bench_rezo.py : débit du lecteur de pages rezo-dump et temps des requêtes sur les index
+#
+#   python -m benchmarks.bench_rezo                     # pages synthétiques
+#   python -m benchmarks.bench_rezo pages/*.html        # pages enregistrées (latin-1, comme le service)
+
+import pickle
+import sys
+import time
+from pathlib import Path
+
+from relation_store import parse_rezo_dump
+from benchmarks.fake_jdm_server import rezo_dump_page
+
+
+def legacy_scan(lines):
+    """Ancien chemin : parcours de la page à la recherche de l'eid, rien d'autre n'est gardé."""
+    eid = ""
+    for txt in lines:
+        if "(eid=" in txt:
+            eid = txt.split("eid=")[1].split(")")[0]
+    return eid
+
+
+def _best(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(paths=(), n_relations: int = 200000):
+    if paths:
+        pages = [Path(p).read_bytes().decode("latin-1") for p in paths]
+    else:
+        pages = [rezo_dump_page(f"mot{i}", n_relations=n_relations // 10) for i in range(10)]
+    lines = [page.splitlines() for page in pages]
+    size = sum(len(page.encode("latin-1", errors="replace")) for page in pages)
+    n_lines = sum(map(len, lines))
+    print(f"{len(pages)} pages, {size / 1e6:.1f} Mo, {n_lines} lignes")
+
+    elapsed = _best(lambda: [legacy_scan(ls) for ls in lines])
+    print(f"{'ancien (eid seulement)':28s} {size / elapsed / 1e6:8.2f} Mo/s  {n_lines / elapsed:12.0f} lignes/s")
+    elapsed = _best(lambda: [parse_rezo_dump(ls) for ls in lines])
+    print(f"{'lecture complète + index':28s} {size / elapsed / 1e6:8.2f} Mo/s  {n_lines / elapsed:12.0f} lignes/s")
+
+    stores = [parse_rezo_dump(ls) for ls in lines]
+    n_rel = sum(map(len, stores))
+    stored = sum(len(pickle.dumps(s, protocol=pickle.HIGHEST_PROTOCOL)) for s in stores)
+    print(f"{n_rel} relations, {stored / max(n_rel, 1):.1f} octets/relation une fois sérialisées")
+
+    queries = [(s, s.eid, rel) for s in stores for rel in ("r_isa", "r_syn", "r_agent")]
+    n_queries = 1000
+    elapsed = _best(lambda: [s.relations(eid, rel, min_weight=50)
+                             for _ in range(n_queries // len(queries) + 1) for s, eid, rel in queries])
+    total = (n_queries // len(queries) + 1) * len(queries)
+    print(f"{'requête (source, type, poids)':28s} {elapsed / total * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
@@ -0,0 +1,82 @@
+# bench_rules.py : règles compilées (semantic_rules.txt) contre méthodes rule_* écrites à la main
+
+import contextlib
+import io
+import random
+import time
+
+from analysis_graph import AnalysisGraph
+from rule_compiler import parse_rules
+from semantic_rules import RuleEngine, RULES_FILE
+
+POS_NODES = ["Det:", "Nom::", "Ver::", "Adj::"]
+PREPS = ["dans", "sur", "sous", "en"]
+
+
+def synthetic_tokens(n_tokens: int, seed: int = 0):
+    """Tokens distincts (positionnels) avec 1 à 2 catégories POS tirées au hasard."""
+    rng = random.Random(seed)
+    tokens = []
+    for i in range(n_tokens):
+        if rng.random() < 0.05:
+            tokens.append((rng.choice(PREPS), []))
+        else:
+            tokens.append((f"t{i}", rng.sample(POS_NODES, rng.randint(1, 2))))
+    return tokens
+
+
+def build_engine(tokens, rules_file=RULES_FILE, extra_rules=None):
+    g = AnalysisGraph()
+    engine = RuleEngine(g, rules_file=rules_file)
+    if extra_rules:
+        engine.rules += engine.compile_rules(extra_rules)
+    previous = None
+    for tok, pos_nodes in tokens:
+        for pos_node in pos_nodes:
+            g.add_edge(tok, pos_node, label="r_pos:")
+            engine.index_edge(tok, pos_node, "r_pos:")
+        if previous is not None:
+            g.add_edge(previous, tok, label="r_succ")
+            engine.index_edge(previous, tok, "r_succ")
+        previous = tok
+    return engine
+
+
+def timed_apply(engine):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.apply_rules()
+    return time.perf_counter() - start
+
+
+def generated_rules(n_rules: int):
+    """n_rules règles en chaîne sur des catégories aléatoires, chacune avec sa relation."""
+    rng = random.Random(1)
+    lines = []
+    for i in range(n_rules):
+        cats = [rng.choice(["Det:", "Nom:", "Ver:", "Adj:"]) for _ in range(3)]
+        lines.append(
+            f"gen_{i}: $x r_pos {cats[0]} & $y r_pos {cats[1]} & $z r_pos {cats[2]} & "
+            f"$x r_succ $y & $y r_succ $z => $x r_gen{i} $z"
+        )
+    return parse_rules("\n".join(lines))
+
+
+def run(sizes=(1000, 5000, 20000)):
+    for n in sizes:
+        tokens = synthetic_tokens(n)
+        hand = build_engine(tokens, rules_file=None)
+        compiled = build_engine(tokens)
+        t_hand, t_compiled = timed_apply(hand), timed_apply(compiled)
+        assert hand.derived == compiled.derived
+        print(f"{n:7d} tokens  rule_* : {t_hand:.3f}s  compilées : {t_compiled:.3f}s  "
+              f"({len(compiled.derived)} faits)")
+
+    tokens = synthetic_tokens(5000)
+    for n_rules in (0, 100, 400):
+        engine = build_engine(tokens, extra_rules=generated_rules(n_rules) if n_rules else None)
+        print(f"{len(engine.rules):4d} règles sur 5000 tokens : {timed_apply(engine):.3f}s")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,44 @@
+# bench_senses.py : désambiguïsation token par token contre resolve() sur des documents entiers
+
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import corpus, make_data_dir
+from disambiguator_storage import LexicalSenseStorage
+from memo_cache import SHARED_MEMO
+from text_tokenizer import tokenize_batch
+
+
+def run(n_documents: int = 2000, vocab_size: int = 20000):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        make_data_dir(tmp, vocab_size=vocab_size)
+        os.chdir(tmp)
+        try:
+            senses = LexicalSenseStorage()
+            start = time.perf_counter()
+            senses.sense_map  # index, table des identifiants et table des meilleurs sens
+            print(f"ouverture de l'index (tables .ids et .topk comprises) : {time.perf_counter() - start:.2f}s")
+            documents = [tokenized.ids for tokenized in tokenize_batch(corpus(n_documents, vocab_size=vocab_size))]
+            n_tokens = sum(map(len, documents))
+
+            SHARED_MEMO.clear()
+            start = time.perf_counter()
+            per_token = [[senses.best_sense_by_id(i) for i in ids] for ids in documents]
+            elapsed = time.perf_counter() - start
+            print(f"{'token par token':24s} {n_tokens / elapsed:10.0f} tokens/s")
+
+            for window in (None, 2):
+                start = time.perf_counter()
+                resolved = [senses.resolve(ids, window=window) for ids in documents]
+                elapsed = time.perf_counter() - start
+                print(f"{f'resolve(window={window})':24s} {n_tokens / elapsed:10.0f} tokens/s")
+                if window is None and resolved != per_token:
+                    raise AssertionError("resolve() disagrees with best_sense_by_id()")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    run()
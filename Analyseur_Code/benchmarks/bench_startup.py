@@ -0,0 +1,44 @@
+# bench_startup.py : coût fixe d'un lancement court (import, construction, première phrase)
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fixtures import make_data_dir
+
+CODE_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import contextlib, io, sys, time
+t0 = time.perf_counter()
+from semantic_pipeline import GlobalAnalyzer
+t1 = time.perf_counter()
+analyzer = GlobalAnalyzer()
+t2 = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    analyzer.analyze("mot1 mot2 mot3 mot4.")
+t3 = time.perf_counter()
+print(f"{t1 - t0:.3f} {t2 - t1:.3f} {t3 - t2:.3f} {int('matplotlib' in sys.modules)}")
+"""
+
+
+def run(repeat: int = 5):
+    with tempfile.TemporaryDirectory() as tmp:
+        make_data_dir(tmp, vocab_size=20000, n_mwe=20000)
+        env = dict(os.environ, PYTHONPATH=str(CODE_DIR))
+        rows = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", PROBE], cwd=tmp, env=env,
+                                 capture_output=True, text=True, check=True).stdout.split()
+            rows.append([float(x) for x in out[:3]] + [time.perf_counter() - start, out[3]])
+        best = min(rows, key=lambda r: r[3])
+        print(f"import {best[0]:.3f}s  GlobalAnalyzer() {best[1]:.3f}s  première phrase {best[2]:.3f}s  "
+              f"processus complet {best[3]:.3f}s  matplotlib importé : {best[4] == '1'}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,51 @@
+# bench_tokenize.py : débit du tokenizer (Mo/s) sur un grand texte français
+
+import re
+import time
+
+from semantic_pipeline import GlobalAnalyzer
+from text_tokenizer import tokenize, tokenize_batch
+from vocabulary import Vocabulary
+from benchmarks.fixtures import french_text
+
+LEGACY_APOSTROPHE = re.compile(r"(\S+)'(\S+)|(\S+)", re.IGNORECASE)
+LEGACY_CLEAN = re.compile(r"[^\w'-]")
+
+
+def legacy_tokenize(sentence: str):
+    """Ancien chemin : findall, puis une substitution et un lower() par token (trois listes)."""
+    all_matches = LEGACY_APOSTROPHE.findall(sentence.lower())
+    raw_toks = [tk for group in all_matches for tk in group if tk]
+    cleaned = [LEGACY_CLEAN.sub("", t).lower() for t in raw_toks]
+    return [c for c in cleaned if c]
+
+
+def _measure(label: str, fn, sentences, n_bytes: int, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_tokens = fn(sentences)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:32s} {n_bytes / best / 1e6:8.2f} Mo/s  {n_tokens / best:12.0f} tokens/s")
+
+
+def run(n_bytes: int = 20_000_000):
+    text = french_text(n_bytes)
+    sentences = [s for paragraph in text.split("\n") for s in GlobalAnalyzer._split_sentences(paragraph)]
+    size = len(text.encode("utf-8"))
+    print(f"{size / 1e6:.1f} Mo, {len(sentences)} phrases")
+
+    assert [legacy_tokenize(s) for s in sentences[:1000]] == [tokenize(s).tokens for s in sentences[:1000]]
+
+    vocab = Vocabulary()  # rempli au premier tour, comme le vocabulaire partagé en production
+    _measure("ancien (par phrase)", lambda ss: sum(len(legacy_tokenize(s)) for s in ss), sentences, size)
+    _measure("un passage (par phrase)", lambda ss: sum(len(tokenize(s, vocab)) for s in ss), sentences, size)
+    _measure("un passage (lots de 1000 phrases)",
+             lambda ss: sum(len(t) for k in range(0, len(ss), 1000) for t in tokenize_batch(ss[k:k + 1000], vocab)),
+             sentences, size)
+    _measure("un passage (texte entier)", lambda ss: len(tokenize(text, vocab)), sentences, size)
+    _measure("texte entier + positions", lambda ss: len(tokenize(text, vocab).starts), sentences, size)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,175 @@
+# fake_jdm_server.py
+
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+# Quelques types de relations JDM (identifiants du vrai service)
+RELATION_TYPES = [(0, "r_associated"), (4, "r_pos"), (5, "r_syn"), (6, "r_isa"), (9, "r_has_part"),
+                  (13, "r_agent"), (14, "r_patient"), (17, "r_carac"), (15, "r_lieu")]
+
+
+def _eid(word: str) -> int:
+    return zlib.crc32(word.encode("utf-8")) % 10000000
+
+
+def rezo_dump_page(word: str, n_relations: int = 20) -> str:
+    """
+    Page rezo-dump d'un mot (même structure que le vrai service) : types de nœuds,
+    nœuds, types de relations, puis relations sortantes et entrantes.
+    """
+    rng = random.Random(word)
+    eid = _eid(word)
+    neighbours = [f"{word}_voisin{k}" for k in range(max(1, n_relations // 2))]
+    lines = [
+        "<html><body><def>Définition.</def><CODE>",
+        f"// DUMP pour le terme '{word}' (eid={eid})",
+        "// les types de noeuds (Nodes Types) : nt;ntid;'ntname'",
+        "nt;1;'n_term'",
+        "nt;4;'n_pos'",
+        "// les noeuds/termes (Entries) : e;eid;'name';type;w;'formated name' ",
+        f"e;{eid};'{word}';1;50",
+    ]
+    lines += [f"e;{_eid(n)};'{n}';1;{rng.randint(1, 500)}" for n in neighbours]
+    lines.append(f"e;{_eid(word + '>0')};'{word}>{eid}';1;25;'{word}>sens'")
+    lines.append("// les types de relations (Relation Types) : rt;rtid;'trname';'trgpname';'rthelp' ")
+    lines += [f"rt;{rt};'{name}';'{name}';'aide'" for rt, name in RELATION_TYPES]
+    lines.append("// les relations sortantes : r;rid;node1;node2;type;w ")
+    for k in range(n_relations):
+        other = _eid(rng.choice(neighbours))
+        rt = rng.choice(RELATION_TYPES)[0]
+        src, dst = (eid, other) if k % 2 == 0 else (other, eid)
+        if k == n_relations // 2:
+            lines.append("// les relations entrantes : r;rid;node1;node2;type;w ")
+        lines.append(f"r;{_eid(f'{word}:{k}') * 100 + k % 100};{src};{dst};{rt};{rng.randint(-20, 300)}")
+    lines.append("</CODE></body></html>")
+    return "\n".join(lines) + "\n"
+
+
+def relations_json(word: str) -> str:
+    """Réponse de /v0/relations/from/{word} : étiquettes POS (genre compris) et raffinements."""
+    return json.dumps({
+        "nodes": [
+            {"id": 1, "type": 1, "name": word, "w": 50},
+            {"id": 2, "type": 4, "name": "Nom:", "w": 50},
+            {"id": 3, "type": 4, "name": "Ver:", "w": 20},
+            {"id": 4, "type": 4, "name": "Gender:Mas", "w": 0},
+            {"id": 5, "type": 1, "name": f"{word}>sens", "w": 25},
+        ],
+        "relations": [
+            {"id": 10, "node1": 1, "node2": 2, "type": 4, "w": 50},
+            {"id": 11, "node1": 1, "node2": 3, "type": 4, "w": 20},
+            {"id": 12, "node1": 1, "node2": 4, "type": 4, "w": 0},
+            {"id": 13, "node1": 1, "node2": 5, "type": 1, "w": 40},
+        ],
+    })
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme les vrais serveurs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        if parts.path.startswith("/dumps/"):
+            self._send_file(unquote(parts.path[len("/dumps/"):]))
+            return
+        if parts.path.endswith("rezo-dump.php"):
+            word = parse_qs(parts.query).get("gotermrel", [""])[0]
+            body, ctype = rezo_dump_page(word), "text/html; charset=latin-1"
+            payload = body.encode("latin-1", errors="replace")
+        elif parts.path.startswith("/v0/relations/from/"):
+            word = unquote(parts.path.rsplit("/", 1)[1])
+            payload, ctype = relations_json(word).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        with self.server.lock:
+            self.server.hits += 1
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_file(self, name: str):
+        """Fichier de dump statique, avec ETag, requêtes conditionnelles et Range."""
+        payload = self.server.files.get(name)
+        if payload is None:
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.md5(payload).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start = 0
+        ranged = self.headers.get("Range", "")
+        if ranged.startswith("bytes=") and self.headers.get("If-Range", etag) == etag:
+            start = int(ranged[len("bytes="):].split("-")[0])
+        with self.server.lock:
+            self.server.hits += 1
+            self.server.bytes_sent += len(payload) - start
+        if start:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(payload) - start))
+        self.end_headers()
+        self.wfile.write(payload[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeJDMServer:
+    """
+    Remplaçant local de jeuxdemots.org / jdm-api pour les mesures (latence simulée).
+    """
+
+    def __init__(self, latency: float = 0.02):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.hits = 0
+        self.httpd.bytes_sent = 0
+        self.httpd.files = {}  # nom -> contenu, servi sous /dumps/<nom>
+        self.httpd.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def hits(self) -> int:
+        return self.httpd.hits
+
+    @property
+    def bytes_sent(self) -> int:
+        return self.httpd.bytes_sent
+
+    def add_file(self, name: str, payload: bytes) -> str:
+        """Publie un fichier de dump ; renvoie son URL."""
+        self.httpd.files[name] = payload
+        return f"{self.base_url}/dumps/{name}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,135 @@
+# fixtures.py : données synthétiques pour les mesures hors-ligne
+
+import io
+import random
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from base_store import PickleBackend, SQLiteBackend
+from jdm_api import R_POS, WordRelations
+from relation_store import parse_rezo_dump
+from sense_index import SenseIndex
+from vocabulary import shared_vocabulary
+from benchmarks.fake_jdm_server import rezo_dump_page
+
+POS_CHOICES = [{"Det:": 50}, {"Nom:": 50}, {"Ver:": 50}, {"Adj:": 50}, {"Nom:": 50, "Adj:": 30}]
+# Mots-outils insérés dans le corpus pour exercer les anaphores et les règles
+FUNCTION_WORDS = {
+    "le": {"Det:": 50, "Pro:": 20}, "la": {"Det:": 50, "Pro:": 20}, "un": {"Det:": 50},
+    "il": {"Pro:": 50}, "elle": {"Pro:": 50}, "dans": {"Pre:": 50},
+}
+
+
+def vocabulary(size: int) -> List[str]:
+    return [f"mot{i}" for i in range(size)]
+
+
+def corpus(n_documents: int, sentences_per_doc: int = 5, words_per_sentence: int = 12,
+           vocab_size: int = 2000, seed: int = 0, function_words: float = 0.0) -> List[str]:
+    """
+    Documents synthétiques ; les mots suivent une loi de Zipf comme dans un vrai texte.
+    function_words : proportion des mots remplacés par un mot-outil (FUNCTION_WORDS).
+    """
+    rng = random.Random(seed)
+    vocab = vocabulary(vocab_size)
+    weights = [1 / (rank + 1) for rank in range(vocab_size)]
+    tools = sorted(FUNCTION_WORDS)
+    docs = []
+    for _ in range(n_documents):
+        sentences = []
+        for _ in range(sentences_per_doc):
+            words = rng.choices(vocab, weights=weights, k=words_per_sentence)
+            if function_words:
+                words = [rng.choice(tools) if rng.random() < function_words else w for w in words]
+            sentences.append(" ".join(words).capitalize() + ".")
+        docs.append(" ".join(sentences))
+    return docs
+
+
+# Texte français réaliste pour le tokenizer : élisions, accents, ponctuation, majuscules
+FRENCH_SENTENCES = [
+    "L'enfant boit du lait de chèvre dans la cuisine.",
+    "Aujourd'hui, le petit chat s'est endormi près de la fenêtre !",
+    "Qu'est-ce qu'il a dit à l'éléphant, au juste ?",
+    "Les élèves étudient « l'histoire de France » jusqu'à midi.",
+    "Elle n'a jamais vu d'arc-en-ciel aussi éclatant ; c'était magnifique...",
+    "Où sont passés les œufs (et le beurre) que j'avais achetés hier ?",
+]
+
+
+def french_text(n_bytes: int, seed: int = 0) -> str:
+    """Texte d'environ n_bytes octets (UTF-8), en paragraphes de phrases tirées au hasard."""
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < n_bytes:
+        sentence = rng.choice(FRENCH_SENTENCES)
+        parts.append(sentence)
+        size += len(sentence.encode("utf-8")) + 1
+        if rng.random() < 0.1:
+            parts.append("\n")
+    return " ".join(parts)
+
+
+def sense_map(vocab: List[str], senses_per_term: int = 3, seed: int = 0) -> Dict[str, list]:
+    rng = random.Random(seed)
+    return {
+        w: [(f"{w}>sens{k}", rng.randint(1, 100)) for k in range(rng.randint(1, senses_per_term))]
+        for w in vocab
+    }
+
+
+def multiwords(vocab: List[str], n_mwe: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(vocab[:200], rng.randint(2, 3))) for _ in range(n_mwe)]
+
+
+def r1_dump(n_terms: int, senses_per_term: int = 4, seed: int = 0) -> bytes:
+    """Dump de sens au format R1 (latin-1), avec majuscules et accents comme le vrai fichier."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_terms):
+        term = f"Été{i}" if i % 7 == 0 else f"mot{i}"
+        for k in range(rng.randint(1, senses_per_term)):
+            lines.append(f"{term} ; {term}>Sens{k} ; {rng.randint(1, 500)}")
+    rng.shuffle(lines)
+    return ("\n".join(lines) + "\n").encode("latin-1")
+
+
+def mwe_dump(expressions: List[str]) -> bytes:
+    """Liste de mots composés au format ENTRIES-MWE (une ligne id;"expression";)."""
+    lines = [f'{i};"{expr}";' for i, expr in enumerate(expressions)]
+    return ("\n".join(lines) + "\n").encode("latin-1")
+
+
+def zipped(name: str, payload: bytes) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(name, payload)
+    return buf.getvalue()
+
+
+def make_data_dir(root: Path, vocab_size: int = 2000, n_mwe: int = 1000, seed: int = 0) -> Path:
+    """
+    Écrit dans root/data des caches frais (non expirés) pour les quatre ressources,
+    de sorte que l'analyse tourne sans aucun accès réseau.
+    """
+    data = Path(root) / "data"
+    data.mkdir(parents=True, exist_ok=True)
+    now = datetime.now()
+    rng = random.Random(seed)
+    vocab = vocabulary(vocab_size)
+    PickleBackend(data / "multiwords.pkl").save(multiwords(vocab, n_mwe, seed), now)
+    SenseIndex.build(data / "senses_index.bin", sense_map(vocab, seed=seed), now).close()
+    pos = {w: rng.choice(POS_CHOICES) for w in vocab}
+    pos.update(FUNCTION_WORDS)
+    vocab = vocab + sorted(FUNCTION_WORDS)
+    terms = shared_vocabulary(data)
+    records = {w: WordRelations(tags, {R_POS: tuple(sorted(tags.items(), key=lambda p: -p[1]))})
+               for w, tags in pos.items()}
+    SQLiteBackend(data / "pos_infos.pkl", terms).save(records, now)
+    SQLiteBackend(data / "jdm_dumps.pkl", terms).save(
+        {w: parse_rezo_dump(rezo_dump_page(w, n_relations=4).splitlines()) for w in vocab}, now
+    )
+    return data
@@ -0,0 +1,223 @@
+# suite.py : mesures de chaque étape du pipeline, hors-ligne, enregistrées pour comparer les révisions
+#
+#   python -m benchmarks.suite                       # échelles 1k, 10k, 100k tokens
+#   python -m benchmarks.suite --scales 1000 1000000
+#   python -m benchmarks.suite --baseline benchmarks/results/<fichier>.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import instrumentation
+import jdm_api
+from disambiguator_storage import LexicalSenseStorage
+from dump_parser import build_sense_index, parse_mwe_file
+from http_pool import HostRateLimiter
+from jdm_fetcher import JDMFetcher
+from memo_cache import SHARED_MEMO
+from multiword_detector import MultiWordDetector
+from relation_store import parse_rezo_dump
+from semantic_pipeline import GlobalAnalyzer
+from text_tokenizer import custom_tokenize
+from benchmarks.fake_jdm_server import FakeJDMServer, rezo_dump_page
+from benchmarks.fixtures import corpus, make_data_dir, multiwords, mwe_dump, r1_dump, vocabulary, zipped
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+VOCAB_SIZE = 20000
+N_MWE = 5000
+WORDS_PER_DOC = 60  # 5 phrases de 12 mots
+# Étapes de _analyze_text (noms des étapes d'instrumentation) reprises dans les résultats
+PIPELINE_STAGES = ("compounds", "disambiguation", "anaphora", "rules")
+
+
+def _revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@contextlib.contextmanager
+def _in_dir(path):
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def _row(seconds: float, tokens: int) -> Dict[str, float]:
+    return {"seconds": seconds, "tokens": tokens, "tokens_per_s": tokens / seconds if seconds else 0.0}
+
+
+def _point_to(server: FakeJDMServer):
+    """Aucune requête ne part vers les vrais hôtes : tout est servi par le serveur local."""
+    JDMFetcher.DUMP_URL = server.base_url + "/rezo-dump.php?gotermsubmit=Chercher&gotermrel={word}&rel="
+    jdm_api.API_ENDPOINT = server.base_url + "/v0/relations/from/{word}"
+    vocab = vocabulary(VOCAB_SIZE)
+    LexicalSenseStorage.SOURCE_URL = server.add_file("R1.txt.zip", zipped("R1.txt", r1_dump(VOCAB_SIZE)))
+    MultiWordDetector.DUMMY_URL = server.add_file("MWE.txt", mwe_dump(multiwords(vocab, N_MWE)))
+
+
+def bench_tokenize(docs: List[str], n_tokens: int) -> Dict[str, float]:
+    start = time.perf_counter()
+    for doc in docs:
+        custom_tokenize(doc.lower())
+    return _row(time.perf_counter() - start, n_tokens)
+
+
+def bench_pipeline(docs: List[str], n_tokens: int) -> Dict[str, Dict[str, float]]:
+    """
+    GlobalAnalyzer.analyze phrase par phrase, caches chauds. Le temps de chaque étape
+    est lu dans l'instrumentation (les mêmes mesures qu'en production).
+    """
+    analyzer = GlobalAnalyzer()
+    metrics = instrumentation.enable()
+    metrics.reset()
+    SHARED_MEMO.clear()
+    sentences = [s for doc in docs for s in GlobalAnalyzer._split_sentences(doc)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for sentence in sentences:
+            analyzer.analyze(sentence)
+        elapsed = time.perf_counter() - start
+    rows = {"end_to_end": _row(elapsed, n_tokens)}
+    for stage in metrics.snapshot()["stages"]:
+        if stage["stage"] in PIPELINE_STAGES:
+            rows[stage["stage"]] = _row(stage["seconds"], n_tokens)
+    return rows
+
+
+def bench_cold_start(docs: List[str], n_tokens: int) -> Dict[str, float]:
+    """
+    Analyse sans aucun cache : dumps et rezo-dump / relations téléchargés
+    depuis le serveur local (latence simulée), puis indexés. La limite de débit
+    par hôte (politesse envers jeuxdemots.org) est levée pour le serveur local.
+    """
+    with tempfile.TemporaryDirectory() as tmp, _in_dir(tmp):
+        SHARED_MEMO.clear()
+        analyzer = GlobalAnalyzer()
+        analyzer.jdm_data.rate_limiter = HostRateLimiter(0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for doc in docs:
+                analyzer.analyze(doc)
+            elapsed = time.perf_counter() - start
+    return _row(elapsed, n_tokens)
+
+
+def bench_dumps(n_terms: int, tmp: Path) -> Dict[str, Dict[str, float]]:
+    raw = r1_dump(n_terms)
+    (tmp / "r1.txt").write_bytes(raw)
+    start = time.perf_counter()
+    build_sense_index(tmp / "r1.txt", tmp / "r1.bin", datetime.now()).close()
+    sense = time.perf_counter() - start
+
+    (tmp / "mwe.txt").write_bytes(mwe_dump(multiwords(vocabulary(VOCAB_SIZE), n_terms)))
+    start = time.perf_counter()
+    parse_mwe_file(tmp / "mwe.txt")
+    mwe = time.perf_counter() - start
+    lines = rezo_dump_page("mot", n_relations=n_terms).splitlines()
+    start = time.perf_counter()
+    parse_rezo_dump(lines)
+    rezo = time.perf_counter() - start
+    return {"sense_dump_rebuild": _row(sense, n_terms), "mwe_dump_parse": _row(mwe, n_terms),
+            "rezo_dump_parse": _row(rezo, n_terms)}
+
+
+def run(scales=(1000, 10000, 100000), cold_scale: int = 1000, latency: float = 0.005) -> dict:
+    results = {}
+    with FakeJDMServer(latency=latency) as server, tempfile.TemporaryDirectory() as tmp:
+        _point_to(server)
+        make_data_dir(tmp, vocab_size=VOCAB_SIZE, n_mwe=N_MWE)
+        with _in_dir(tmp):
+            for scale in scales:
+                docs = corpus(max(1, scale // WORDS_PER_DOC), vocab_size=VOCAB_SIZE, function_words=0.15)
+                n_tokens = sum(len(custom_tokenize(doc.lower())) for doc in docs)
+                rows = {"tokenize": bench_tokenize(docs, n_tokens)}
+                rows.update(bench_pipeline(docs, n_tokens))
+                rows.update(bench_dumps(max(1000, scale // 10), Path(tmp)))
+                if scale == cold_scale:
+                    rows["cold_start"] = bench_cold_start(docs, n_tokens)
+                for name, row in rows.items():
+                    results[f"{name}@{scale}"] = row
+                    print(f"{name:20s} {scale:>8d} tokens  {row['seconds']:8.3f}s  "
+                          f"{row['tokens_per_s']:>12.0f} /s")
+    return {
+        "revision": _revision(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+
+def save(report: dict, out_dir: Path = RESULTS_DIR) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = report["date"].replace(":", "").replace("-", "")
+    path = out_dir / f"{stamp}-{report['revision']}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def latest(out_dir: Path = RESULTS_DIR, exclude: Optional[Path] = None) -> Optional[Path]:
+    candidates = sorted(p for p in out_dir.glob("*.json") if p != exclude)
+    return candidates[-1] if candidates else None
+
+
+def compare(report: dict, baseline_path: Path, threshold: float = 0.10) -> List[str]:
+    """Mesures plus lentes que la référence de plus de threshold (en temps par token)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nComparaison avec {baseline_path.name} (révision {baseline['revision']})")
+    regressions = []
+    for key, row in sorted(report["results"].items()):
+        old = baseline["results"].get(key)
+        if not old or not old["tokens_per_s"]:
+            continue
+        ratio = row["tokens_per_s"] / old["tokens_per_s"]
+        flag = ""
+        if ratio < 1 - threshold:
+            flag = "  <-- régression"
+            regressions.append(key)
+        print(f"{key:30s} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesures hors-ligne du pipeline sémantique")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="tailles de corpus en tokens (jusqu'à 1000000)")
+    parser.add_argument("--cold-scale", type=int, default=1000,
+                        help="échelle à laquelle mesurer le démarrage sans cache")
+    parser.add_argument("--baseline", type=Path, help="résultats de référence (par défaut : les derniers)")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    report = run(args.scales, cold_scale=args.cold_scale)
+    path = None if args.no_save else save(report)
+    if path:
+        print(f"\nRésultats enregistrés dans {path}")
+    baseline = args.baseline or latest(exclude=path)
+    if baseline:
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
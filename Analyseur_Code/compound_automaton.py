@@ -0,0 +1,87 @@
+# compound_automaton.py
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+
+class CompoundAutomaton:
+    """
+    Automate d'Aho-Corasick sur des séquences de tokens (et non de caractères).
+    Construit une seule fois à partir de la liste des mots composés, il permet de
+    retrouver toutes les occurrences (même chevauchantes) en un seul passage
+    sur la liste de tokens. Les tokens sont des identifiants du vocabulaire
+    (n'importe quelle valeur hachable convient).
+    """
+
+    def __init__(self):
+        self.goto: List[Dict[Hashable, int]] = [{}]
+        self.fail: List[int] = [0]
+        # Pour chaque état : les expressions reconnues, sous la forme (nb de tokens, expression)
+        self.output: List[List[Tuple[int, str]]] = [[]]
+
+    def add(self, tokens: List[Hashable], expression: str):
+        if not tokens:
+            return
+        state = 0
+        for tk in tokens:
+            nxt = self.goto[state].get(tk)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][tk] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = nxt
+        if (len(tokens), expression) not in self.output[state]:
+            self.output[state].append((len(tokens), expression))
+
+    def finalize(self):
+        """
+        Calcule les liens d'échec (parcours en largeur) et propage les sorties.
+        """
+        queue = deque()
+        for nxt in self.goto[0].values():
+            self.fail[nxt] = 0
+            queue.append(nxt)
+
+        while queue:
+            state = queue.popleft()
+            for tk, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and tk not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(tk, 0)
+                self.output[nxt].extend(self.output[self.fail[nxt]])
+
+    @classmethod
+    def build(cls, expressions: Iterable[Tuple[List[Hashable], str]]) -> "CompoundAutomaton":
+        automaton = cls()
+        for tokens, expression in expressions:
+            automaton.add(tokens, expression)
+        automaton.finalize()
+        return automaton
+
+    @property
+    def longest(self) -> int:
+        """Nombre de tokens de la plus longue expression (0 si l'automate est vide)."""
+        longest = self.__dict__.get("_longest")  # absent d'un automate sauvegardé avant
+        if longest is None:
+            longest = self._longest = max((length for out in self.output for length, _ in out), default=0)
+        return longest
+
+    def find_spans(self, tokens: List[Hashable]) -> List[Tuple[int, int, str]]:
+        """
+        Retourne toutes les occurrences sous forme (début, fin, expression),
+        la fin étant exclusive : tokens[début:fin] correspond à l'expression.
+        """
+        spans = []
+        state = 0
+        for i, tk in enumerate(tokens):
+            while state and tk not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(tk, 0)
+            for length, expression in self.output[state]:
+                spans.append((i + 1 - length, i + 1, expression))
+        spans.sort(key=lambda s: (s[0], s[1]))
+        return spans
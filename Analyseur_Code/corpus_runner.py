@@ -0,0 +1,69 @@
+# corpus_runner.py
+
+import gc
+import itertools
+import multiprocessing
+import os
+from typing import Iterable, Iterator, List, Optional
+
+from analysis_result import AnalysisResult
+from semantic_pipeline import GlobalAnalyzer
+from text_tokenizer import tokenize_batch
+
+# Analyseur hérité par les processus enfants (fork) : les tables en lecture seule
+# (index des sens en mmap, automate des mots composés) sont partagées copy-on-write.
+_WORKER_ANALYZER: Optional[GlobalAnalyzer] = None
+
+
+def _analyze_in_worker(text: str) -> AnalysisResult:
+    return _WORKER_ANALYZER.analyze(text)
+
+
+class CorpusRunner:
+    """
+    Répartit l'analyse d'un corpus sur plusieurs processus.
+
+    Les ressources sont chargées une fois dans le parent avant le fork. Pour chaque lot
+    de documents, le parent récupère d'abord (une seule fois par mot) les entrées JDM et
+    POS manquantes : les processus enfants ne font que lire les caches, deux enfants ne
+    demandent donc jamais le même mot. Les résultats sont rendus dans l'ordre du corpus.
+    """
+
+    def __init__(self, analyzer: Optional[GlobalAnalyzer] = None, processes: Optional[int] = None,
+                 batch_size: int = 256):
+        self.analyzer = analyzer or GlobalAnalyzer()
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+
+    def _warm_resources(self):
+        # Construit l'automate et ouvre l'index avant le fork
+        self.analyzer.multiw_store.automaton
+        self.analyzer.sense_storage.sense_map
+
+    def _prefetch(self, documents: List[str]):
+        vocabulary = list(dict.fromkeys(
+            tk for tokenized in tokenize_batch(documents) for tk in tokenized.tokens
+        ))
+        self.analyzer.jdm_data.fetch_entries_for_words(vocabulary)
+        self.analyzer.jdm_api.fetch_for_words(vocabulary)
+
+    def run(self, documents: Iterable[str]) -> Iterator[AnalysisResult]:
+        global _WORKER_ANALYZER
+        self._warm_resources()
+        _WORKER_ANALYZER = self.analyzer
+        # Les objets déjà créés ne sont plus parcourus par le GC : leurs pages restent partagées
+        gc.freeze()
+        ctx = multiprocessing.get_context("fork")
+        docs = iter(documents)
+        try:
+            with ctx.Pool(self.processes) as pool:
+                while True:
+                    batch = list(itertools.islice(docs, self.batch_size))
+                    if not batch:
+                        break
+                    self._prefetch(batch)
+                    chunksize = max(1, len(batch) // (self.processes * 4))
+                    yield from pool.imap(_analyze_in_worker, batch, chunksize=chunksize)
+        finally:
+            gc.unfreeze()
+            _WORKER_ANALYZER = None
@@ -1,58 +1,130 @@
 # disambiguator_storage.py
 
 import requests
-import io
-import zipfile
-import re
-import datetime
-from typing import Dict, List, Tuple
-from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlsplit
 
-from base_store import StorableResource
+from base_store import StorableResource, DATA_REPO
+from dump_download import download_file
+from dump_parser import DEFAULT_MEMORY_BUDGET, build_sense_index, extract_first_member
+from http_pool import make_session
+from sense_index import SenseIndex, SenseIndexBackend, np
 
 class LexicalSenseStorage(StorableResource):
     """
     Gère la désambiguïsation lexicale
     On récupère un ZIP (ex: JeuxDeMots) pour avoir des associations de sens.
+    Le cache est un index compact ouvert en mmap (voir sense_index.py) plutôt qu'un pickle.
+    Le ZIP est gardé dans data/ : il n'est téléchargé à nouveau que s'il a changé,
+    et l'index est reconstruit en flux depuis le fichier (voir dump_parser.py).
+    Les recherches se font par identifiant de terme (vocabulaire partagé).
+    resolve() désambiguïse un document entier d'un coup, à partir de la table des
+    meilleurs sens de chaque terme (TOP_K, construite avec l'index, voir sense_index.py).
     """
 
     SOURCE_URL = "https://www.jeuxdemots.org/JDM-LEXICALNET-FR/20241010-LEXICALNET-JEUXDEMOTS-R1.txt.zip"
-    REGEX_LINE = re.compile(r"^(.*?)\s;\s(.*?)\s;\s(\d+)$")
+
+    BACKEND = SenseIndexBackend
+    PARSE_WORKERS: Optional[int] = None  # None : un processus par cœur
+    MEMORY_BUDGET = DEFAULT_MEMORY_BUDGET
+    CONTEXT_WEIGHT = 0.5  # bonus d'un voisin en accord avec un sens, en fraction du poids du meilleur sens
 
     def __init__(self):
-        super().__init__(cache_filename="senses_cache.pkl")
+        self.session = make_session(pool_size=1)
+        super().__init__(cache_filename="senses_index.bin")
+
+    @property
+    def dump_path(self) -> Path:
+        return DATA_REPO / Path(urlsplit(self.SOURCE_URL).path).name
 
-    def _fetch_resource(self) -> Dict[str, List[Tuple[str, int]]]:
-        data_map = defaultdict(list)
+    def _fetch_resource(self) -> Union[SenseIndex, Dict[str, List[Tuple[str, int]]]]:
         try:
-            r = requests.get(self.SOURCE_URL)
-            r.raise_for_status()
-            with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
-                fname = zf.namelist()[0]
-                with zf.open(fname) as fl:
-                    for line in fl:
-                        line_str = line.decode("latin1").strip().lower()
-                        match = self.REGEX_LINE.match(line_str)
-                        if match:
-                            raw_term = match.group(1)
-                            splitted = match.group(2).split(">")
-                            if len(splitted) < 2:
-                                continue
-                            wgt = int(match.group(3))
-                            data_map[raw_term].append((splitted[1], wgt))
+            changed = download_file(self.session, self.SOURCE_URL, self.dump_path)
         except requests.RequestException as e:
             print(f"Error retrieving sense data: {e}")
-        return dict(data_map)
+            if self._resource_data is not None:
+                raise  # on garde l'index actuel, le rafraîchissement sera retenté
+            if not self.dump_path.exists():
+                return {}
+            changed = True  # pas d'index : on repart du ZIP déjà téléchargé
+        if not changed and self._resource_data is not None:
+            return self._resource_data
+
+        txt_path = extract_first_member(self.dump_path, self.dump_path.with_suffix(""))
+        try:
+            return build_sense_index(
+                txt_path, self.cache_path, datetime.now(),
+                workers=self.PARSE_WORKERS, memory_budget=self.MEMORY_BUDGET,
+            )
+        finally:
+            txt_path.unlink()
 
     @property
-    def sense_map(self) -> Dict[str, List[Tuple[str, int]]]:
-        return self.retrieve()
+    def sense_map(self) -> SenseIndex:
+        index = self.retrieve()
+        if not index.attached:
+            with self._load_lock:
+                if not index.attached:
+                    index.attach_vocabulary(self.vocabulary)
+        return index
 
     def find_best_sense(self, word: str) -> Tuple[str, int]:
         """
-        Retourne le sens le mieux 'pondéré' pour ce mot.
+        Retourne le sens le mieux 'pondéré' pour ce mot (précalculé dans l'index).
         """
-        possible_list = self.sense_map.get(word, [])
-        if not possible_list:
-            return ("", 0)
-        return max(possible_list, key=lambda x: x[1])
+        return self.best_sense_by_id(self.vocabulary.intern(word))
+
+    def best_sense_by_id(self, term_id: int) -> Tuple[str, int]:
+        return self.memo(term_id, lambda: self.sense_map.best_by_id(term_id), is_negative=lambda best: not best[0])
+
+    def resolve(self, tokens: Sequence[Union[str, int]], window: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Sens retenu pour chaque token d'un document (mots ou identifiants de terme ;
+        ("", 0) pour un terme sans sens ou un identifiant négatif).
+
+        Les candidats de tous les tokens (leurs TOP_K meilleurs sens) sont lus en une fois
+        et comparés par opérations sur tableaux : le coût ne dépend pas du nombre de sens
+        des termes. Sans window, c'est le meilleur sens de chaque terme (comme find_best_sense).
+        Avec window, les candidats sont reclassés selon les tokens à moins de window positions :
+        un sens gagne CONTEXT_WEIGHT (relatif au poids du meilleur sens du terme) pour chaque
+        voisin qui est sa glose (« chat>animal » près de « animal ») ou qui a un candidat de
+        même glose.
+        """
+        ids = [t if isinstance(t, int) else -1 for t in tokens]
+        words = [(k, t) for k, t in enumerate(tokens) if not isinstance(t, int)]
+        if words:
+            for (k, _), term_id in zip(words, self.vocabulary.intern_all([t for _, t in words])):
+                ids[k] = term_id
+        index = self.sense_map
+        # Identifiants comparés aux gloses (durables) : les provisoires écrits depuis sont traduits
+        ids = self.vocabulary.stored_ids(ids)
+        top = index.top_by_ids(ids) if ids else None
+        if top is None:  # sans numpy : token par token
+            return [self.best_sense_by_id(i) if i >= 0 else ("", 0) for i in ids]
+        senses, weights, glosses = top
+        choice = np.zeros(len(ids), dtype=np.int64)
+        if window:
+            choice = self._rerank(np.asarray(ids, dtype=np.int64), senses, weights, glosses, window)
+        picked = senses[np.arange(len(ids)), choice]
+        return [index.sense_at(int(j)) if j >= 0 else ("", 0) for j in picked]
+
+    def _rerank(self, ids, senses, weights, glosses, window: int):
+        n, k = senses.shape
+        # Voisins de chaque position (n, 2*window), -1 au-delà du document
+        offsets = np.concatenate([np.arange(-window, 0), np.arange(1, window + 1)])
+        positions = np.arange(n)[:, None] + offsets
+        inside = (positions >= 0) & (positions < n)
+        positions = np.clip(positions, 0, n - 1)
+        neighbour_ids = np.where(inside, ids[positions], -1)
+        neighbour_glosses = np.where(inside[:, :, None], glosses[positions], -1)  # (n, 2*window, k)
+        candidate = glosses[:, :, None]  # (n, k, 1)
+        valid = (senses >= 0) & (glosses >= 0)
+        # Voisin égal à la glose, ou voisin dont un candidat a la même glose
+        agrees = (candidate == neighbour_ids[:, None, :]) | (
+            candidate[:, :, :, None] == neighbour_glosses[:, None, :, :]).any(axis=3)
+        bonus = np.where(valid, agrees.sum(axis=2), 0)
+        scale = np.maximum(np.abs(weights[:, :1]), 1).astype(np.float64)
+        scores = np.where(senses >= 0, weights / scale + self.CONTEXT_WEIGHT * bonus, -np.inf)
+        return scores.argmax(axis=1)  # à score égal, le premier : le sens le plus lourd
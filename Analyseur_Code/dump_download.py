@@ -0,0 +1,87 @@
+# dump_download.py
+
+import json
+import os
+from pathlib import Path
+
+import requests
+
+import instrumentation
+CHUNK_SIZE = 1 << 20  # écriture sur disque par blocs de 1 Mo
+
+
+def _meta_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".meta.json")
+
+
+def _read_meta(dest: Path) -> dict:
+    try:
+        with open(_meta_path(dest), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(dest: Path, meta: dict):
+    tmp_path = _meta_path(dest).with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(dest))
+
+
+def download_file(session: requests.Session, url: str, dest: Path, timeout: float = 60.0) -> bool:
+    """
+    Télécharge url dans dest en flux (jamais entièrement en mémoire).
+
+    - Un téléchargement interrompu reprend là où il s'était arrêté (en-tête Range,
+      avec If-Range pour repartir de zéro si le fichier a changé entre-temps).
+    - Si dest est déjà complet, la requête est conditionnelle (If-None-Match /
+      If-Modified-Since) : un fichier inchangé n'est pas téléchargé à nouveau.
+
+    Renvoie True si dest a un nouveau contenu, False s'il est inchangé.
+    Les validateurs (ETag, Last-Modified) sont conservés dans dest.meta.json.
+    """
+    dest = Path(dest)
+    part = dest.with_name(dest.name + ".part")
+    meta = _read_meta(dest)
+    validator = meta.get("etag") or meta.get("last_modified")
+
+    headers = {}
+    offset = part.stat().st_size if part.exists() else 0
+    if offset and validator:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+    elif dest.exists() and meta.get("complete"):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    instrumentation.METRICS.count("http_requests", resource=dest.name)
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+        if resp.status_code == 304:
+            return False
+        if resp.status_code == 416:
+            # La partie déjà reçue ne correspond plus au fichier distant
+            part.unlink()
+            _write_meta(dest, {})
+            return download_file(session, url, dest, timeout)
+        resp.raise_for_status()
+
+        resumed = resp.status_code == 206
+        if not resumed:
+            meta = {
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+            }
+        meta["complete"] = False
+        _write_meta(dest, meta)
+        with open(part, "ab" if resumed else "wb") as f:
+            for block in resp.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(block)
+                instrumentation.METRICS.count("http_bytes", len(block), resource=dest.name)
+
+    os.replace(part, dest)
+    meta["complete"] = True
+    _write_meta(dest, meta)
+    return True
@@ -0,0 +1,173 @@
+# dump_parser.py
+
+import heapq
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from sense_index import SenseIndex, SenseIndexWriter
+
+# Budget mémoire d'une reconstruction : il borne la taille des morceaux lus par chaque
+# processus (un morceau analysé occupe environ EXPANSION fois sa taille en objets Python).
+DEFAULT_MEMORY_BUDGET = 256 << 20
+EXPANSION = 8
+RUN_BATCH = 1000  # enregistrements par bloc dans les fichiers de tri intermédiaires
+
+# Minuscules latin-1 appliquées directement aux octets (équivalent de str.lower()
+# pour les caractères qui restent dans latin-1)
+LOWER_LATIN1 = bytes(
+    ord(chr(i).lower()) if len(chr(i).lower()) == 1 and ord(chr(i).lower()) < 256 else i
+    for i in range(256)
+)
+
+
+def chunk_size_for(memory_budget: int, workers: int) -> int:
+    return max(1 << 20, memory_budget // (max(workers, 1) * EXPANSION))
+
+
+def chunk_ranges(path: Path, chunk_size: int) -> List[Tuple[int, int]]:
+    """Découpe le fichier en intervalles d'octets qui finissent sur une fin de ligne."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                f.seek(end)
+                end += len(f.readline())
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _read_chunk(path: Path, start: int, end: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start).translate(LOWER_LATIN1)
+
+
+def parse_sense_lines(data: bytes) -> Iterator[Tuple[str, str, int]]:
+    """
+    Lignes « terme ; a>sens ; poids » (déjà en minuscules) -> (terme, sens, poids).
+    Le terme s'arrête au premier " ; ", le poids suit le dernier.
+    """
+    for line in data.split(b"\n"):
+        line = line.strip()
+        i = line.find(b" ; ")
+        j = line.rfind(b" ; ")
+        if i < 0 or j == i:
+            continue
+        weight = line[j + 3:]
+        if not weight.isdigit():
+            continue
+        splitted = line[i + 3:j].split(b">")
+        if len(splitted) < 2:
+            continue
+        yield line[:i].decode("latin-1"), splitted[1].decode("latin-1"), int(weight)
+
+
+def _sort_sense_chunk(args) -> str:
+    """
+    Analyse un morceau et l'écrit trié par terme dans un fichier de tri (run).
+    Le numéro de ligne garde l'ordre du fichier pour les sens de même poids.
+    """
+    path, start, end, chunk_no, run_dir = args
+    records = [
+        (term, chunk_no, seq, sense, weight)
+        for seq, (term, sense, weight) in enumerate(parse_sense_lines(_read_chunk(path, start, end)))
+    ]
+    records.sort()
+    run_path = os.path.join(run_dir, f"run{chunk_no:06d}.pkl")
+    with open(run_path, "wb") as f:
+        for k in range(0, len(records), RUN_BATCH):
+            pickle.dump(records[k:k + RUN_BATCH], f, protocol=pickle.HIGHEST_PROTOCOL)
+    return run_path
+
+
+def _read_run(run_path: str):
+    with open(run_path, "rb") as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+def build_sense_index(txt_path: Path, index_path: Path, last_save: datetime,
+                      workers: Optional[int] = None,
+                      memory_budget: int = DEFAULT_MEMORY_BUDGET) -> SenseIndex:
+    """
+    Construit l'index de sens directement depuis le dump texte, par tri externe :
+    les morceaux sont analysés en parallèle et triés chacun dans un fichier,
+    puis fusionnés en flux dans un SenseIndexWriter. Seul un morceau par processus
+    (et un bloc par fichier de tri pendant la fusion) est en mémoire à un instant donné.
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = chunk_ranges(txt_path, chunk_size_for(memory_budget, workers))
+    with tempfile.TemporaryDirectory(dir=Path(index_path).parent) as run_dir:
+        tasks = [(str(txt_path), start, end, n, run_dir) for n, (start, end) in enumerate(ranges)]
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                runs = list(pool.map(_sort_sense_chunk, tasks))
+        else:
+            runs = [_sort_sense_chunk(task) for task in tasks]
+
+        writer = SenseIndexWriter(index_path)
+        merged = heapq.merge(*(_read_run(run) for run in runs))
+        for term, records in itertools.groupby(merged, key=lambda r: r[0]):
+            writer.add(term, [(sense, weight) for _, _, _, sense, weight in records])
+        writer.close(last_save)
+    return SenseIndex(index_path)
+
+
+def parse_mwe_lines(data: bytes) -> List[str]:
+    """Lignes « id;"expression"; » (déjà en minuscules) -> expressions."""
+    found = []
+    for line in data.split(b"\n"):
+        line = line.strip()
+        i = line.find(b';"')
+        if i <= 0 or not line[:i].isdigit():
+            continue
+        j = line.rfind(b'";')
+        if j > i + 2:
+            found.append(line[i + 2:j].decode("latin-1"))
+    return found
+
+
+def _parse_mwe_chunk(args) -> List[str]:
+    path, start, end = args
+    return parse_mwe_lines(_read_chunk(path, start, end))
+
+
+def parse_mwe_file(txt_path: Path, workers: Optional[int] = None,
+                   memory_budget: int = DEFAULT_MEMORY_BUDGET) -> List[str]:
+    """Liste des mots composés du dump, dans l'ordre du fichier, analysée par morceaux."""
+    workers = workers or os.cpu_count() or 1
+    tasks = [(str(txt_path), start, end)
+             for start, end in chunk_ranges(txt_path, chunk_size_for(memory_budget, workers))]
+    compound_words = []
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for words in pool.map(_parse_mwe_chunk, tasks):
+                compound_words.extend(words)
+    else:
+        for task in tasks:
+            compound_words.extend(_parse_mwe_chunk(task))
+    return compound_words
+
+
+def extract_first_member(zip_path: Path, dest: Path) -> Path:
+    """Décompresse en flux le premier fichier de l'archive (sans le charger en mémoire)."""
+    with zipfile.ZipFile(zip_path) as zf:
+        with zf.open(zf.namelist()[0]) as src, open(dest, "wb") as out:
+            shutil.copyfileobj(src, out, 1 << 20)
+    return dest
@@ -0,0 +1,278 @@
+# graph_export.py
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+
+from analysis_graph import AnalysisGraph, _LABELS, rel_id
+
+Position = Tuple[float, float]
+
+EXPORT_FORMATS = (".json", ".graphml", ".dot", ".gv")
+
+
+# Parcours des tableaux en colonnes (sans copie networkx)
+
+def graph_of(graph) -> AnalysisGraph:
+    """Le graphe lui-même, ou celui d'un AnalysisResult (résultat de GlobalAnalyzer.analyze)."""
+    return getattr(graph, "g", graph)
+
+
+def _alive_nodes(graph: AnalysisGraph) -> List[int]:
+    dead = graph._dead_nodes
+    return [i for i in range(len(graph.names)) if i not in dead] if dead else list(range(len(graph.names)))
+
+
+def _alive_edges(graph: AnalysisGraph):
+    """(src, dst, label, poids) de chaque arête vivante, dans l'ordre d'ajout."""
+    src, dst, rel, weight, dead = graph.src, graph.dst, graph.rel, graph.weight, graph._dead_edges
+    for e in range(len(src)):
+        if dead and e in dead:
+            continue
+        yield src[e], dst[e], _LABELS[rel[e]], weight[e]
+
+
+# Export
+
+def to_json(graph: AnalysisGraph, out_file) -> None:
+    """Format node-link (celui de networkx.node_link_data) : {"nodes": [...], "links": [...]}."""
+    names, tokens = graph.names, graph.tokens
+    with open(out_file, "w", encoding="utf-8") as f:
+        f.write('{"directed": true, "multigraph": true, "nodes": [')
+        for k, i in enumerate(_alive_nodes(graph)):
+            node = {"id": names[i]} if tokens[i] is None else {"id": names[i], "token": tokens[i]}
+            f.write(("," if k else "") + json.dumps(node, ensure_ascii=False))
+        f.write('], "links": [')
+        for k, (s, d, label, w) in enumerate(_alive_edges(graph)):
+            link = {"source": names[s], "target": names[d], "label": label, "weight": w}
+            f.write(("," if k else "") + json.dumps(link, ensure_ascii=False))
+        f.write("]}\n")
+
+
+def to_graphml(graph: AnalysisGraph, out_file) -> None:
+    """GraphML lisible par networkx.read_graphml, Gephi ou yEd (attributs token, label, weight)."""
+    names, tokens = graph.names, graph.tokens
+    with open(out_file, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                '<key id="token" for="node" attr.name="token" attr.type="string"/>\n'
+                '<key id="label" for="edge" attr.name="label" attr.type="string"/>\n'
+                '<key id="weight" for="edge" attr.name="weight" attr.type="double"/>\n'
+                '<graph edgedefault="directed">\n')
+        for i in _alive_nodes(graph):
+            if tokens[i] is None:
+                f.write(f"<node id={quoteattr(names[i])}/>\n")
+            else:
+                f.write(f"<node id={quoteattr(names[i])}><data key=\"token\">"
+                        f"{quoteattr(tokens[i])[1:-1]}</data></node>\n")
+        for s, d, label, w in _alive_edges(graph):
+            f.write(f"<edge source={quoteattr(names[s])} target={quoteattr(names[d])}>"
+                    f"<data key=\"label\">{quoteattr(label)[1:-1]}</data>"
+                    f"<data key=\"weight\">{w:g}</data></edge>\n")
+        f.write("</graph>\n</graphml>\n")
+
+
+def _dot_id(name: str) -> str:
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def to_dot(graph: AnalysisGraph, out_file, positions: Optional[Dict[str, Position]] = None) -> None:
+    """
+    DOT pour Graphviz ; avec positions (ex. layered_layout), les nœuds sont figés
+    (à rendre avec neato -n) au lieu d'être placés par dot.
+    """
+    names = graph.names
+    with open(out_file, "w", encoding="utf-8") as f:
+        f.write("digraph G {\n  rankdir=LR;\n  node [shape=box];\n")
+        for i in _alive_nodes(graph):
+            pos = positions.get(names[i]) if positions else None
+            attrs = f' [pos="{pos[0] * 72:g},{pos[1] * 72:g}!"]' if pos else ""
+            f.write(f"  {_dot_id(names[i])}{attrs};\n")
+        for s, d, label, _ in _alive_edges(graph):
+            f.write(f"  {_dot_id(names[s])} -> {_dot_id(names[d])} [label={_dot_id(label)}];\n")
+        f.write("}\n")
+
+
+def export(graph, out_file, fmt: Optional[str] = None) -> str:
+    """Écrit le graphe (ou celui d'un AnalysisResult) au format donné par fmt, ou sinon par l'extension de out_file."""
+    graph = graph_of(graph)
+    fmt = (fmt or Path(out_file).suffix).lower()
+    if not fmt.startswith("."):
+        fmt = "." + fmt
+    if fmt == ".json":
+        to_json(graph, out_file)
+    elif fmt == ".graphml":
+        to_graphml(graph, out_file)
+    elif fmt in (".dot", ".gv"):
+        to_dot(graph, out_file)
+    else:
+        raise ValueError(f"format d'export inconnu : {fmt} (attendu : {', '.join(EXPORT_FORMATS)})")
+    return str(out_file)
+
+
+# Disposition
+
+def layered_layout(graph: AnalysisGraph) -> Dict[str, Position]:
+    """
+    Disposition en couches qui suit l'ordre r_succ, en O(nœuds + arêtes) :
+
+    - x : rang de chaque token dans la chaîne r_succ (plus long chemin depuis _START) ;
+      les nœuds pris dans un cycle (graphe partagé, token répété) sont rangés à la suite ;
+    - y = 0 pour les tokens, 1 pour les expressions composées ;
+    - les autres nœuds (POS, sens...) sont empilés sous le premier token auquel ils sont reliés.
+    """
+    names, tokens = graph.names, graph.tokens
+    alive = _alive_nodes(graph)
+    succ = rel_id("r_succ")
+    is_token = [tk is not None for tk in tokens]
+
+    nexts: Dict[int, List[int]] = {}
+    indeg = [0] * len(names)
+    anchor: Dict[int, int] = {}  # nœud sans token -> premier token voisin
+    for s, d, r, e in zip(graph.src, graph.dst, graph.rel, range(len(graph.src))):
+        if graph._dead_edges and e in graph._dead_edges:
+            continue
+        if r == succ:
+            nexts.setdefault(s, []).append(d)
+            indeg[d] += 1
+        elif is_token[s] != is_token[d]:
+            other, tk = (d, s) if is_token[s] else (s, d)
+            anchor.setdefault(other, tk)
+
+    # Plus long chemin le long de r_succ (Kahn)
+    rank = [0] * len(names)
+    ready = [i for i in alive if is_token[i] and indeg[i] == 0]
+    placed = set()
+    while ready:
+        i = ready.pop()
+        placed.add(i)
+        for j in nexts.get(i, ()):
+            rank[j] = max(rank[j], rank[i] + 1)
+            indeg[j] -= 1
+            if indeg[j] == 0:
+                ready.append(j)
+    last = max((rank[i] for i in placed), default=-1)
+    for i in alive:
+        if is_token[i] and i not in placed:
+            last += 1
+            rank[i] = last
+
+    pos: Dict[str, Position] = {}
+    stacked: Dict[int, int] = {}
+    free = []  # nœuds isolés des tokens : une dernière rangée, sous les autres
+    for i in alive:
+        if is_token[i]:
+            pos[names[i]] = (float(rank[i]), 1.0 if " " in tokens[i] else 0.0)
+        elif i in anchor:
+            x = rank[anchor[i]]
+            stacked[x] = stacked.get(x, 0) + 1
+            pos[names[i]] = (float(x), -float(stacked[x]))
+        else:
+            free.append(i)
+    y = -float(max(stacked.values(), default=0) + 2)
+    for x, i in enumerate(free):
+        pos[names[i]] = (float(x), y)
+    return pos
+
+
+def spring_layout(graph: AnalysisGraph, nodes: List[str]) -> Dict[str, Position]:
+    """Disposition par forces de networkx (l'ancien rendu), à réserver aux petits graphes."""
+    import networkx as nx
+
+    keep = set(nodes)
+    g = nx.DiGraph()
+    g.add_nodes_from(nodes)
+    g.add_edges_from((u, v) for u, v in graph.edges() if u in keep and v in keep)
+    return {name: (float(x), float(y)) for name, (x, y) in nx.spring_layout(g, k=2, iterations=50).items()}
+
+
+# Rendu
+
+class _Drawing:
+    """Ce qu'il faut pour dessiner, copié du graphe : le rendu peut tourner pendant que le graphe change."""
+
+    def __init__(self, graph: AnalysisGraph, max_nodes: Optional[int], layout: str):
+        positions = layered_layout(graph) if layout == "layered" else None
+        if positions is not None:
+            order = sorted(positions, key=lambda name: (positions[name][0], -positions[name][1]))
+        else:
+            order = list(graph.nodes())
+        self.hidden = 0
+        if max_nodes is not None and len(order) > max_nodes:
+            self.hidden = len(order) - max_nodes
+            order = order[:max_nodes]
+        if positions is None:
+            positions = spring_layout(graph, order) if layout == "spring" else None
+            if positions is None:
+                raise ValueError(f"disposition inconnue : {layout} (attendu : layered, spring)")
+        self.positions = {name: positions[name] for name in order}
+        keep = self.positions
+        labels: Dict[Tuple[str, str], List[str]] = {}
+        for u, v, data in graph.edges(data=True):
+            if u in keep and v in keep:
+                labels.setdefault((u, v), []).append(data["label"])
+        self.edges = {uv: ", ".join(ls) for uv, ls in labels.items()}
+
+    def render(self, out_file: str, title: str, dpi: int):
+        # Figure sans pyplot : pas d'état global, utilisable depuis un thread de rendu
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        xs = [x for x, _ in self.positions.values()] or [0.0]
+        ys = [y for _, y in self.positions.values()] or [0.0]
+        width = min(max((max(xs) - min(xs)) * 1.6 + 2, 6), 80)
+        height = min(max((max(ys) - min(ys)) * 0.8 + 2, 4), 40)
+        if len(set(xs)) > 1 and max(xs) - min(xs) <= 2:  # disposition spring, dans [-1, 1]
+            width = height = min(max(len(self.positions) ** 0.5 * 2, 6), 40)
+
+        fig = Figure(figsize=(width, height))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.set_axis_off()
+        for (u, v), label in self.edges.items():
+            (x0, y0), (x1, y1) = self.positions[u], self.positions[v]
+            ax.annotate("", xy=(x1, y1), xytext=(x0, y0),
+                        arrowprops=dict(arrowstyle="->", color="grey", lw=0.6, shrinkA=12, shrinkB=12))
+            ax.text((x0 + x1) / 2, (y0 + y1) / 2, label, fontsize=5, ha="center", va="center", color="dimgrey")
+        for name, (x, y) in self.positions.items():
+            ax.text(x, y, name, fontsize=7, fontweight="bold", ha="center", va="center",
+                    bbox=dict(boxstyle="round", fc="lightgreen", ec="none"))
+        ax.set_xlim(min(xs) - 1, max(xs) + 1)
+        ax.set_ylim(min(ys) - 1, max(ys) + 1)
+        if self.hidden:
+            title = f"{title} ({self.hidden} nœuds non affichés)"
+        ax.set_title(title)
+        fig.savefig(out_file, dpi=dpi, bbox_inches="tight")
+        return out_file
+
+
+_RENDER_POOL: Optional[ThreadPoolExecutor] = None
+_RENDER_LOCK = threading.Lock()
+
+
+def _render_pool() -> ThreadPoolExecutor:
+    # Un seul thread : matplotlib n'aime pas les rendus simultanés
+    global _RENDER_POOL
+    with _RENDER_LOCK:
+        if _RENDER_POOL is None:
+            _RENDER_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        return _RENDER_POOL
+
+
+def render(graph, out_file: str, title: str = "Semantic Graph",
+           max_nodes: Optional[int] = 300, layout: str = "layered", dpi: int = 100,
+           background: bool = False):
+    """
+    Dessine au plus max_nodes nœuds du graphe (ou d'un AnalysisResult) : le début du texte,
+    avec leurs POS et sens, en PNG, SVG, PDF...
+    La disposition et la copie des nœuds et arêtes à dessiner se font tout de suite ;
+    avec background=True, le dessin est fait par un thread de rendu et un Future est renvoyé.
+    """
+    drawing = _Drawing(graph_of(graph), max_nodes, layout)
+    if background:
+        return _render_pool().submit(drawing.render, str(out_file), title, dpi)
+    return drawing.render(str(out_file), title, dpi)
+
@@ -0,0 +1,130 @@
+# http_pool.py
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import instrumentation
+
+# (connexion, lecture) en secondes : un serveur bloqué ne bloque pas l'analyse indéfiniment
+HTTP_TIMEOUT = (3.05, 10.0)
+
+
+def make_session(pool_size: int = 8, retries: int = 3, backoff: float = 0.5) -> requests.Session:
+    """
+    Session HTTP partagée : connexions keep-alive réutilisées (pool de taille pool_size)
+    et nouvelles tentatives avec attente exponentielle sur les erreurs transitoires.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HostRateLimiter:
+    """
+    Limite le nombre de requêtes par seconde vers chaque hôte (partagé entre threads).
+    """
+
+    def __init__(self, per_second: float = 10.0):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class InflightRequests:
+    """
+    Regroupe les requêtes en cours pour une même clé (ex. identifiant de terme) :
+    le premier demandeur fait l'appel réseau, les suivants attendent son résultat
+    au lieu de lancer le leur. Partagé entre threads.
+    resource : label du compteur http_coalesced (voir instrumentation.py).
+    """
+
+    def __init__(self, resource: str = ""):
+        self.resource = resource
+        self._futures: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0  # demandes servies par l'appel d'un autre thread
+
+    def claim(self, keys: Iterable[Hashable]) -> Tuple[List[Hashable], Dict[Hashable, Future]]:
+        """
+        Renvoie (clés à charger par l'appelant, futures des clés déjà en cours ailleurs).
+        L'appelant doit ensuite appeler settle() pour toutes les clés qu'il a obtenues.
+        """
+        owned, waiting = [], {}
+        with self._lock:
+            for key in keys:
+                future = self._futures.get(key)
+                if future is None:
+                    self._futures[key] = Future()
+                    owned.append(key)
+                else:
+                    waiting[key] = future
+            self.coalesced += len(waiting)
+        if waiting:
+            instrumentation.METRICS.count("http_coalesced", len(waiting), resource=self.resource)
+        return owned, waiting
+
+    def settle(self, keys: Iterable[Hashable], results: Dict[Hashable, Any], error: BaseException = None):
+        """Publie le résultat (ou l'erreur) des clés chargées et réveille ceux qui les attendent."""
+        with self._lock:
+            futures = [(key, self._futures.pop(key)) for key in keys]
+        for key, future in futures:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results.get(key))
+
+    def run(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """loader() pour key, sauf si un autre thread le fait déjà : on attend alors son résultat."""
+        owned, waiting = self.claim((key,))
+        if waiting:
+            return waiting[key].result()
+        try:
+            value = loader()
+        except BaseException as e:
+            self.settle(owned, {}, e)
+            raise
+        self.settle(owned, {key: value})
+        return value
+
+    def run_many(self, keys: Iterable[Hashable], loader: Callable[[List[Hashable]], Dict[Hashable, Any]]):
+        """
+        loader(clés) pour les clés que personne ne charge déjà (il renvoie {clé: résultat}),
+        puis attend la fin des chargements en cours ailleurs pour les autres.
+        """
+        owned, waiting = self.claim(keys)
+        results = {}
+        try:
+            if owned:
+                results = loader(owned)
+        except BaseException as e:
+            self.settle(owned, {}, e)
+            raise
+        self.settle(owned, results)
+        for future in waiting.values():
+            future.result()
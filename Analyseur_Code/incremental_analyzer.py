@@ -0,0 +1,349 @@
+# incremental_analyzer.py
+
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import instrumentation
+from analysis_graph import AnalysisGraph
+from analysis_result import AnalysisResult
+from semantic_pipeline import GlobalAnalyzer
+from text_tokenizer import tokenize
+
+
+class Edit(NamedTuple):
+    """Effet d'une mise à jour (indices de tokens, sans _START) : tokens retirés, insérés, fenêtre recalculée."""
+    removed: int
+    inserted: int
+    start: int
+    stop: int
+
+
+def _common_prefix(a: str, b: str) -> int:
+    # Dichotomie : chaque comparaison de tranches est faite en C, et ne relit que la partie non vérifiée
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class _Positions:
+    """
+    Débuts des tokens dans le texte, rangés par blocs avec un décalage par bloc : après une
+    modification, décaler toute la fin du texte coûte un ajout par bloc et non par token.
+    """
+
+    BLOCK = 512
+
+    def __init__(self):
+        self.blocks: List[array] = [array("i")]
+        self.shifts: List[int] = [0]
+
+    def bisect(self, x: int) -> int:
+        """Nombre de tokens qui commencent avant x."""
+        k = 0
+        for blk, shift in zip(self.blocks, self.shifts):
+            if blk and blk[-1] + shift >= x:
+                return k + bisect_left(blk, x - shift)
+            k += len(blk)
+        return k
+
+    def replace(self, k1: int, k2: int, values: array, shift: int):
+        """Remplace les débuts [k1, k2) par values et décale ceux d'après de shift."""
+        first, offset = 0, 0
+        while first < len(self.blocks) - 1 and offset + len(self.blocks[first]) < k1:
+            offset += len(self.blocks[first])
+            first += 1
+        last, end = first, offset + len(self.blocks[first])
+        while last < len(self.blocks) - 1 and end < k2:
+            last += 1
+            end += len(self.blocks[last])
+        merged = array("i")
+        for blk, sh in zip(self.blocks[first:last + 1], self.shifts[first:last + 1]):
+            merged.extend(x + sh for x in blk)
+        merged[k1 - offset:k2 - offset] = values
+        tail = k1 - offset + len(values)
+        merged[tail:] = array("i", (x + shift for x in merged[tail:]))
+        pieces = [merged[k:k + self.BLOCK] for k in range(0, len(merged), self.BLOCK)] or [array("i")]
+        self.blocks[first:last + 1] = pieces
+        self.shifts[first:last + 1] = [0] * len(pieces)
+        for k in range(first + len(pieces), len(self.shifts)):
+            self.shifts[k] += shift
+
+
+class IncrementalAnalyzer:
+    """
+    Analyse d'un texte modifié au fil de l'eau (ex. un éditeur qui envoie le texte à chaque frappe) :
+
+        doc = IncrementalAnalyzer()
+        doc.update("Le chat mange la souris.")
+        doc.update("Le chat noir mange la souris.")  # seuls les environs de « noir » sont recalculés
+        doc.g                                         # graphe à jour
+
+    Le nouveau texte est comparé à l'ancien (préfixe et suffixe communs) ; seuls les morceaux
+    modifiés sont re-tokenisés, et les tokens inchangés gardent leur nœud. Les tokens retirés
+    disparaissent du graphe avec tout ce qui en découlait. Chaque étape n'est refaite que sur
+    la fenêtre modifiée élargie de sa portée : la plus longue expression composée, la fenêtre
+    de contexte des sens, la fenêtre des anaphores et la portée des règles (RuleEngine.reach).
+    Le coût d'une mise à jour dépend de la taille de la modification, pas du document.
+
+    Le graphe est celui qu'aurait produit GlobalAnalyzer.analyze sur le texte complet, à ceci près
+    que les nœuds sont nommés "token#n" avec n un numéro de création et non la position.
+    Les ressources lexicales sont celles de l'analyseur donné (ou d'un nouveau GlobalAnalyzer).
+    """
+
+    def __init__(self, analyzer: Optional[GlobalAnalyzer] = None):
+        self.analyzer = analyzer if analyzer is not None else GlobalAnalyzer()
+        self.result = AnalysisResult()
+        self.text = ""
+        self._serial = 0
+        # Les nœuds des tokens (_START et _END compris) sont en tête de result.nodes, suivis des composés
+        self._ids = array("i", [-1, -1])  # identifiant de terme de chaque nœud de token
+        self._starts = _Positions()  # début de chaque token dans le texte
+        self._compounds: Dict[str, Tuple[str, ...]] = {}  # nœud composé -> nœuds des tokens couverts
+        self._covering: Dict[str, Set[str]] = {}  # nœud de token -> composés qui le couvrent
+        start, end = self._make_node("_START"), self._make_node("_END")
+        self.result.nodes[:] = [start, end]
+        self.result.token_list[:] = ["_START", "_END"]
+        self.result.link(start, end, "r_succ")
+
+    @property
+    def g(self) -> AnalysisGraph:
+        return self.result.g
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self._ids) - 2
+
+    def _make_node(self, token: str) -> str:
+        node = self.result.node_for(self._serial, token)
+        self._serial += 1
+        self.result.g.add_node(node, token)
+        self.result.rules_engine.index_token(node, token)
+        return node
+
+    # Mise à jour
+
+    def update(self, text: str) -> Edit:
+        """Remplace le texte analysé par text et met le graphe à jour ; renvoie l'étendue de la modification."""
+        metrics = instrumentation.METRICS
+        res = self.result
+        with metrics.stage("tokenize", graph=res.g):
+            k1, k2, tokenized, starts = self._diff(text)
+            old_ids = self._ids[1 + k1:1 + k2]
+            new_ids = tokenized.ids
+            # Tokens identiques aux deux bouts de la zone modifiée : leurs nœuds sont gardés
+            i = 0
+            while i < len(new_ids) and i < len(old_ids) and new_ids[i] == old_ids[i]:
+                i += 1
+            j = 0
+            while j < len(new_ids) - i and j < len(old_ids) - i and new_ids[-1 - j] == old_ids[-1 - j]:
+                j += 1
+            self._starts.replace(k1, k2, starts, len(text) - len(self.text))
+            self.text = self.result.text = text
+        tokens, ids = tokenized.tokens[i:len(new_ids) - j], new_ids[i:len(new_ids) - j]
+        a, b_old = 1 + k1 + i, 1 + k2 - j  # nœuds [a, b_old) remplacés par len(tokens) nouveaux nœuds
+        if a == b_old and not tokens:
+            return Edit(0, 0, a - 1, a - 1)
+        metrics.count("incremental_tokens", len(tokens))
+        removed = b_old - a
+
+        frontier = self._frontier()
+        with metrics.stage("retract", graph=res.g):
+            dirty = self._retract(a, b_old, frontier)
+        with metrics.stage("succession", graph=res.g):
+            new_nodes = self._splice(a, b_old, tokens, ids)
+        b = a + len(new_nodes)
+        with metrics.stage("jdm_fetch", graph=res.g):
+            self.analyzer.jdm_data.fetch_entries_for_words(tokens)
+        with metrics.stage("pos", graph=res.g):
+            self.analyzer._tag_nodes(res, new_nodes, ids)
+        with metrics.stage("compounds", graph=res.g):
+            new_compounds = self._add_compounds(a, b, frontier["compounds"])
+        with metrics.stage("disambiguation", graph=res.g):
+            self._resolve(a, b, frontier["senses"], new_compounds)
+        with metrics.stage("anaphora", graph=res.g):
+            n = len(self._ids)
+            res.anaphora_module.link_range(res.nodes[:n], max(0, a - frontier["anaphora"]),
+                                           min(n, b + frontier["anaphora"] + 1))
+        with metrics.stage("rules", graph=res.g):
+            engine = res.rules_engine
+            if frontier["rules"] is None:
+                engine.reseed(res.nodes)  # règles non locales : tout est rejoint
+            else:
+                reach = frontier["rules"]
+                engine.reseed([node for node in dirty if node in res.g])
+                engine.reseed(res.nodes[max(0, a - reach):a] + res.nodes[b:min(len(self._ids), b + reach)])
+            engine.apply_rules()
+        window = frontier["rules"] if frontier["rules"] is not None else len(self._ids)
+        return Edit(removed, len(tokens), max(0, a - 1 - window), min(self.n_tokens, b - 1 + window))
+
+    def _diff(self, text: str):
+        """
+        Zone modifiée : tokens [k1, k2) de l'ancien texte, remplacés par les tokens (et leurs
+        débuts) de la partie correspondante du nouveau texte, re-tokenisée seule. La zone est
+        élargie aux espaces : un token ne dépend que du morceau sans espace qui le contient.
+        """
+        old = self.text
+        p = _common_prefix(old, text)
+        s = _common_suffix(old, text, min(len(old), len(text)) - p)
+        lo, old_hi = p, len(old) - s
+        while lo > 0 and not old[lo - 1].isspace():
+            lo -= 1
+        while old_hi < len(old) and not old[old_hi].isspace():
+            old_hi += 1
+        new_hi = old_hi + len(text) - len(old)
+        k1, k2 = self._starts.bisect(lo), self._starts.bisect(old_hi)
+        tokenized = tokenize(text[lo:new_hi], self.analyzer.vocabulary)
+        starts = array("i", (lo + x for x in tokenized.starts))
+        return k1, k2, tokenized, starts
+
+    def _frontier(self) -> Dict[str, Optional[int]]:
+        """Portée de chaque étape, en tokens, autour de la zone modifiée."""
+        longest = self.analyzer.multiw_store.automaton.longest
+        reach = self.result.rules_engine.reach()
+        return {
+            "compounds": longest,
+            "senses": self.analyzer.SENSE_CONTEXT_WINDOW or 0,
+            "anaphora": self.result.anaphora_module.max_window,
+            # Une chaîne peut sauter par un composé : chaque pas couvre jusqu'à longest tokens
+            "rules": None if reach is None else reach * max(longest, 1),
+        }
+
+    def _retract(self, a: int, b_old: int, frontier) -> List[str]:
+        """
+        Retire du graphe les tokens [a, b_old), les composés qui les couvrent ou qui touchent
+        la modification, les faits dérivés autour, et les sens à recalculer.
+        Renvoie les composés gardés dont les faits dérivés ont été retirés (à relancer).
+        """
+        res, g, engine = self.result, self.result.g, self.result.rules_engine
+        nodes = res.nodes
+        removed = nodes[a:b_old]
+        doomed = set()
+        for node in removed:
+            doomed |= self._covering.get(node, set())
+        # Les composés voisins de la modification aussi : leurs liens r_succ vers l'extérieur changent
+        doomed |= self._covering.get(nodes[a - 1], set()) | self._covering.get(nodes[b_old], set())
+
+        n = len(self._ids)
+        reach = frontier["rules"]
+        if reach is None:
+            kept = [node for node in nodes if node not in doomed]
+        else:
+            kept = nodes[max(0, a - reach):a] + nodes[b_old:min(n, b_old + reach)]
+        dirty = []
+        for node in kept[:]:
+            for compound in self._covering.get(node, ()):
+                if compound not in doomed:
+                    dirty.append(compound)
+        engine.retract(kept + dirty)
+        engine.retract(removed + list(doomed), remove=True)
+        if not removed:  # insertion entre deux tokens gardés : ils ne se suivent plus
+            engine.unlink(nodes[a - 1], nodes[a])
+            g.remove_edge(nodes[a - 1], nodes[a], "r_succ")
+
+        w = frontier["senses"]
+        if w:
+            for node in nodes[max(1, a - w):a] + nodes[b_old:min(n - 1, b_old + w)]:
+                self._drop_edges(node, "r_disambiguate")
+
+        for node in removed + list(doomed):
+            self._drop_node(node)
+        for compound in doomed:
+            for node in self._compounds.pop(compound):
+                covering = self._covering.get(node)
+                if covering is not None:
+                    covering.discard(compound)
+                    if not covering:
+                        del self._covering[node]
+            k = nodes.index(compound, n)
+            del nodes[k]
+            del res.token_list[k]
+        for node in removed:
+            self._covering.pop(node, None)
+        return dirty
+
+    def _drop_edges(self, node: str, label: str):
+        g = self.result.g
+        for target in g.successors(node, label):
+            g.remove_edge(node, target, label)
+            if g.token(target) == target and g.is_isolated(target):
+                g.remove_node(target)
+
+    def _drop_node(self, node: str):
+        """Retire un nœud ; les nœuds POS et sens qui ne servent plus qu'à lui partent avec lui."""
+        g = self.result.g
+        attached = [other for other in g.successors(node) if g.token(other) == other]
+        g.remove_node(node)
+        for other in attached:
+            if other in g and g.is_isolated(other):
+                g.remove_node(other)
+
+    def _splice(self, a: int, b_old: int, tokens: List[str], ids) -> List[str]:
+        res = self.result
+        new_nodes = [self._make_node(tk) for tk in tokens]
+        res.nodes[a:b_old] = new_nodes
+        res.token_list[a:b_old] = tokens
+        self._ids[a:b_old] = array("i", ids)
+        chain = res.nodes[a - 1:a + len(new_nodes) + 1]
+        for u, v in zip(chain, chain[1:]):
+            res.link(u, v, "r_succ")
+        return new_nodes
+
+    def _add_compounds(self, a: int, b: int, reach: int) -> List[Tuple[str, str]]:
+        """
+        Composés sur les nouveaux tokens ou contre la modification : l'automate ne
+        parcourt que la zone élargie de la longueur de la plus longue expression.
+        """
+        res = self.result
+        n = len(self._ids)
+        lo, hi = max(0, a - reach), min(n, b + reach)
+        added = []
+        for start, end, expr in self.analyzer.multiw_store.find_compounds_by_id(list(self._ids[lo:hi])):
+            start, end = start + lo, end + lo
+            if not (start <= b and end >= a):
+                continue  # déjà présent : ni sur les nouveaux tokens ni contre eux
+            node = self._make_node(expr)
+            res.nodes.append(node)
+            res.token_list.append(expr)
+            if start > 0:
+                res.link(res.nodes[start - 1], node, "r_succ")
+            if end < n:
+                res.link(node, res.nodes[end], "r_succ")
+            covered = tuple(res.nodes[start:end])
+            self._compounds[node] = covered
+            for tk_node in covered:
+                self._covering.setdefault(tk_node, set()).add(node)
+            added.append((node, expr))
+        return added
+
+    def _resolve(self, a: int, b: int, window: int, compounds: List[Tuple[str, str]]):
+        """Sens des nouveaux tokens (et, avec une fenêtre de contexte, de leurs voisins) et des nouveaux composés."""
+        res, g, storage = self.result, self.result.g, self.analyzer.sense_storage
+        n = len(self._ids)
+        lo, hi = max(0, a - window), min(n, b + window)
+        context_lo, context_hi = max(0, lo - window), min(n, hi + window)
+        senses = storage.resolve(list(self._ids[context_lo:context_hi]), window=window or None)
+        picked = list(zip(res.nodes[lo:hi], senses[lo - context_lo:hi - context_lo]))
+        if compounds:
+            ids = self.analyzer.vocabulary.intern_all([expr for _, expr in compounds])
+            picked += zip([node for node, _ in compounds], storage.resolve(ids))
+        for node, (sense, w) in picked:
+            if sense and not g.has_edge(node, sense, "r_disambiguate"):
+                g.add_node(sense)
+                g.add_edge(node, sense, label="r_disambiguate")
@@ -0,0 +1,153 @@
+# instrumentation.py
+
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Sources de mesures extérieures (ex. compteurs du cache mémoire), lues à l'export.
+# Le registre est au niveau du module : il survit à enable() / disable().
+_COLLECTORS: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+
+def register_collector(name: str, collect: Callable[[], Dict[str, float]]):
+    _COLLECTORS[name] = collect
+
+
+def _key(name: str, labels: dict) -> Tuple[str, Labels]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+class _StageStats:
+    __slots__ = ("calls", "seconds", "nodes_added", "edges_added")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.nodes_added = 0
+        self.edges_added = 0
+
+
+class Metrics:
+    """
+    Mesures du pipeline : durée et nombre d'appels de chaque étape (et de chaque règle),
+    nœuds et arêtes ajoutés au graphe pendant l'étape, et compteurs libres
+    (requêtes réseau, octets reçus, succès / échecs de cache...).
+    Export en JSON ou au format texte de Prometheus.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._stages: Dict[Tuple[str, Labels], _StageStats] = defaultdict(_StageStats)
+        self._counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, graph=None, **labels):
+        """Chronomètre le bloc ; avec graph, compte aussi les nœuds et arêtes ajoutés."""
+        if graph is not None:
+            nodes, edges = graph.number_of_nodes(), graph.number_of_edges()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self._stages[_key(name, labels)]
+                stats.calls += 1
+                stats.seconds += elapsed
+                if graph is not None:
+                    stats.nodes_added += graph.number_of_nodes() - nodes
+                    stats.edges_added += graph.number_of_edges() - edges
+
+    def count(self, name: str, n: float = 1, **labels):
+        with self._lock:
+            self._counters[_key(name, labels)] += n
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = [
+                {"stage": name, "labels": dict(labels), "calls": s.calls, "seconds": s.seconds,
+                 "nodes_added": s.nodes_added, "edges_added": s.edges_added}
+                for (name, labels), s in self._stages.items()
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+        gauges = {name: collect() for name, collect in _COLLECTORS.items()}
+        return {"stages": stages, "counters": counters, "gauges": gauges}
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent, ensure_ascii=False)
+
+    def to_prometheus(self, prefix: str = "analyseur") -> str:
+        snap = self.snapshot()
+        lines = []
+        for field, kind in (("calls", "counter"), ("seconds", "counter"),
+                            ("nodes_added", "counter"), ("edges_added", "counter")):
+            metric = f"{prefix}_stage_{field}_total"
+            lines.append(f"# TYPE {metric} {kind}")
+            for s in snap["stages"]:
+                labels = (("stage", s["stage"]),) + tuple(sorted(s["labels"].items()))
+                lines.append(f"{metric}{_format_labels(labels)} {s[field]}")
+        for name in sorted({c["name"] for c in snap["counters"]}):
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for c in snap["counters"]:
+                if c["name"] == name:
+                    lines.append(f"{metric}{_format_labels(tuple(sorted(c['labels'].items())))} {c['value']}")
+        for group, values in sorted(snap["gauges"].items()):
+            for key, value in sorted(values.items()):
+                metric = f"{prefix}_{group}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class NullMetrics(Metrics):
+    """Mesures désactivées : chaque appel ne fait rien (pas de chronométrage, pas de verrou)."""
+
+    enabled = False
+    _NULL_STAGE = contextlib.nullcontext()
+
+    def stage(self, name: str, graph=None, **labels):
+        return self._NULL_STAGE
+
+    def count(self, name: str, n: float = 1, **labels):
+        pass
+
+
+# Instance courante, lue à chaque appel via instrumentation.METRICS.
+# ANALYSEUR_METRICS=0 désactive les mesures dès le démarrage.
+METRICS: Metrics = NullMetrics() if os.environ.get("ANALYSEUR_METRICS") == "0" else Metrics()
+
+
+def enable() -> Metrics:
+    global METRICS
+    if not METRICS.enabled:
+        METRICS = Metrics()
+    return METRICS
+
+
+def disable():
+    global METRICS
+    METRICS = NullMetrics()
@@ -0,0 +1,198 @@
+# jdm_api.py
+
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import instrumentation
+from base_store import StorableResource, SQLiteBackend
+from http_pool import HTTP_TIMEOUT, InflightRequests, make_session
+
+API_ENDPOINT = "https://jdm-api.demo.lirmm.fr/v0/relations/from/{word}"
+POS_CLASS = 4  # type des nœuds grammaticaux (étiquettes POS) dans l'API JDM
+
+# Types de relations utilisés par le pipeline (identifiants JDM), demandés en un seul appel par mot
+R_RAFF_SEM = 1  # raffinements sémantiques (sens) : chat -> chat>animal
+R_POS = 4  # étiquettes grammaticales, genre et nombre compris (Gender:Mas, Number:Sing...)
+RELATION_TYPES = {"r_raff_sem": R_RAFF_SEM, "r_pos": R_POS}
+
+
+class WordRelations:
+    """
+    Relations d'un mot renvoyées par l'API, indexées par type de relation :
+    relations[type] = ((cible, poids), ...) par poids décroissant.
+    pos garde les étiquettes POS comme avant ({étiquette: poids du nœud}).
+    complete est faux pour une entrée d'un ancien cache, qui ne contient que les POS.
+    """
+
+    __slots__ = ("pos", "relations", "complete")
+
+    def __init__(self, pos: Optional[Dict[str, float]] = None,
+                 relations: Optional[Dict[int, Tuple[Tuple[str, float], ...]]] = None, complete: bool = True):
+        self.pos = pos if pos is not None else {}
+        self.relations = relations if relations is not None else {}
+        self.complete = complete
+
+    @classmethod
+    def from_json(cls, data: dict) -> "WordRelations":
+        nodes = {nd.get("id"): nd for nd in data.get("nodes", [])}
+        pos = {nd["name"]: nd["w"] for nd in nodes.values() if nd.get("type") == POS_CLASS and "name" in nd}
+        grouped: Dict[int, List[Tuple[str, float]]] = {}
+        for rel in data.get("relations", []):
+            rel_type = rel.get("type")
+            target = nodes.get(rel.get("node2"))
+            if rel_type not in RELATION_TYPES.values() or target is None or "name" not in target:
+                continue
+            grouped.setdefault(rel_type, []).append((target["name"], rel.get("w", 0)))
+        relations = {t: tuple(sorted(pairs, key=lambda p: -p[1])) for t, pairs in grouped.items()}
+        return cls(pos, relations)
+
+    @classmethod
+    def from_cache(cls, value) -> Optional["WordRelations"]:
+        if value is None or isinstance(value, WordRelations):
+            return value
+        return cls(pos=value, complete=False)  # ancien cache : {étiquette POS: poids}
+
+    def of(self, rel_type: int, min_weight: Optional[float] = None) -> List[Tuple[str, float]]:
+        pairs = self.relations.get(rel_type, ())
+        return [p for p in pairs if min_weight is None or p[1] >= min_weight]
+
+    @property
+    def senses(self) -> List[Tuple[str, float]]:
+        return self.of(R_RAFF_SEM)
+
+    @property
+    def gender(self) -> Optional[str]:
+        """Genre ("Mas" ou "Fem") d'après les étiquettes Gender:..., None si inconnu ou ambigu."""
+        genders = {label.split(":", 1)[1] for label in self.pos if label.startswith("Gender:")}
+        return genders.pop() if len(genders) == 1 else None
+
+    def __bool__(self) -> bool:
+        return bool(self.pos or self.relations)
+
+    def __getstate__(self):
+        return self.pos, self.relations, self.complete
+
+    def __setstate__(self, state):
+        self.pos, self.relations, self.complete = state
+
+
+EMPTY = WordRelations()
+
+
+class JDMApi(StorableResource):
+    """
+    Relations d'un mot depuis l'API JDM : un seul appel par mot ramène tous les types
+    de relations utilisés par le pipeline (RELATION_TYPES), gardés dans un WordRelations.
+    Le pipeline n'en lit que les étiquettes POS (les sens viennent de l'index LEXICALNET) ;
+    les autres relations sont gardées dans le cache pour les recherches complètes (complete=True).
+
+    Le cache est indexé par identifiant de terme (vocabulaire partagé) ; il garde son nom
+    historique (pos_infos) : les entrées de l'ancien cache, qui n'ont que les POS, servent
+    les POS et sont redemandées à la première recherche d'un autre type de relation.
+    Plusieurs analyses concurrentes qui demandent le même mot inconnu partagent une seule requête.
+    """
+
+    BACKEND = SQLiteBackend
+    TERM_KEYS = True
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self.session = make_session(pool_size=max_workers)
+        self.inflight = InflightRequests(resource="jdm_api")
+        super().__init__(cache_filename="pos_infos.pkl")
+
+    def _fetch_resource(self) -> dict:
+        """
+        On renvoie un dict vide initialement ; on le complète après coup.
+        """
+        return {}
+
+    def _ask(self, word: str) -> Optional[WordRelations]:
+        """Un appel à l'API pour toutes les relations utiles du mot (None si la requête a échoué)."""
+        metrics = instrumentation.METRICS
+        metrics.count("http_requests", resource="jdm_api")
+        try:
+            r = self.session.get(API_ENDPOINT.format(word=word),
+                                 params={"types_ids": list(RELATION_TYPES.values())}, timeout=HTTP_TIMEOUT)
+            r.raise_for_status()
+            metrics.count("http_bytes", len(r.content), resource="jdm_api")
+            data_j = r.json()
+        except (requests.RequestException, ValueError) as e:
+            metrics.count("http_errors", resource="jdm_api")
+            print(f"JDM API request failed for '{word}': {e}")
+            return None  # échec : rien n'est stocké, le mot sera redemandé plus tard
+        return WordRelations.from_json(data_j)
+
+    # Recherche d'un mot
+
+    def record(self, word: str, complete: bool = False) -> WordRelations:
+        return self.record_by_id(self.vocabulary.intern(word), complete)
+
+    def record_by_id(self, term_id: int, complete: bool = False) -> WordRelations:
+        """
+        Relations du mot, depuis la mémoire, le cache, ou l'API en dernier recours.
+        complete : il faut d'autres relations que les POS (une entrée d'un ancien cache est redemandée).
+        """
+        record = self.memo(term_id, lambda: self._lookup(term_id, complete), is_negative=lambda r: not r)
+        if complete and not record.complete:
+            self.MEMO.invalidate((self._memo_ns, term_id))
+            record = self.memo(term_id, lambda: self._lookup(term_id, True), is_negative=lambda r: not r)
+        return record
+
+    def _lookup(self, term_id: int, complete: bool) -> WordRelations:
+        record = WordRelations.from_cache(self.resource_data.get(term_id))
+        if record is None or (complete and not record.complete):
+            instrumentation.METRICS.count("store_misses", resource="jdm_api")
+            self.inflight.run(term_id, lambda: self._download(term_id, complete))
+            fetched = WordRelations.from_cache(self.resource_data.get(term_id))
+            record = fetched if fetched is not None else record
+        return record if record is not None else EMPTY
+
+    def _cached(self, term_id: int, complete: bool) -> bool:
+        record = WordRelations.from_cache(self.resource_data.get(term_id))
+        return record is not None and (record.complete or not complete)
+
+    def _download(self, term_id: int, complete: bool):
+        if self._cached(term_id, complete):
+            return  # stocké par un autre thread entre-temps
+        if self.OFFLINE:
+            instrumentation.METRICS.count("offline_misses", resource="jdm_api")
+            return
+        record = self._ask(self.vocabulary.term(term_id))
+        if record is not None:
+            self.put(term_id, record)
+
+    # Préchargement
+
+    def fetch_for_words(self, words: Iterable[str], max_workers: Optional[int] = None, complete: bool = False):
+        """
+        Récupère en parallèle les relations des mots absents du cache, écrites en un seul commit.
+        complete : comme pour record_by_id, les entrées de l'ancien cache POS sont aussi redemandées.
+        """
+        words = list(dict.fromkeys(words))
+        ids = self.vocabulary.intern_all(words)
+        missing = {}
+        for word, term_id in zip(words, ids):
+            record = WordRelations.from_cache(self.resource_data.get(term_id))
+            if record is None or (complete and not record.complete):
+                missing[term_id] = word
+        instrumentation.METRICS.count("store_misses", len(missing), resource="jdm_api")
+        if not missing:
+            return
+        if self.OFFLINE:
+            instrumentation.METRICS.count("offline_misses", len(missing), resource="jdm_api")
+            return
+        workers = max_workers or self.max_workers
+        self.inflight.run_many(missing, lambda owned: self._download_missing(owned, missing, workers, complete))
+
+    def _download_missing(self, term_ids, words_by_id, max_workers: int, complete: bool) -> dict:
+        # Stockés (ou complétés) par un autre thread entre la vérification et la réservation
+        term_ids = [i for i in term_ids if not self._cached(i, complete)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            records = dict(zip(term_ids, pool.map(self._ask, map(words_by_id.get, term_ids))))
+        records = {i: record for i, record in records.items() if record is not None}
+        with self.batch():
+            for term_id, record in records.items():
+                self.put(term_id, record)
+        return records
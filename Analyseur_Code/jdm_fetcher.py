@@ -1,19 +1,44 @@
 # jdm_fetcher.py
 
 import requests
-from tqdm import tqdm
-from datetime import datetime
 import re
-from base_store import StorableResource
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import instrumentation
+from base_store import StorableResource, SQLiteBackend
+from memo_cache import MemoCache
+from relation_store import RelationStore, parse_rezo_dump
+from http_pool import HTTP_TIMEOUT, InflightRequests, make_session, HostRateLimiter
+
+# Pages désérialisées gardées en mémoire : une page peut contenir des milliers de relations,
+# elles ont donc leur propre cache, plus petit que le cache partagé des recherches par token
+PAGE_MEMO = MemoCache(maxsize=512, ttl=None, negative_ttl=60.0)
+instrumentation.register_collector("memo_jdm_pages", PAGE_MEMO.stats)
 
 
 class JDMFetcher(StorableResource):
     """
     Stocke localement les retours du rezo-dump (JeuxDeMots).
+    Les mots manquants sont téléchargés en parallèle (pool de threads borné,
+    session keep-alive partagée) puis écrits dans le cache en une seule fois.
+    Un mot déjà en cours de téléchargement pour une autre analyse (autre thread)
+    n'est pas redemandé : on attend le résultat de la requête en cours.
+    Le cache est indexé par identifiant de terme (vocabulaire partagé) ; chaque entrée
+    est la page rezo-dump complète du mot, sous forme de RelationStore (voir relation_store.py).
+    Les requêtes sur les relations (relations_of, targets, sources) ne lisent que le cache.
     """
 
-    def __init__(self):
-        super().__init__(cache_filename="jdm_dumpdata.pkl")
+    BACKEND = SQLiteBackend
+    TERM_KEYS = True
+    MEMO = PAGE_MEMO
+    DUMP_URL = "https://www.jeuxdemots.org/rezo-dump.php?gotermsubmit=Chercher&gotermrel={word}&rel="
+
+    def __init__(self, max_workers: int = 8, requests_per_second: float = 10.0):
+        self.max_workers = max_workers
+        self.session = make_session(pool_size=max_workers)
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.inflight = InflightRequests(resource="jdm")
+        super().__init__(cache_filename="jdm_dumps.pkl")
 
     def _fetch_resource(self) -> dict:
         """
@@ -22,46 +47,97 @@ class JDMFetcher(StorableResource):
         """
         return {}
 
-    def _store_word_info(self, mot: str, info: dict):
-        # On met à jour self.resource_data
-        self.resource_data[mot] = info
-        self.last_save = datetime.now()
-        self._write_cache()
+    def _store_words_info(self, infos: dict):
+        # On met à jour self.resource_data en un seul commit (clés : identifiants des termes)
+        with self.batch():
+            for term_id, info in infos.items():
+                self.put(term_id, info)
 
-    @staticmethod
-    def _download_dump(word: str) -> dict:
+    def _download_dump(self, word: str) -> Optional[RelationStore]:
         """
-        Interroge rezo-dump pour un mot donné.
+        Interroge rezo-dump pour un mot donné (None si la requête a échoué).
         """
-        url = "https://www.jeuxdemots.org/rezo-dump.php?gotermsubmit=Chercher&gotermrel=" + word.replace(" ","+") + "&rel="
+        url = self.DUMP_URL.format(word=word.replace(" ", "+"))
+        metrics = instrumentation.METRICS
+        metrics.count("http_requests", resource="jdm")
         try:
-            resp = requests.get(url, stream=True)
+            self.rate_limiter.wait(url)
+            resp = self.session.get(url, stream=True, timeout=HTTP_TIMEOUT)
             resp.raise_for_status()
         except requests.RequestException as e:
+            metrics.count("http_errors", resource="jdm")
             print(f"Could not fetch rezo-dump for {word}: {e}")
-            return {}
+            return None
 
-        data_collect = {
-            "eid": "",
-            "nt": [],
-            "entries": [],
-            "relations": []
-        }
-        for raw_line in resp.iter_lines():
-            if raw_line:
-                txt = raw_line.decode("latin-1")
-                # On recherche par ex. '(eid=1234)' etc.
-                if "(eid=" in txt:
-                    splitted = txt.split("eid=")[1].split(")")[0]
-                    data_collect["eid"] = splitted
-                # On pourrait y ajouter des parse...
-        return data_collect
+        received = 0
+
+        def lines():
+            nonlocal received
+            for raw_line in resp.iter_lines():
+                received += len(raw_line) + 1
+                yield raw_line.decode("latin-1")
+
+        # Toute la page (types, nœuds, relations) est lue en flux dans un magasin en colonnes
+        with metrics.stage("rezo_dump_parse"):
+            page = parse_rezo_dump(lines())
+        metrics.count("http_bytes", received, resource="jdm")
+        return page
 
     def fetch_entries_for_words(self, word_list):
         """
         Va chercher les infos pour chaque mot, si pas dans self.resource_data.
         """
-        for w in word_list:
-            if w not in self.resource_data:
-                info = self._download_dump(w)
-                self._store_word_info(w, info)
+        words = list(dict.fromkeys(word_list))
+        ids = self.vocabulary.intern_all(words)
+        missing = [(w, i) for w, i in zip(words, ids) if i not in self.resource_data]
+        instrumentation.METRICS.count("store_hits", len(words) - len(missing), resource="jdm")
+        instrumentation.METRICS.count("store_misses", len(missing), resource="jdm")
+        if not missing:
+            return
+        if self.OFFLINE:
+            instrumentation.METRICS.count("offline_misses", len(missing), resource="jdm")
+            return
+        words_by_id = {i: w for w, i in missing}
+        self.inflight.run_many(words_by_id, lambda owned: self._download_missing(owned, words_by_id))
+
+    def _download_missing(self, term_ids, words_by_id) -> dict:
+        # Stocké par un autre thread entre la vérification et la réservation
+        term_ids = [i for i in term_ids if i not in self.resource_data]
+        if not term_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            infos = dict(zip(term_ids, pool.map(self._download_dump, map(words_by_id.get, term_ids))))
+        # Les échecs (None) ne sont pas stockés : ils seront redemandés plus tard
+        infos = {i: info for i, info in infos.items() if info is not None}
+        self._store_words_info(infos)
+        return infos
+
+    def dump_for(self, word: str) -> Optional[RelationStore]:
+        """Page rezo-dump du mot depuis le cache (None s'il n'a pas encore été récupéré)."""
+        term_id = self.vocabulary.lookup(word)
+        if term_id < 0:
+            return None
+        return self.memo(term_id, lambda: self.resource_data.get(term_id), is_negative=lambda page: page is None)
+
+    def relations_of(self, word: str, rel=None, min_weight=None, incoming: bool = False):
+        """
+        Relations du mot (voir RelationStore.relations), ex. relations_of("chat", "r_isa", 50).
+        Réponse tirée du cache uniquement : liste vide si la page n'a pas été récupérée.
+        """
+        page = self.dump_for(word)
+        return page.relations(self._root(page, word), rel, min_weight, incoming) if page is not None else []
+
+    def targets(self, word: str, rel=None, min_weight=None):
+        """(nom, poids) des cibles des relations sortantes du mot."""
+        page = self.dump_for(word)
+        return page.targets(self._root(page, word), rel, min_weight) if page is not None else []
+
+    def sources(self, word: str, rel=None, min_weight=None):
+        """(nom, poids) des origines des relations entrantes du mot."""
+        page = self.dump_for(word)
+        return page.sources(self._root(page, word), rel, min_weight) if page is not None else []
+
+    @staticmethod
+    def _root(page: RelationStore, word: str):
+        # Le terme de la page (eid de l'en-tête) ; à défaut, le nœud qui porte ce nom
+        return page.eid if page.eid is not None else word
@@ -1,3 +1,6 @@
+import os
+
+import instrumentation
 from semantic_pipeline import GlobalAnalyzer
 
 def main():
@@ -8,6 +11,12 @@ def main():
     print("Analysis finished")
     analyzer.generate_image(out_file="analyse_result013.png", graph_title="Analyse Sémantique")
     print("Image generated at analyse_result.png")
+    # Mesures du pipeline (format Prometheus) : seulement si ANALYSEUR_METRICS_FILE est donné
+    metrics_file = os.environ.get("ANALYSEUR_METRICS_FILE")
+    if metrics_file:
+        with open(metrics_file, "w", encoding="utf-8") as f:
+            f.write(instrumentation.METRICS.to_prometheus())
+        print(f"Metrics written to {metrics_file}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
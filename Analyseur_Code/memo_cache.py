@@ -0,0 +1,97 @@
+# memo_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from instrumentation import register_collector
+
+
+def _is_empty(value) -> bool:
+    return not value
+
+
+class MemoCache:
+    """
+    Cache mémoire LRU, borné en nombre d'entrées, pour les recherches par token.
+
+    Chaque entrée a sa propre date d'expiration : ttl pour une réponse normale,
+    negative_ttl pour une réponse vide (mot inconnu), qui est donc elle aussi mise en cache
+    mais revérifiée plus tôt. Les compteurs hits / misses / negative_hits / evictions
+    permettent de vérifier que les tokens fréquents sont bien servis depuis la mémoire.
+    """
+
+    def __init__(self, maxsize: int = 100000, ttl: Optional[float] = 3600.0,
+                 negative_ttl: Optional[float] = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clé -> (valeur, expiration)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any],
+            is_negative: Callable[[Any], bool] = _is_empty) -> Any:
+        """Valeur en cache pour key, sinon loader() (mise en cache avec sa propre expiration)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, deadline = entry
+                if deadline is None or deadline > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if is_negative(value):
+                        self.negative_hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+
+        # Le chargement se fait hors du verrou (il peut interroger le disque ou le réseau)
+        value = loader()
+        if self.maxsize <= 0:
+            return value
+        ttl = self.negative_ttl if is_negative(value) else self.ttl
+        with self._lock:
+            self._entries[key] = (value, None if ttl is None else now + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, namespace: Optional[str] = None):
+        """Vide le cache, ou seulement les clés (namespace, ...) d'une ressource."""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if isinstance(k, tuple) and k[0] == namespace]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Cache partagé par toutes les ressources du pipeline (clés préfixées par la ressource)
+SHARED_MEMO = MemoCache()
+register_collector("memo", SHARED_MEMO.stats)
@@ -1,11 +1,18 @@
 # multiword_detector.py
 
+import pickle
 import requests
-from tqdm import tqdm
-import re
-from base_store import StorableResource  # Assurez-vous que l'import est correct
+from base_store import StorableResource, DATA_REPO  # Assurez-vous que l'import est correct
+from compound_automaton import CompoundAutomaton
+from dump_download import download_file
+from dump_parser import DEFAULT_MEMORY_BUDGET, parse_mwe_file
+from http_pool import make_session
+from text_tokenizer import tokenize_batch
+from vocabulary import Vocabulary
 from datetime import timedelta
-from typing import List
+from pathlib import Path
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
 
 class MultiWordDetector(StorableResource):
     """
@@ -13,35 +20,41 @@ class MultiWordDetector(StorableResource):
     """
 
     DUMMY_URL = "https://www.jeuxdemots.org/JDM-LEXICALNET-FR/20240924-LEXICALNET-JEUXDEMOTS-ENTRIES-MWE.txt"
-    WORD_PATTERN = re.compile(r"(\d+);\"(.+)\";")  # Pattern pour matcher les lignes du fichier
+    PARSE_WORKERS: Optional[int] = None  # None : un processus par cœur
+    MEMORY_BUDGET = DEFAULT_MEMORY_BUDGET
+
+    AUTOMATON_FILENAME = "multiwords_automaton.pkl"
 
     def __init__(self, days_valid=30):
+        self.session = make_session(pool_size=1)
+        self._automaton: Optional[CompoundAutomaton] = None
+        self._automaton_stamp = None
+        self.automaton_path = DATA_REPO / self.AUTOMATON_FILENAME
         super().__init__(
             cache_filename="multiwords.pkl",
             validity=timedelta(days=days_valid),
         )
 
+    @property
+    def dump_path(self) -> Path:
+        return DATA_REPO / Path(urlsplit(self.DUMMY_URL).path).name
+
     def _fetch_resource(self) -> List[str]:
         """
         Récupère les mots composés depuis l'URL donnée, puis les stocke dans un cache local.
+        Le fichier est gardé dans data/ et n'est téléchargé à nouveau que s'il a changé.
         """
         try:
-            response = requests.get(self.DUMMY_URL, stream=True)
-            response.raise_for_status()
+            changed = download_file(self.session, self.DUMMY_URL, self.dump_path)
         except requests.RequestException as e:
             print(f"Erreur lors de la récupération des mots composés : {e}")
-            raise Exception("Impossible de récupérer les mots composés")
-
-        compound_words = []
-        for line in tqdm(
-            response.iter_lines(), desc="Récupération des mots composés depuis JeuxDeMots..."
-        ):
-            line = line.decode("latin1").strip().lower()
-            match = self.WORD_PATTERN.match(line)
-            if match:
-                compound_words.append(match.group(2))
+            if self._resource_data is not None or not self.dump_path.exists():
+                raise Exception("Impossible de récupérer les mots composés")
+            changed = True  # pas de cache : on repart du fichier déjà téléchargé
+        if not changed and self._resource_data is not None:
+            return self._resource_data
 
-        return compound_words
+        return parse_mwe_file(self.dump_path, workers=self.PARSE_WORKERS, memory_budget=self.MEMORY_BUDGET)
 
     @property
     def known_composites(self) -> List[str]:
@@ -49,3 +62,60 @@ class MultiWordDetector(StorableResource):
         Retourne la liste des mots composés connus.
         """
         return self.retrieve()
+
+    @property
+    def automaton(self) -> CompoundAutomaton:
+        """
+        Automate des mots composés, construit une seule fois puis mis en cache
+        à côté de multiwords.pkl. Il est reconstruit si la liste a été rafraîchie.
+        Ses transitions sont indexées par identifiant de terme.
+        """
+        composites = self.retrieve()
+        automaton = self._automaton
+        if automaton is None or self._automaton_stamp != self.last_save:
+            # Une seule construction même si plusieurs analyses concurrentes arrivent ici
+            with self._load_lock:
+                if self._automaton is None or self._automaton_stamp != self.last_save:
+                    automaton = self._load_automaton()
+                    if automaton is None:
+                        # Toutes les expressions tokenisées d'un coup, une seule fois par version de la liste ;
+                        # l'automate est sauvegardé : ses identifiants doivent être durables
+                        tokenized = tokenize_batch(composites, Vocabulary())
+                        ids = iter(self.vocabulary.persist_all(tk for t in tokenized for tk in t.tokens))
+                        automaton = CompoundAutomaton.build(
+                            ([next(ids) for _ in t.tokens], expr) for t, expr in zip(tokenized, composites)
+                        )
+                        self.vocabulary.sync()
+                        self._save_automaton(automaton)
+                    self._automaton, self._automaton_stamp = automaton, self.last_save
+                automaton = self._automaton
+        return automaton
+
+    def _load_automaton(self) -> Optional[CompoundAutomaton]:
+        if not self.automaton_path.exists():
+            return None
+        try:
+            with open(self.automaton_path, "rb") as f:
+                automaton, stamp, uid = pickle.load(f)
+        except (EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        # L'automate n'est valable que pour la version de la liste et le vocabulaire dont il est issu
+        if stamp != self.last_save or uid != self.vocabulary.uid:
+            return None
+        return automaton
+
+    def _save_automaton(self, automaton: CompoundAutomaton):
+        with open(self.automaton_path, "wb") as f:
+            pickle.dump((automaton, self.last_save, self.vocabulary.uid), f)
+
+    def find_compounds(self, tokens: List[str]) -> List[Tuple[int, int, str]]:
+        """
+        Un seul passage sur les tokens : renvoie toutes les expressions composées
+        trouvées (chevauchantes comprises) sous forme (début, fin exclusive, expression).
+        """
+        return self.find_compounds_by_id([self.vocabulary.lookup(tk) for tk in tokens])
+
+    def find_compounds_by_id(self, term_ids: List[int]) -> List[Tuple[int, int, str]]:
+        """Comme find_compounds, sur les identifiants des tokens (-1 : terme inconnu)."""
+        automaton = self.automaton  # sa construction peut rendre durables des termes provisoires
+        return automaton.find_spans(self.vocabulary.stored_ids(term_ids))
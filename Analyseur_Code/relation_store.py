@@ -0,0 +1,292 @@
+# relation_store.py
+
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# Lignes d'une page rezo-dump (entre <CODE> et </CODE>) :
+#   nt;ntid;'ntname'                              types de nœuds
+#   e;eid;'name';type;w[;'formatted name']        nœuds (termes, raffinements, POS...)
+#   rt;rtid;'trname';'trgpname';'rthelp'          types de relations
+#   r;rid;node1;node2;type;w[;...]                relations sortantes puis entrantes
+# Les noms peuvent contenir des apostrophes et des points-virgules : ils sont délimités
+# par les champs numériques qui les suivent.
+ENTRY_REGEX = re.compile(r"e;(-?\d+);'(.*)';(-?\d+);(-?[\d.]+)(?:;'(.*)')?$")
+NODE_TYPE_REGEX = re.compile(r"nt;(-?\d+);'(.*)'$")
+RELATION_TYPE_REGEX = re.compile(r"rt;(-?\d+);'(.*?)'")
+EID_REGEX = re.compile(r"\(eid=(\d+)\)")
+
+TYPE_SHIFT = 16  # clé d'index : (nœud << 16) | type de relation
+
+
+class Node(NamedTuple):
+    eid: int
+    name: str
+    type: int
+    weight: float
+
+
+class Relation(NamedTuple):
+    rid: int
+    src: int
+    dst: int
+    type: int
+    weight: float
+
+
+def _number(text: str) -> float:
+    return float(text) if "." in text else int(text)
+
+
+class RelationStore:
+    """
+    Nœuds et relations JDM en colonnes (tableaux compacts), pour une page rezo-dump
+    ou la fusion de plusieurs (merge).
+
+    - Nœuds : eid, type, poids (tableaux) et nom ; relations : rid, source, cible, type,
+      poids. Une relation présente dans deux pages (sortante de l'une, entrante de
+      l'autre) n'est gardée qu'une fois.
+    - Deux index triés, par (source, type) et par (cible, type) : une requête est une
+      dichotomie suivie d'un parcours des seules relations concernées. Ils sont construits
+      par freeze() (ou à la première requête) et sauvegardés avec le reste (pickle).
+    - Les requêtes ne lisent que le magasin : jamais de réseau.
+    """
+
+    def __init__(self, eid: Optional[int] = None):
+        self.eid = eid  # terme de la page (None pour une fusion)
+        self.node_types: Dict[int, str] = {}
+        self.relation_types: Dict[int, str] = {}
+        self.node_eid = array("i")
+        self.node_type = array("i")
+        self.node_weight = array("f")
+        self.node_name: List[str] = []
+        self.rel_id = array("q")
+        self.rel_src = array("i")
+        self.rel_dst = array("i")
+        self.rel_type = array("H")
+        self.rel_weight = array("f")
+        self._rows: Optional[Dict[int, int]] = None  # eid -> ligne du nœud
+        self._by_name: Optional[Dict[str, int]] = None  # nom -> eid
+        self._rel_seen: Optional[set] = None
+        self._src_index = self._dst_index = None  # (clés triées, ordre des relations)
+
+    # Construction
+
+    def add_node(self, eid: int, name: str, node_type: int = 0, weight: float = 0):
+        rows = self._node_rows()
+        if eid in rows:
+            return
+        rows[eid] = len(self.node_eid)
+        self.node_eid.append(eid)
+        self.node_type.append(node_type)
+        self.node_weight.append(weight)
+        self.node_name.append(name)
+        self._by_name = None
+
+    def add_relation(self, rid: int, src: int, dst: int, rel_type: int, weight: float):
+        if self._rel_seen is None:
+            self._rel_seen = set(self.rel_id)
+        if rid in self._rel_seen:
+            return
+        self._rel_seen.add(rid)
+        self.rel_id.append(rid)
+        self.rel_src.append(src)
+        self.rel_dst.append(dst)
+        self.rel_type.append(rel_type)
+        self.rel_weight.append(weight)
+        self._src_index = self._dst_index = None
+
+    def merge(self, other: "RelationStore"):
+        """Ajoute les nœuds et relations d'une autre page (ex. pour des requêtes sur plusieurs mots)."""
+        self.node_types.update(other.node_types)
+        self.relation_types.update(other.relation_types)
+        for row in range(len(other.node_eid)):
+            self.add_node(other.node_eid[row], other.node_name[row], other.node_type[row], other.node_weight[row])
+        for k in range(len(other.rel_id)):
+            self.add_relation(other.rel_id[k], other.rel_src[k], other.rel_dst[k],
+                              other.rel_type[k], other.rel_weight[k])
+
+    def freeze(self) -> "RelationStore":
+        """Construit les index et libère les tables qui ne servent qu'à l'ajout."""
+        self._index(self.rel_src)
+        self._index(self.rel_dst)
+        self._rel_seen = None
+        return self
+
+    # Index
+
+    def _node_rows(self) -> Dict[int, int]:
+        if self._rows is None:
+            self._rows = {eid: row for row, eid in enumerate(self.node_eid)}
+        return self._rows
+
+    def _index(self, nodes: array) -> Tuple[array, array]:
+        if nodes is self.rel_src and self._src_index is not None:
+            return self._src_index
+        if nodes is self.rel_dst and self._dst_index is not None:
+            return self._dst_index
+        types = self.rel_type
+        keys = [(node << TYPE_SHIFT) | t for node, t in zip(nodes, types)]
+        order = array("i", sorted(range(len(keys)), key=keys.__getitem__))
+        index = (array("q", (keys[k] for k in order)), order)
+        if nodes is self.rel_src:
+            self._src_index = index
+        else:
+            self._dst_index = index
+        return index
+
+    def _edges(self, nodes: array, eid: int, rel_type: Optional[int]) -> Iterator[int]:
+        keys, order = self._index(nodes)
+        if rel_type is None:
+            lo, hi = eid << TYPE_SHIFT, (eid + 1) << TYPE_SHIFT
+        else:
+            lo = hi = (eid << TYPE_SHIFT) | rel_type
+            hi += 1
+        return (order[k] for k in range(bisect_left(keys, lo), bisect_left(keys, hi)))
+
+    # Requêtes
+
+    def eid_of(self, term: Union[str, int]) -> Optional[int]:
+        """eid d'un nœud de la page, désigné par son nom ou par son eid."""
+        if isinstance(term, int):
+            return term
+        if self._by_name is None:
+            self._by_name = {}
+            for eid, name in zip(self.node_eid, self.node_name):
+                self._by_name.setdefault(name, eid)
+        return self._by_name.get(term)
+
+    def rel_type_id(self, rel: Union[str, int, None]) -> Optional[int]:
+        if rel is None or isinstance(rel, int):
+            return rel
+        for rid, name in self.relation_types.items():
+            if name == rel:
+                return rid
+        raise KeyError(f"unknown relation type {rel!r}")
+
+    def node(self, eid: int) -> Optional[Node]:
+        row = self._node_rows().get(eid)
+        if row is None:
+            return None
+        return Node(eid, self.node_name[row], self.node_type[row], self.node_weight[row])
+
+    def name(self, eid: int) -> str:
+        row = self._node_rows().get(eid)
+        return self.node_name[row] if row is not None else str(eid)
+
+    def relations(self, term: Union[str, int], rel: Union[str, int, None] = None,
+                  min_weight: Optional[float] = None, incoming: bool = False) -> List[Relation]:
+        """
+        Relations sortantes de term (ou entrantes avec incoming=True), d'un type donné
+        (nom comme "r_isa" ou identifiant ; tous si None), de poids >= min_weight,
+        par poids décroissant.
+        """
+        eid = self.eid_of(term)
+        if eid is None:
+            return []
+        try:
+            rel_type = self.rel_type_id(rel)
+        except KeyError:
+            return []  # type absent de la page : aucune relation de ce type
+        found = [
+            Relation(self.rel_id[k], self.rel_src[k], self.rel_dst[k], self.rel_type[k], self.rel_weight[k])
+            for k in self._edges(self.rel_dst if incoming else self.rel_src, eid, rel_type)
+            if min_weight is None or self.rel_weight[k] >= min_weight
+        ]
+        found.sort(key=lambda r: -r.weight)
+        return found
+
+    def targets(self, term: Union[str, int], rel: Union[str, int, None] = None,
+                min_weight: Optional[float] = None) -> List[Tuple[str, float]]:
+        """(nom, poids) des cibles : ex. targets("chat", "r_isa", min_weight=50)."""
+        return [(self.name(r.dst), r.weight) for r in self.relations(term, rel, min_weight)]
+
+    def sources(self, term: Union[str, int], rel: Union[str, int, None] = None,
+                min_weight: Optional[float] = None) -> List[Tuple[str, float]]:
+        """(nom, poids) des nœuds qui pointent vers term."""
+        return [(self.name(r.src), r.weight) for r in self.relations(term, rel, min_weight, incoming=True)]
+
+    def __len__(self) -> int:
+        return len(self.rel_id)
+
+    # Sérialisation : les colonnes et les index ; les tables d'ajout sont recalculées au besoin
+
+    def __getstate__(self):
+        self.freeze()
+        state = dict(self.__dict__)
+        state["_rows"] = state["_by_name"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+def parse_rezo_dump(lines: Iterable[str]) -> RelationStore:
+    """
+    Lit une page rezo-dump ligne à ligne (en flux) et renvoie ses nœuds et relations.
+    Les lignes de relation, les plus nombreuses, sont seulement découpées pendant la
+    lecture ; leurs champs sont convertis colonne par colonne à la fin.
+    """
+    store = RelationStore()
+    add_node = store.add_node
+    relations = []
+    for line in lines:
+        if line.startswith("r;"):
+            relations.append(line)
+        elif line.startswith("e;"):
+            fields = line.split(";")
+            if len(fields) == 5 and fields[2][:1] == fields[2][-1:] == "'" and len(fields[2]) > 1:
+                # Cas courant : nom sans point-virgule ni nom formaté, pas besoin de la regex
+                eid, name, node_type, weight, formatted = fields[1], fields[2][1:-1], fields[3], fields[4], None
+            else:
+                m = ENTRY_REGEX.match(line)
+                if not m:
+                    continue
+                eid, name, node_type, weight, formatted = m.groups()
+            try:
+                add_node(int(eid), formatted or name, int(node_type), _number(weight))
+            except (ValueError, OverflowError):
+                pass
+        elif line.startswith("rt;"):
+            m = RELATION_TYPE_REGEX.match(line)
+            if m:
+                store.relation_types[int(m.group(1))] = m.group(2)
+        elif line.startswith("nt;"):
+            m = NODE_TYPE_REGEX.match(line)
+            if m:
+                store.node_types[int(m.group(1))] = m.group(2)
+        elif store.eid is None and "(eid=" in line:
+            m = EID_REGEX.search(line)
+            if m:
+                store.eid = int(m.group(1))
+    _add_relation_lines(store, relations)
+    return store.freeze()
+
+
+def _add_relation_lines(store: RelationStore, lines: List[str]):
+    try:
+        columns = list(zip(*(line.split(";", 6)[1:6] for line in lines)))
+        if len(columns) < 5 and lines:
+            raise ValueError("short relation line")
+        rids, srcs, dsts, types, weights = columns or ((),) * 5
+        rel_id, rel_src, rel_dst = array("q", map(int, rids)), array("i", map(int, srcs)), array("i", map(int, dsts))
+        rel_type = array("H", map(int, types))
+        rel_weight = array("f", map(_number, weights))
+    except (ValueError, OverflowError):
+        # Ligne tronquée ou champ hors des bornes des colonnes : on reprend ligne à ligne
+        for line in lines:
+            fields = line.split(";", 6)
+            try:
+                store.add_relation(int(fields[1]), int(fields[2]), int(fields[3]), int(fields[4]), _number(fields[5]))
+            except (ValueError, OverflowError, IndexError):
+                pass
+        return
+    if len(set(rel_id)) != len(rel_id):
+        # Relation répétée dans la page : on garde la première occurrence
+        for k in range(len(rel_id)):
+            store.add_relation(rel_id[k], rel_src[k], rel_dst[k], rel_type[k], rel_weight[k])
+        return
+    store.rel_id, store.rel_src, store.rel_dst = rel_id, rel_src, rel_dst
+    store.rel_type, store.rel_weight = rel_type, rel_weight
+    store._src_index = store._dst_index = None
@@ -0,0 +1,296 @@
+# rule_compiler.py
+
+import itertools
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+RULE_HEAD = re.compile(r"^([\w-]+)\s*:\s*(.+?)\s*=>\s*(.+)$", re.DOTALL)
+EQUALS_ATOM = re.compile(r"^\$(\w+)\s*==\s*(.+)$")
+
+# Coût estimé d'une étape, pour ordonner les prémisses (plus petit = plus sélectif)
+FILTER_COST = 0  # toutes les variables sont déjà liées : simple test
+EXPAND_COST = {"r_succ": 2}  # voisins suivis depuis une variable liée (r_succ : chaîne)
+DEFAULT_EXPAND_COST = 4
+SCAN_POS_COST = 1000  # tous les nœuds d'une catégorie
+SCAN_REL_COST = 2000  # tous les faits d'une relation
+
+
+class Atom(NamedTuple):
+    """
+    Prémisse d'une règle :
+      kind "pos" : $left r_pos <target>
+      kind "rel" : $left <relation> $target
+      kind "in"  : le token de $left est l'une des valeurs
+    """
+    kind: str
+    left: str
+    relation: str = ""
+    target: str = ""
+    values: frozenset = frozenset()
+
+
+class Rule(NamedTuple):
+    name: str
+    body: Tuple[Atom, ...]
+    head: Tuple[Tuple[str, str, str], ...]  # ($source, relation, $cible)
+
+
+def _split_top(text: str, sep: str) -> List[str]:
+    """Découpe sur sep en ignorant ce qui est entre parenthèses."""
+    parts, depth, current = [], 0, []
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def _parse_atom(text: str) -> Atom:
+    m = EQUALS_ATOM.match(text)
+    if m:
+        values = frozenset(v.strip().strip("\"'") for v in m.group(2).split("/"))
+        return Atom("in", m.group(1), values=values)
+    parts = text.split()
+    if len(parts) != 3 or not parts[0].startswith("$"):
+        raise ValueError(f"Invalid rule atom: {text!r}")
+    left, relation, target = parts
+    if target.startswith("$"):
+        return Atom("rel", left[1:], relation, target[1:])
+    if relation != "r_pos":
+        raise ValueError(f"Only r_pos accepts a constant target: {text!r}")
+    return Atom("pos", left[1:], relation, target)
+
+
+def _parse_conjunction(text: str) -> List[Tuple[Atom, ...]]:
+    """Forme disjonctive : une liste d'alternatives, chacune une conjonction d'atomes."""
+    choices = []
+    for part in _split_top(text, "&"):
+        if part.startswith("(") and part.endswith(")"):
+            options = []
+            for alternative in _split_top(part[1:-1], "|"):
+                options.extend(_parse_conjunction(alternative))
+            choices.append(options)
+        else:
+            choices.append([(_parse_atom(part),)])
+    return [tuple(a for group in combo for a in group) for combo in itertools.product(*choices)]
+
+
+def _parse_head(text: str) -> Tuple[Tuple[str, str, str], ...]:
+    head = []
+    for part in _split_top(text, "&"):
+        atom = _parse_atom(part)
+        if atom.kind != "rel":
+            raise ValueError(f"Rule conclusions must relate two variables: {part!r}")
+        head.append((atom.left, atom.relation, atom.target))
+    return tuple(head)
+
+
+def parse_rules(text: str) -> List[Rule]:
+    """
+    Lit des règles au format « nom: prémisses => conclusions ».
+    Une règle contenant une alternative (A | B) donne une règle par branche.
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if line[0].isspace() and entries:
+            entries[-1] += " " + line.strip()
+        else:
+            entries.append(line.strip())
+
+    rules = []
+    for entry in entries:
+        m = RULE_HEAD.match(entry)
+        if not m:
+            raise ValueError(f"Invalid rule: {entry!r}")
+        name, body, head = m.group(1), m.group(2), _parse_head(m.group(3))
+        for body_atoms in _parse_conjunction(body):
+            rules.append(Rule(name, body_atoms, head))
+    return rules
+
+
+def load_rules(path: Path) -> List[Rule]:
+    with open(path, encoding="utf-8") as f:
+        return parse_rules(f.read())
+
+
+class CompiledRule:
+    """
+    Règle compilée en plans de jointure indexés. Pour l'évaluation semi-naïve,
+    il y a un plan par prémisse : il commence par parcourir les faits nouveaux (delta)
+    de cette prémisse, puis lie les autres variables via les index du moteur,
+    dans l'ordre de sélectivité estimée (tests d'abord, puis r_succ, puis parcours complets).
+    """
+
+    def __init__(self, rule: Rule, engine):
+        self.rule = rule
+        self.__name__ = rule.name
+        self.engine = engine
+        self.plans: Dict[int, List[Tuple[str, Atom]]] = {
+            i: self._plan(i) for i, atom in enumerate(rule.body) if atom.kind != "in"
+        }
+        self._compiled = {}
+        self.reads = {atom.relation for atom in rule.body if atom.kind != "in"}
+        # Quand le delta contient tous les faits (premier tour), un seul plan suffit :
+        # on prend celui qui démarre d'une chaîne r_succ si possible
+        self.full_plan = min(
+            self.plans, key=lambda i: (self.rule.body[i].relation != "r_succ", i)
+        ) if self.plans else None
+
+    def _step_cost(self, atom: Atom, bound: set) -> Tuple[str, int]:
+        if atom.kind == "in":
+            return ("test", FILTER_COST) if atom.left in bound else ("scan", len(atom.values))
+        if atom.kind == "pos":
+            return ("test", FILTER_COST) if atom.left in bound else ("scan", SCAN_POS_COST)
+        if atom.left in bound and atom.target in bound:
+            return "test", FILTER_COST
+        if atom.left in bound:
+            return "forward", EXPAND_COST.get(atom.relation, DEFAULT_EXPAND_COST)
+        if atom.target in bound:
+            return "backward", EXPAND_COST.get(atom.relation, DEFAULT_EXPAND_COST)
+        return "scan", SCAN_REL_COST
+
+    def _plan(self, delta_index: int) -> List[Tuple[str, Atom]]:
+        first = self.rule.body[delta_index]
+        steps = [("delta", first)]
+        bound = {first.left} | ({first.target} if first.kind == "rel" else set())
+        remaining = [a for i, a in enumerate(self.rule.body) if i != delta_index]
+        while remaining:
+            costs = [self._step_cost(a, bound) for a in remaining]
+            best = min(range(len(remaining)), key=lambda i: costs[i][1])
+            atom = remaining.pop(best)
+            steps.append((costs[best][0], atom))
+            bound.add(atom.left)
+            if atom.kind == "rel":
+                bound.add(atom.target)
+        return steps
+
+    def __call__(self, delta) -> List[Tuple[str, str, str]]:
+        out = []
+        plans = self.plans.items()
+        if self.engine.delta_is_complete(delta, self.reads):
+            plans = [(self.full_plan, self.plans[self.full_plan])]
+        for i, plan in plans:
+            atom = self.rule.body[i]
+            if not delta.get(atom.relation):
+                continue
+            run = self._compiled.get(i)
+            if run is None:
+                run = self._compiled[i] = self._compile(plan)
+            run(delta, out)
+        return out
+
+    def _compile(self, plan: List[Tuple[str, Atom]]):
+        """
+        Transforme un plan en fonctions imbriquées : chaque étape lie ou teste des
+        variables dans un tableau de positions puis appelle l'étape suivante.
+        """
+        variables = []
+        for _, atom in plan:
+            for var in (atom.left, atom.target if atom.kind == "rel" else None):
+                if var and var not in variables:
+                    variables.append(var)
+        slots = {var: i for i, var in enumerate(variables)}
+        head = [(slots[src], rel, slots[dst]) for src, rel, dst in self.rule.head]
+
+        def emit(b, out):
+            for src, rel, dst in head:
+                out.append((b[src], rel, b[dst]))
+
+        step = emit
+        for op, atom in reversed(plan[1:]):
+            step = self._make_step(op, atom, slots, step)
+
+        eng = self.engine
+        first = plan[0][1]
+        n_slots = len(variables)
+        if first.kind == "pos":
+            i = slots[first.left]
+
+            def run(delta, out):
+                b = [None] * n_slots
+                for node in eng.delta_pos_nodes(delta, first.target):
+                    b[i] = node
+                    step(b, out)
+        else:
+            i, j = slots[first.left], slots[first.target]
+
+            def run(delta, out):
+                b = [None] * n_slots
+                for u, v in eng.delta_facts(delta, first.relation):
+                    if i == j and u != v:
+                        continue
+                    b[i], b[j] = u, v
+                    step(b, out)
+        return run
+
+    def _make_step(self, op: str, atom: Atom, slots: Dict[str, int], nxt):
+        eng = self.engine
+        i = slots[atom.left]
+        if atom.kind == "pos":
+            mask = eng.pos_mask(atom.target)
+            pos_index = eng.pos_index
+            if op == "test":
+                def step(b, out):
+                    if pos_index.get(b[i], 0) & mask:
+                        nxt(b, out)
+            else:
+                def step(b, out):
+                    for node in list(eng.pos_nodes[mask]):
+                        b[i] = node
+                        nxt(b, out)
+            return step
+
+        if atom.kind == "in":
+            values = atom.values
+            token = eng.token
+            if op == "test":
+                def step(b, out):
+                    if token(b[i]) in values:
+                        nxt(b, out)
+            else:
+                def step(b, out):
+                    for value in values:
+                        for node in eng.nodes_for_token(value):
+                            b[i] = node
+                            nxt(b, out)
+            return step
+
+        j = slots[atom.target]
+        if atom.relation == "r_succ":
+            forward, backward = eng.succ_map, eng.pred_map
+        else:
+            forward, backward = eng.rel_out[atom.relation], eng.rel_in[atom.relation]
+        if op == "test":
+            def step(b, out):
+                if b[j] in forward.get(b[i], ()):
+                    nxt(b, out)
+        elif op == "forward":
+            def step(b, out):
+                for node in forward.get(b[i], ()):
+                    b[j] = node
+                    nxt(b, out)
+        elif op == "backward":
+            def step(b, out):
+                for node in backward.get(b[j], ()):
+                    b[i] = node
+                    nxt(b, out)
+        else:
+            relation = atom.relation
+
+            def step(b, out):
+                for u, v in eng.facts(relation):
+                    if i == j and u != v:
+                        continue
+                    b[i], b[j] = u, v
+                    nxt(b, out)
+        return step
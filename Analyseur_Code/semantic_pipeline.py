@@ -1,109 +1,279 @@
-import networkx as nx
+import os
 import re
-import matplotlib.pyplot as plt
-from typing import List
+from functools import cached_property
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Union
 
+import graph_export
+import instrumentation
+from analysis_graph import AnalysisGraph
+from base_store import DATA_REPO
 from multiword_detector import MultiWordDetector
 from disambiguator_storage import LexicalSenseStorage
 from jdm_fetcher import JDMFetcher
-from anaphora_connector import SimpleAnaphoraLinker
+from jdm_api import JDMApi
 from pos_retrieve import POSTagger
-from semantic_rules import RuleEngine
+from analysis_result import AnalysisResult
+from text_tokenizer import TokenizedText, tokenize, tokenize_batch
+from vocabulary import MappedVocabulary, shared_vocabulary
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
 
 
 class GlobalAnalyzer:
+    # Fenêtre de contexte (en tokens) pour reclasser les sens candidats ; None : meilleur sens de chaque terme
+    SENSE_CONTEXT_WINDOW: Optional[int] = None
+    # stream : phrases tokenisées ensemble, et taille maximale d'un document lu dans un fichier
+    STREAM_BATCH = 256
+    MAX_DOCUMENT_CHARS = 1 << 20
+    # Nœuds dessinés au plus par generate_image (le début du texte, avec ses POS et sens)
+    RENDER_MAX_NODES: Optional[int] = 300
+    # Sans rendu (ANALYSEUR_HEADLESS=1 au démarrage) : pour les traitements par lots
+    HEADLESS = os.environ.get("ANALYSEUR_HEADLESS") == "1"
+
     def __init__(self):
-        self.g = nx.Graph()
-        self.token_list: List[str] = []
-        self.apostrophe_regex = re.compile(r"(\S+)'(\S+)|(\S+)", re.IGNORECASE)
-        self.clean_regex = re.compile(r"[^\w'-]")
-        self.multiw_store = MultiWordDetector()
-        self.sense_storage = LexicalSenseStorage()
-        self.jdm_data = JDMFetcher()
-        self.pos_tagger = POSTagger()
-        self.anaphora_module = SimpleAnaphoraLinker(self.g)
-        self.rules_engine = RuleEngine(self.g)
-
-    def generate_image(self, out_file: str = "semantic_output.png", graph_title: str = "Semantic Graph"):
-        layout_pos = nx.spring_layout(self.g, k=2, iterations=50)
-        edges_labels = {}
-
-        # Récupérer correctement les labels des arêtes
-        for (u, v, d) in self.g.edges(data=True):
-            if isinstance(d, dict) and 'label' in d:
-                edges_labels[(u, v)] = d['label']
-            elif isinstance(d, str):
-                edges_labels[(u, v)] = d
-
-        plt.figure(figsize=(20, 20))
-        nx.draw(
-            self.g,
-            layout_pos,
-            with_labels=True,
-            node_size=3000,
-            node_color="lightgreen",
-            font_size=8,
-            font_weight="bold",
-        )
-        nx.draw_networkx_edge_labels(
-            self.g,
-            layout_pos,
-            edge_labels=edges_labels,
-            font_size=6
-        )
-        plt.title(graph_title)
-        plt.savefig(out_file, dpi=300, bbox_inches='tight')
-        plt.close()
+        # Graphe partagé par les appels successifs de __call__ (nœuds = tokens)
+        self.shared = AnalysisResult(positional=False)
+
+    # Ressources créées (et leur cache chargé) seulement au premier usage
+
+    @cached_property
+    def vocabulary(self) -> MappedVocabulary:
+        # Le même que celui des ressources lexicales : les tokens y sont désignés par identifiant
+        return shared_vocabulary(DATA_REPO)
+
+    @cached_property
+    def multiw_store(self) -> MultiWordDetector:
+        return MultiWordDetector()
+
+    @cached_property
+    def sense_storage(self) -> LexicalSenseStorage:
+        return LexicalSenseStorage()
+
+    @cached_property
+    def jdm_data(self) -> JDMFetcher:
+        return JDMFetcher()
+
+    @cached_property
+    def pos_tagger(self) -> POSTagger:
+        return POSTagger()
+
+    @property
+    def jdm_api(self) -> JDMApi:
+        # Le même enregistrement par mot (un appel à l'API) sert les POS, les sens et le genre
+        return self.pos_tagger
+
+    @property
+    def g(self) -> AnalysisGraph:
+        return self.shared.g
+
+    @property
+    def token_list(self) -> List[str]:
+        return self.shared.token_list
+
+    @property
+    def anaphora_module(self):
+        return self.shared.anaphora_module
+
+    @property
+    def rules_engine(self):
+        return self.shared.rules_engine
+
+    def generate_image(self, out_file: str = "semantic_output.png", graph_title: str = "Semantic Graph",
+                       graph: Union[AnalysisGraph, AnalysisResult] = None, max_nodes: Optional[int] = None,
+                       layout: str = "layered", background: bool = False):
+        """
+        Image du graphe (PNG, SVG, PDF...) : celui de __call__ par défaut, ou graph,
+        un AnalysisGraph ou le résultat d'analyze() ; avec une extension .json, .graphml ou .dot,
+        le graphe est seulement exporté, sans rendu.
+        - Au plus max_nodes nœuds dessinés (RENDER_MAX_NODES par défaut, None : tous).
+        - layout="layered" suit l'ordre r_succ ; "spring" est l'ancienne disposition par forces.
+        - background=True : le dessin se fait dans un thread de rendu ; renvoie un Future.
+        - En mode HEADLESS, rien n'est dessiné (renvoie None) ; les exports restent écrits.
+        """
+        graph = self.g if graph is None else graph
+        if Path(out_file).suffix.lower() in graph_export.EXPORT_FORMATS:
+            return self.export(out_file, graph)
+        if self.HEADLESS:
+            instrumentation.METRICS.count("renders_skipped")
+            return None
+        with instrumentation.METRICS.stage("render"):
+            return graph_export.render(graph, out_file, graph_title,
+                                       max_nodes=self.RENDER_MAX_NODES if max_nodes is None else max_nodes,
+                                       layout=layout, background=background)
+
+    def export(self, out_file: str, graph: Union[AnalysisGraph, AnalysisResult] = None, fmt: Optional[str] = None) -> str:
+        """Écrit le graphe en JSON (node-link), GraphML ou DOT, selon fmt ou l'extension de out_file."""
+        with instrumentation.METRICS.stage("export"):
+            return graph_export.export(self.g if graph is None else graph, out_file, fmt)
 
     def __call__(self, phrase: str):
-        self._analyze_text(phrase)
+        self._analyze_text(phrase, self.shared)
+
+    def analyze(self, text: str, tokenized: Optional[TokenizedText] = None) -> AnalysisResult:
+        """
+        Analyse un texte dans un graphe neuf, avec un nœud par position de token.
+        Les ressources lexicales de l'analyseur sont réutilisées.
+        tokenized : tokens déjà calculés pour ce texte (voir analyze_batch).
+        """
+        result = AnalysisResult(text)
+        self._analyze_text(text, result, tokenized)
+        return result
 
-    def _analyze_text(self, phrase: str):
-        phrase = phrase.lower()
-        self.token_list = self._custom_tokenize(phrase)
+    def analyze_batch(self, texts: List[str]) -> List[AnalysisResult]:
+        """Analyse plusieurs textes, tokenisés ensemble en un seul passage."""
+        return [self.analyze(text, tokenized)
+                for text, tokenized in zip(texts, tokenize_batch(texts, self.vocabulary))]
 
-        # Insert START & END
-        self.token_list.insert(0, "_START")
-        self.token_list.append("_END")
+    def stream(self, source: Union[str, os.PathLike, Iterable[str]], per: str = "sentence") -> Iterator[AnalysisResult]:
+        """
+        Analyse un corpus au fil de l'eau et produit un résultat par phrase (per="sentence")
+        ou par document (per="document"). Chaque résultat a son propre graphe : la mémoire
+        reste bornée quelle que soit la taille du corpus.
 
-        # 1. Ajout des nœuds dans le graphe
-        self.g.add_nodes_from(self.token_list)
+        source : chemin (Path ou autre os.PathLike) d'un fichier texte (documents séparés
+        par une ligne vide), une chaîne (un seul document), ou itérable de documents
+        (ex. une liste de chaînes). Dans un fichier, les phrases sont produites dès que
+        leur fin est lue, et un document est coupé au-delà de MAX_DOCUMENT_CHARS :
+        un fichier sans ligne vide (une phrase par ligne) n'est jamais lu d'un bloc.
+        """
+        if per not in ("sentence", "document"):
+            raise ValueError(f"per must be 'sentence' or 'document', not {per!r}")
+        for units in self._iter_units(source, per):
+            for unit, tokenized in zip(units, tokenize_batch(units, self.vocabulary)):
+                yield self.analyze(unit, tokenized)
+
+    def _iter_units(self, source, per: str) -> Iterator[List[str]]:
+        """Lots de phrases ou de documents, tokenisés ensemble par stream."""
+        if per == "document":
+            for document in self._iter_documents(source):
+                yield [document]
+        elif isinstance(source, os.PathLike):
+            with open(source, encoding="utf-8") as f:
+                batch = []
+                for sentence in self._read_sentences(f):
+                    batch.append(sentence)
+                    if len(batch) == self.STREAM_BATCH:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+        else:
+            for document in self._iter_documents(source):
+                yield self._split_sentences(document)
+
+    @classmethod
+    def _iter_documents(cls, source) -> Iterator[str]:
+        if isinstance(source, os.PathLike):
+            with open(source, encoding="utf-8") as f:
+                yield from cls._read_paragraphs(f)
+            return
+        if isinstance(source, str):
+            source = (source,)
+        for document in source:
+            if document.strip():
+                yield document.strip()
+
+    @classmethod
+    def _read_paragraphs(cls, lines: Iterable[str]) -> Iterator[str]:
+        paragraph, size = [], 0
+        for line in lines:
+            line = line.strip()
+            if line:
+                paragraph.append(line)
+                size += len(line) + 1
+                if size < cls.MAX_DOCUMENT_CHARS:
+                    continue
+            if paragraph:  # ligne vide, ou document trop long coupé ici
+                yield " ".join(paragraph)
+                paragraph, size = [], 0
+        if paragraph:
+            yield " ".join(paragraph)
+
+    @classmethod
+    def _read_sentences(cls, lines: Iterable[str]) -> Iterator[str]:
+        """Phrases des paragraphes, produites au fil des lignes (mêmes phrases que _split_sentences)."""
+        pending = ""
+        for line in lines:
+            line = line.strip()
+            if not line:  # fin de paragraphe : fin de phrase
+                if pending:
+                    yield pending
+                pending = ""
+                continue
+            pending = f"{pending} {line}" if pending else line
+            *complete, pending = SENTENCE_END.split(pending)
+            yield from (s for s in complete if s.strip())
+            if len(pending) >= cls.MAX_DOCUMENT_CHARS:
+                yield pending
+                pending = ""
+        if pending:
+            yield pending
+
+    @staticmethod
+    def _split_sentences(document: str) -> List[str]:
+        return [s for s in SENTENCE_END.split(document) if s.strip()]
+
+    def _analyze_text(self, phrase: str, res: AnalysisResult, tokenized: Optional[TokenizedText] = None):
+        # Chaque étape est chronométrée (voir instrumentation.py)
+        metrics = instrumentation.METRICS
+        g = res.g
+
+        with metrics.stage("tokenize", graph=g):
+            # Positions relatives au texte d'origine (la mise en minuscules est faite par le tokenizer)
+            res.tokenized = tokenized if tokenized is not None else tokenize(phrase, self.vocabulary)
+
+            # Insert START & END
+            tokens = ["_START"] + res.tokenized.tokens + ["_END"]
+
+            # 1. Ajout des nœuds dans le graphe
+            res.token_list, res.nodes = [], []
+            for i, tk in enumerate(tokens):
+                res.add_token_node(i, tk)
+        metrics.count("tokens", len(tokens) - 2)
 
         # 2. Création relations r_succ
-        for i in range(len(self.token_list) - 1):
-            self.g.add_edge(self.token_list[i], self.token_list[i + 1], label="r_succ")
+        with metrics.stage("succession", graph=g):
+            for i in range(len(res.nodes) - 1):
+                res.link(res.nodes[i], res.nodes[i + 1], "r_succ")
 
         # 3. On fetch JDM pour chaque token
-        real_words = self.token_list[1:-1]
-        self.jdm_data.fetch_entries_for_words(real_words)
+        with metrics.stage("jdm_fetch", graph=g):
+            real_words = tokens[1:-1]
+            self.jdm_data.fetch_entries_for_words(real_words)
 
         # 4. POS Tagging
-        self._do_pos_tagging(real_words)
+        with metrics.stage("pos", graph=g):
+            self._do_pos_tagging(res)
 
         # 5. Détection de composés
-        self._detect_compounds(" ".join(self.token_list))
+        with metrics.stage("compounds", graph=g):
+            self._detect_compounds(res)
 
         # 6. Désambiguïsation
-        self._resolve_ambiguity()
+        with metrics.stage("disambiguation", graph=g):
+            self._resolve_ambiguity(res)
 
-        # 7. Résolution anaphorique
-        self.anaphora_module.link_pronouns()
+        # 7. Résolution anaphorique (sur la chaîne des tokens, sans les composés)
+        with metrics.stage("anaphora", graph=g):
+            res.anaphora_module.link_pronouns(res.nodes[:len(tokens)])
 
         # 8. Application des règles sémantiques
-        print("DEBUG: Starting semantic rules application")
-        # Dans _analyze_text
-        self.rules_engine.apply_rules()
-        print("DEBUG: Finished semantic rules application")
-
-    def _custom_tokenize(self, sentence: str) -> List[str]:
-        all_matches = self.apostrophe_regex.findall(sentence)
-        raw_toks = [tk for group in all_matches for tk in group if tk]
-        cleaned = [self.clean_regex.sub("", t).lower() for t in raw_toks]
-        return [c for c in cleaned if c]
-
-    def _do_pos_tagging(self, words: List[str]):
-        for w in words:
-            pos_info = self.pos_tagger.get_pos_tags(w)
+        with metrics.stage("rules", graph=g):
+            res.rules_engine.apply_rules()
+
+    def _term_ids(self, res: AnalysisResult) -> List[int]:
+        """Identifiant de chaque entrée de token_list (-1 pour _START et _END)."""
+        ids = [-1, *res.tokenized.ids, -1]
+        compounds = res.token_list[len(ids):]
+        return ids + self.vocabulary.intern_all(compounds) if compounds else ids
+
+    def _do_pos_tagging(self, res: AnalysisResult):
+        self._tag_nodes(res, res.nodes[1:-1], res.tokenized.ids)
+
+    def _tag_nodes(self, res: AnalysisResult, nodes: Iterable[str], term_ids: Iterable[int]):
+        for node, term_id in zip(nodes, term_ids):
+            pos_info = self.pos_tagger.pos_tags_by_id(term_id)
             for pos_type, weight in pos_info.items():
                 if pos_type == "Nom":
                     pos_node = "Nom:"
@@ -116,40 +286,27 @@ class GlobalAnalyzer:
                 else:
                     pos_node = f"{pos_type}:"
 
-                self.g.add_node(pos_node)
-                self.g.add_edge(w, pos_node, label="r_pos:", weight=weight)
+                res.g.add_node(pos_node)
+                res.link(node, pos_node, "r_pos:", weight=weight)
 
-    def _detect_compounds(self, full_str: str):
-        for multi_expr in self.multiw_store.known_composites:
-            if multi_expr not in full_str:
-                continue
-            splitted = self._custom_tokenize(multi_expr)
-            idx = 0
-            while idx < len(self.token_list):
-                try:
-                    start_i = self.token_list.index(splitted[0], idx)
-                    if all(
-                            self.token_list[start_i + off] == splitted[off]
-                            for off in range(len(splitted))
-                    ):
-                        self.token_list.append(multi_expr)
-                        self.g.add_node(multi_expr)
-                        final_pos = start_i + len(splitted) - 1
-
-                        if start_i > 0:
-                            self.g.add_edge(self.token_list[start_i - 1], multi_expr, label="r_succ")
-                        if final_pos < len(self.token_list) - 1:
-                            self.g.add_edge(multi_expr, self.token_list[final_pos + 1], label="r_succ")
-
-                        idx = final_pos + 1
-                    else:
-                        idx = start_i + 1
-                except ValueError:
-                    break
-
-    def _resolve_ambiguity(self):
-        for tk in self.token_list:
-            sense, w = self.sense_storage.find_best_sense(tk)
+    def _detect_compounds(self, res: AnalysisResult):
+        # Un seul passage de l'automate sur les tokens de la phrase
+        base_nodes = list(res.nodes)
+        for start_i, end_i, multi_expr in self.multiw_store.find_compounds_by_id(self._term_ids(res)):
+            expr_node = res.add_token_node(start_i, multi_expr)
+
+            if start_i > 0:
+                res.link(base_nodes[start_i - 1], expr_node, "r_succ")
+            if end_i < len(base_nodes):
+                res.link(expr_node, base_nodes[end_i], "r_succ")
+
+    def _resolve_ambiguity(self, res: AnalysisResult):
+        # Tout le document d'un coup : les tokens (dans leur contexte) puis les composés
+        term_ids = self._term_ids(res)
+        n_tokens = len(res.tokenized.ids) + 2
+        senses = self.sense_storage.resolve(term_ids[:n_tokens], window=self.SENSE_CONTEXT_WINDOW)
+        senses += self.sense_storage.resolve(term_ids[n_tokens:])
+        for node, (sense, w) in zip(res.nodes, senses):
             if sense:
-                self.g.add_node(sense)
-                self.g.add_edge(tk, sense, label="r_disambiguate")
\ No newline at end of file
+                res.g.add_node(sense)
+                res.g.add_edge(node, sense, label="r_disambiguate")
@@ -1,139 +1,398 @@
+from collections import defaultdict
+from enum import IntFlag
+from pathlib import Path
+
+import instrumentation
+from rule_compiler import CompiledRule, load_rules
+
+RULES_FILE = Path(__file__).with_name("semantic_rules.txt")
+
+
+class POS(IntFlag):
+    """Catégories grammaticales utilisées par les règles (masque de bits)."""
+    NONE = 0
+    DET = 1
+    NOM = 2
+    VER = 4
+    ADJ = 8
+
+
+# Les index stockent des int (valeurs de POS) : les opérations sur IntFlag sont lentes
+POS_BY_TYPE = {"Det:": int(POS.DET), "Nom:": int(POS.NOM), "Ver:": int(POS.VER), "Adj:": int(POS.ADJ)}
+
+
+def pos_of_node(pos_node):
+    """Catégorie désignée par un nœud POS du graphe ("Nom::", "Det:Mas+SG:", ...)."""
+    if pos_node == "Nom::":
+        return POS_BY_TYPE["Nom:"]
+    elif pos_node == "Ver::":
+        return POS_BY_TYPE["Ver:"]
+    elif pos_node == "Adj::":
+        return POS_BY_TYPE["Adj:"]
+    elif pos_node.startswith("Det:"):
+        return POS_BY_TYPE["Det:"]
+    return 0
+
+
+BASE_RELATIONS = ("r_pos", "r_succ")
+HANDWRITTEN_REACH = 3  # règles écrites à la main : chaînes d'au plus 4 tokens (rule_lieu)
+HANDWRITTEN_LABELS = ("r_agent", "r_agent-1", "r_patient", "r_patient-1", "r_carac", "r_lieu")
+
+
 class RuleEngine:
-    def __init__(self, graph):
+    """
+    Applique les règles jusqu'au point fixe, en évaluation semi-naïve :
+    à chaque tour, les règles ne sont jointes qu'aux faits nouveaux du tour précédent.
+    Les règles sont lues depuis rules_file (voir semantic_rules.txt) et compilées en
+    plans de jointure ; avec rules_file=None on utilise les règles écrites à la main.
+    """
+
+    def __init__(self, graph, rules_file=RULES_FILE):
         self.g = graph
-        self.rules = [
-            self.rule_agent_simple,
-            self.rule_patient_simple,
-            self.rule_caracteristique,
-            self.rule_lieu
-        ]
+        if rules_file is None:
+            self.rules = [
+                self.rule_agent_simple,
+                self.rule_patient_simple,
+                self.rule_caracteristique,
+                self.rule_lieu
+            ]
+        else:
+            self.rules = self.compile_rules(load_rules(rules_file))
+        # Index construits une fois (build_index) puis tenus à jour par index_edge
+        self.pos_index = {}  # nœud -> masque de bits POS
+        self.pos_nodes = defaultdict(dict)  # POS -> nœuds (dict ordonné utilisé comme ensemble)
+        # r_succ est orienté : successeurs et prédécesseurs (dicts ordonnés utilisés comme ensembles)
+        self.succ_map = {}
+        self.pred_map = {}
+        self._indexed = graph.number_of_edges() == 0
+        self.derived = set()  # relations déjà produites : (source, label, cible)
+        # Relations dérivées indexées dans les deux sens : label -> nœud -> voisins
+        self.rel_out = defaultdict(lambda: defaultdict(dict))
+        self.rel_in = defaultdict(lambda: defaultdict(dict))
+        # Token porté par chaque nœud (les nœuds positionnels "le#3" portent "le")
+        self.token_of = {}
+        self.nodes_by_token = defaultdict(dict)
+        # Faits de base arrivés depuis le dernier apply_rules : relation -> {(u, v)}
+        self._pending = defaultdict(set)
+        self.round_stats = []  # nombre de faits dérivés à chaque tour
+        self.fact_counts = defaultdict(int)  # relation -> nombre de faits connus
+
+    def build_index(self):
+        """
+        Parcourt le graphe une seule fois pour construire les index POS et r_succ,
+        et ceux des relations déjà dérivées par les règles (graphe dépicklé par exemple).
+        """
+        # Vidés sur place : les plans compilés gardent une référence vers ces index
+        self.pos_index.clear()
+        self.pos_nodes.clear()
+        self.succ_map.clear()
+        self.pred_map.clear()
+        self.derived.clear()
+        self.rel_out.clear()
+        self.rel_in.clear()
+        self.fact_counts.clear()
+        heads = self.derived_labels()
+        for u, v, data in self.g.edges(data=True):
+            label = data.get("label", "")
+            if label in heads:
+                self.derived.add((u, label, v))
+                self.fact_counts[label] += 1
+                self.rel_out[label][u][v] = None
+                self.rel_in[label][v][u] = None
+            else:
+                self.index_edge(u, v, label)
+        self._indexed = True
+
+    def derived_labels(self):
+        """Relations produites par les règles (conclusions)."""
+        labels = set()
+        for rule in self.rules:
+            if isinstance(rule, CompiledRule):
+                labels.update(rel for _, rel, _ in rule.rule.head)
+            else:
+                labels.update(HANDWRITTEN_LABELS)
+        return labels
+
+    def index_token(self, node, token):
+        self.token_of[node] = token
+        self.nodes_by_token[token][node] = None
+
+    def token(self, node):
+        """Token d'un nœud ; sans index_token, le nœud est son propre token."""
+        return self.token_of.get(node, node)
+
+    def index_edge(self, u, v, label):
+        """Mise à jour incrémentale des index lors de l'ajout d'une arête."""
+        if label.startswith("r_pos"):
+            # Le nœud POS peut être l'une ou l'autre extrémité (graphes networkx non orientés)
+            for node, pos_node in ((u, v), (v, u)):
+                flag = pos_of_node(pos_node)
+                if flag and not self.pos_index.get(node, 0) & flag:
+                    self.pos_index[node] = self.pos_index.get(node, 0) | flag
+                    self.pos_nodes[flag][node] = None
+                    self._pending["r_pos"].add((node, pos_node))
+                    self.fact_counts["r_pos"] += 1
+        elif label == "r_succ":
+            if v not in self.succ_map.get(u, ()):
+                self.succ_map.setdefault(u, {})[v] = None
+                self.pred_map.setdefault(v, {})[u] = None
+                self._pending["r_succ"].add((u, v))
+                self.fact_counts["r_succ"] += 1
 
     def apply_rules(self):
-        modified = True
-        while modified:
-            modified = False
+        if not self._indexed:
+            self.build_index()
+        delta, self._pending = self._pending, defaultdict(set)
+        self.round_stats = []
+        metrics = instrumentation.METRICS
+        while any(delta.values()):
+            new_facts = defaultdict(set)
             for rule in self.rules:
-                if rule():
-                    modified = True
-                    print(f"Rule {rule.__name__} applied")
+                added = 0
+                with metrics.stage("rule", rule=rule.__name__):
+                    for u, label, v in rule(delta):
+                        if self._add_relation(u, v, label):
+                            new_facts[label].add((u, v))
+                            added += 1
+                if added:
+                    metrics.count("rule_facts", added, rule=rule.__name__)
+            self.round_stats.append(sum(len(f) for f in new_facts.values()))
+            metrics.count("rule_rounds")
+            delta = new_facts
 
     def _has_pos(self, node, pos_type):
         """Vérifie si un nœud a un type POS."""
-        for _, neighbor, data in self.g.edges(node, data=True):
-            if data.get("label", "").startswith("r_pos"):
-                # Conversion des tags reçus
-                if pos_type == "Nom:" and neighbor == "Nom::":
-                    return True
-                elif pos_type == "Ver:" and neighbor == "Ver::":
-                    return True
-                elif pos_type == "Adj:" and neighbor == "Adj::":
-                    return True
-                elif pos_type == "Det:" and neighbor.startswith("Det:"):
-                    return True
-        return False
+        return bool(self.pos_index.get(node, 0) & POS_BY_TYPE[pos_type])
 
     def _has_succ(self, node1, node2):
-        edge_data = self.g.get_edge_data(node1, node2)
-        if not edge_data:
+        return node2 in self.succ_map.get(node1, ())
+
+    def _succ(self, node):
+        return self.succ_map.get(node, {})
+
+    def _pred(self, node):
+        return self.pred_map.get(node, {})
+
+    def _add_relation(self, u, v, label):
+        """Ajoute la relation si elle est nouvelle ; renvoie True dans ce cas."""
+        if (u, label, v) in self.derived:
             return False
+        self.derived.add((u, label, v))
+        self.fact_counts[label] += 1
+        self.rel_out[label][u][v] = None
+        self.rel_in[label][v][u] = None
+        self.g.add_edge(u, v, label=label, weight=1)
+        return True
+
+    # Ré-analyse incrémentale : retrait de faits et relance locale
 
-        # Check si l'arête a le label r_succ
-        for key in edge_data:
-            data = edge_data[key]
-            if isinstance(data, dict) and data.get("label") == "r_succ":
-                return True
-            elif isinstance(data, str) and data == "r_succ":
-                return True
-        return False
-        # Si on a un dict avec attributs
-        return any(
-            isinstance(data, dict) and data.get("label") == "r_succ"
-            for data in edge_data.values()
-        )
-
-    def rule_agent_simple(self):
+    def reach(self):
         """
-        $x r_pos Det: & $y r_pos Nom: & $z r_pos Ver: & 
-        $x r_succ $y & $y r_succ $z 
-        => $z r_agent $y & $y r_agent-1 $z
+        Écart maximal, en pas de r_succ, entre deux nœuds d'une même correspondance de règle :
+        un fait dérivé ne dépend que des tokens à cette distance de ses extrémités.
+        None si une règle n'est pas locale (relation dérivée en prémisse, ou variables
+        qui ne sont pas reliées par r_succ).
         """
-        modified = False
-        for x in self.g.nodes():
-            if not self._has_pos(x, "Det:"):
+        reach = 0
+        for rule in self.rules:
+            if not isinstance(rule, CompiledRule):
+                reach = max(reach, HANDWRITTEN_REACH)
                 continue
-            for y in self.g.neighbors(x):
-                if not self._has_pos(y, "Nom:"):
-                    continue
-                for z in self.g.neighbors(y):
-                    if not self._has_pos(z, "Ver:"):
-                        continue
-                    if self._has_succ(x, y) and self._has_succ(y, z):
-                        print(f"Adding agent relation between {z} and {y}")
-                        self.g.add_edge(z, y, label="r_agent", weight=1)
-                        self.g.add_edge(y, z, label="r_agent-1", weight=1)
-                        modified = True
-        return modified
-
-    def rule_patient_simple(self):
-        modified = False
-        nodes = list(self.g.nodes())  # Créer une copie de la liste des nœuds
-
-        for x in nodes:
-            if not self._has_pos(x, "Ver:"):
+            variables = {a.left for a in rule.rule.body}
+            links = {v: set() for v in variables}
+            for atom in rule.rule.body:
+                if atom.kind == "rel":
+                    if atom.relation != "r_succ":
+                        return None
+                    variables.add(atom.target)
+                    links.setdefault(atom.left, set()).add(atom.target)
+                    links.setdefault(atom.target, set()).add(atom.left)
+            seen, stack = set(), [next(iter(variables))] if variables else []
+            while stack:
+                var = stack.pop()
+                if var not in seen:
+                    seen.add(var)
+                    stack.extend(links.get(var, ()))
+            if seen != variables:
+                return None
+            reach = max(reach, len(variables) - 1)
+        return reach
+
+    def retract(self, nodes, remove=False):
+        """
+        Retire les faits dérivés qui touchent ces nœuds, dans les index et dans le graphe.
+        remove=True : les nœuds disparaissent aussi des index (POS, r_succ, tokens) ;
+        leurs arêtes de base sont retirées du graphe par l'appelant (remove_node).
+        """
+        for node in nodes:
+            for out_map, in_map, outgoing in ((self.rel_out, self.rel_in, True), (self.rel_in, self.rel_out, False)):
+                for label, by_node in out_map.items():
+                    for other in by_node.pop(node, ()):
+                        u, v = (node, other) if outgoing else (other, node)
+                        in_map[label].get(other, {}).pop(node, None)
+                        self.derived.discard((u, label, v))
+                        self.fact_counts[label] -= 1
+                        self.g.remove_edge(u, v, label)
+            if not remove:
                 continue
-            for y in list(self.g.neighbors(x)):  # Copie des voisins
-                if not self._has_pos(y, "Det:"):
+            mask = self.pos_index.pop(node, 0)
+            for flag in POS_BY_TYPE.values():
+                if mask & flag:
+                    self.pos_nodes[flag].pop(node, None)
+                    self.fact_counts["r_pos"] -= 1
+            for v in self.succ_map.pop(node, ()):
+                self.pred_map.get(v, {}).pop(node, None)
+                self.fact_counts["r_succ"] -= 1
+            for u in self.pred_map.pop(node, ()):
+                if u != node:  # une boucle a déjà été comptée avec les successeurs
+                    self.succ_map.get(u, {}).pop(node, None)
+                    self.fact_counts["r_succ"] -= 1
+            token = self.token_of.pop(node, None)
+            if token is not None:
+                self.nodes_by_token[token].pop(node, None)
+        if remove:
+            gone = set(nodes)
+            for rel, facts in self._pending.items():
+                self._pending[rel] = {(u, v) for u, v in facts if u not in gone and v not in gone}
+
+    def unlink(self, u, v):
+        """Retire le fait r_succ u -> v des index (l'arête est retirée du graphe par l'appelant)."""
+        if self.succ_map.get(u, {}).pop(v, ()) is None:
+            self.pred_map[v].pop(u, None)
+            self.fact_counts["r_succ"] -= 1
+
+    def reseed(self, nodes):
+        """
+        Remet les faits de base de ces nœuds dans le delta : le prochain apply_rules
+        rejoint les règles autour d'eux (et seulement autour d'eux).
+        """
+        for node in nodes:
+            seen = 0  # un fait par catégorie, comme dans index_edge
+            for pos_node in self.g.successors(node, "r_pos:"):
+                flag = pos_of_node(pos_node)
+                if flag and not seen & flag:
+                    seen |= flag
+                    self._pending["r_pos"].add((node, pos_node))
+            for v in self.succ_map.get(node, ()):
+                self._pending["r_succ"].add((node, v))
+            for u in self.pred_map.get(node, ()):
+                self._pending["r_succ"].add((u, node))
+
+    def compile_rules(self, rules):
+        for rule in rules:
+            for atom in rule.body:
+                if atom.kind == "pos" and atom.target not in POS_BY_TYPE:
+                    raise ValueError(f"Unknown POS {atom.target!r} in rule {rule.name}")
+        return [CompiledRule(rule, self) for rule in rules]
+
+    # Accès aux index utilisés par les plans compilés (rule_compiler.CompiledRule)
+
+    def has_node(self, node):
+        return node in self.pos_index or node in self.succ_map or node in self.pred_map
+
+    def nodes_for_token(self, token):
+        nodes = list(self.nodes_by_token.get(token, ()))
+        if token not in self.token_of and self.has_node(token):
+            nodes.append(token)
+        return nodes
+
+    def pos_mask(self, pos_type):
+        return POS_BY_TYPE[pos_type]
+
+    @staticmethod
+    def delta_pos_nodes(delta, pos_type):
+        flag = POS_BY_TYPE[pos_type]
+        return [node for node, pos_node in delta.get("r_pos", ()) if pos_of_node(pos_node) & flag]
+
+    def delta_is_complete(self, delta, relations):
+        """Vrai si le delta contient tous les faits connus de ces relations."""
+        return all(len(delta.get(rel, ())) == self.fact_counts[rel] for rel in relations)
+
+    def facts(self, relation):
+        if relation == "r_succ":
+            return [(u, v) for u, nexts in self.succ_map.items() for v in nexts]
+        return [(u, v) for u, nexts in self.rel_out.get(relation, {}).items() for v in nexts]
+
+    @staticmethod
+    def delta_facts(delta, relation):
+        return list(delta.get(relation, ()))
+
+    @staticmethod
+    def _seeds(delta, relations=BASE_RELATIONS):
+        """Nœuds concernés par les faits nouveaux des relations lues par une règle."""
+        seeds = {}
+        for rel in relations:
+            for u, v in delta.get(rel, ()):
+                seeds[u] = None
+                if rel != "r_pos":
+                    seeds[v] = None
+        return seeds
+
+    def _chains(self, seeds, tests):
+        """
+        Chaînes x0 r_succ x1 r_succ ... dont chaque nœud xi vérifie tests[i]
+        et qui passent par au moins un nœud de seeds : seules les correspondances
+        utilisant un fait nouveau sont énumérées.
+        """
+        for seed in seeds:
+            for p, test in enumerate(tests):
+                if not test(seed):
                     continue
-                for z in list(self.g.neighbors(y)):  # Copie des voisins
-                    if not self._has_pos(z, "Nom:"):
-                        continue
-                    if self._has_succ(x, y) and self._has_succ(y, z):
-                        print(f"Adding patient relation between {x} and {z}")
-                        self.g.add_edge(x, z, label="r_patient", weight=1)
-                        self.g.add_edge(z, x, label="r_patient-1", weight=1)
-                        modified = True
-        return modified
-    def rule_caracteristique(self):
+                for left in self._extend([seed], tests[:p][::-1], self._pred):
+                    for right in self._extend([seed], tests[p + 1:], self._succ):
+                        yield tuple(left[::-1]) + tuple(right[1:])
+
+    def _extend(self, path, tests, step):
+        if not tests:
+            yield path
+            return
+        for nxt in step(path[-1]):
+            if tests[0](nxt):
+                yield from self._extend(path + [nxt], tests[1:], step)
+
+    def _is(self, pos_type):
+        return lambda node: self._has_pos(node, pos_type)
+
+    def rule_agent_simple(self, delta):
+        """
+        $x r_pos Det: & $y r_pos Nom: & $z r_pos Ver: & 
+        $x r_succ $y & $y r_succ $z 
+        => $z r_agent $y & $y r_agent-1 $z
+        """
+        tests = [self._is("Det:"), self._is("Nom:"), self._is("Ver:")]
+        for x, y, z in self._chains(self._seeds(delta), tests):
+            yield z, "r_agent", y
+            yield y, "r_agent-1", z
+
+    def rule_patient_simple(self, delta):
+        """
+        $x r_pos Ver: & $y r_pos Det: & $z r_pos Nom: &
+        $x r_succ $y & $y r_succ $z
+        => $x r_patient $z & $z r_patient-1 $x
+        """
+        tests = [self._is("Ver:"), self._is("Det:"), self._is("Nom:")]
+        for x, y, z in self._chains(self._seeds(delta), tests):
+            yield x, "r_patient", z
+            yield z, "r_patient-1", x
+
+    def rule_caracteristique(self, delta):
         """
         $x r_pos Nom: & $y r_pos Adj: & ($x r_succ $y | $y r_succ $x)
         => $x r_carac $y
         """
-        modified = False
-        for x in self.g.nodes():
-            if not self._has_pos(x, "Nom:"):
-                continue
-            for y in self.g.neighbors(x):
-                if not self._has_pos(y, "Adj:"):
-                    continue
-                if self._has_succ(x, y) or self._has_succ(y, x):
-                    print(f"Adding caracteristique relation between {x} and {y}")
-                    self.g.add_edge(x, y, label="r_carac", weight=1)
-                    modified = True
-        return modified
+        tests = [self._is("Nom:"), self._is("Adj:")]
+        for x, y in self._chains(self._seeds(delta), tests):
+            yield x, "r_carac", y
+        for y, x in self._chains(self._seeds(delta), tests[::-1]):
+            yield x, "r_carac", y
 
-    def rule_lieu(self):
+    def rule_lieu(self, delta):
         """
         $x r_pos Ver: & $y == "dans"/"sur" & $z r_pos Det: & $t r_pos Nom: &
         $x r_succ $y & $y r_succ $z & $z r_succ $t
         => $x r_lieu $t
         """
-        modified = False
         preps_lieu = {"dans", "sur", "sous", "en"}
-        for x in self.g.nodes():
-            if not self._has_pos(x, "Ver:"):
-                continue
-            for y in self.g.neighbors(x):
-                if y not in preps_lieu:
-                    continue
-                for z in self.g.neighbors(y):
-                    if not self._has_pos(z, "Det:"):
-                        continue
-                    for t in self.g.neighbors(z):
-                        if not self._has_pos(t, "Nom:"):
-                            continue
-                        if (self._has_succ(x, y) and self._has_succ(y, z) 
-                            and self._has_succ(z, t)):
-                            print(f"Adding lieu relation between {x} and {t}")
-                            self.g.add_edge(x, t, label="r_lieu", weight=1)
-                            modified = True
-        return modified
\ No newline at end of file
+        tests = [self._is("Ver:"), lambda node: self.token(node) in preps_lieu, self._is("Det:"), self._is("Nom:")]
+        for x, y, z, t in self._chains(self._seeds(delta), tests):
+            yield x, "r_lieu", t
@@ -0,0 +1,407 @@
+# sense_index.py
+
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from base_store import CacheBackend
+
+try:
+    import numpy as np  # table des meilleurs sens et résolution par lots (resolve)
+except ImportError:  # sans numpy, la désambiguïsation se fait token par token
+    np = None
+
+# Format binaire (little-endian) :
+#   en-tête | table des termes (n+1 lignes) | table des sens | réserve de chaînes
+# Une ligne de la table des termes = (offset du terme, longueur, premier sens).
+# La dernière ligne sert de sentinelle : son "premier sens" = nombre total de sens.
+# Les sens d'un terme sont triés par poids décroissant : le premier est le meilleur.
+MAGIC = b"JDMSENS1"
+HEADER = struct.Struct("<8sIIdQQQ")  # magic, n_terms, n_senses, last_save, off_terms, off_senses, off_pool
+TERM_ROW = struct.Struct("<QII")  # offset du terme, longueur, indice du premier sens
+SENSE_ROW = struct.Struct("<QIi")  # offset du sens, longueur, poids
+if np is not None:
+    # Les mêmes lignes vues par numpy (construction de la table .topk)
+    TERM_DTYPE = np.dtype([("off", "<u8"), ("len", "<u4"), ("first", "<u4")])
+    SENSE_DTYPE = np.dtype([("off", "<u8"), ("len", "<u4"), ("weight", "<i4")])
+
+# Table annexe (fichier .ids) : identifiant de terme du vocabulaire -> ligne de l'index (-1 : absent).
+# Valable pour un vocabulaire (uid) et un contenu d'index (empreinte) donnés.
+IDS_MAGIC = b"JDMSIDS1"
+IDS_HEADER = struct.Struct("<8s16sQI")  # magic, uid du vocabulaire, empreinte de l'index, nb d'identifiants
+IDS_BATCH = 100000  # termes internés par lot lors de la construction de la table
+
+# Table annexe (fichier .topk) : pour chaque ligne de l'index, ses TOP_K meilleurs sens
+# en trois tableaux (ligne, TOP_K) : indice du sens (-1 : aucun), poids, et identifiant
+# dans le vocabulaire de sa glose (« chat>animal » -> « animal »), utilisée comme contexte.
+# Comme la table .ids, elle dépend du vocabulaire (uid) et du contenu de l'index.
+TOPK_MAGIC = b"JDMSTOP1"
+TOPK_HEADER = struct.Struct("<8s16sQII")  # magic, uid du vocabulaire, empreinte de l'index, nb de lignes, K
+TOP_K = 4
+
+
+class SenseIndexWriter:
+    """
+    Écrit un index de sens en flux : les termes doivent être ajoutés dans l'ordre trié.
+    Les tables sont écrites dans des fichiers temporaires puis assemblées à la fin,
+    et le fichier final remplace l'ancien de façon atomique.
+    Les chaînes de sens répétées partagent leur place dans la réserve, à travers une table
+    des SENSE_REFS_MAX dernières chaînes vues : la mémoire ne dépend pas de la taille du dump.
+    """
+
+    SENSE_REFS_MAX = 1 << 16
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._terms = tempfile.TemporaryFile()
+        self._senses = tempfile.TemporaryFile()
+        self._pool = tempfile.TemporaryFile()
+        self._pool_size = 0
+        self._sense_refs: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._n_terms = 0
+        self._n_senses = 0
+        self._last_term: Optional[bytes] = None
+
+    def _intern(self, text: str) -> Tuple[int, int]:
+        ref = self._sense_refs.get(text)
+        if ref is None:
+            ref = self._append_pool(text.encode("utf-8"))
+            self._sense_refs[text] = ref
+            if len(self._sense_refs) > self.SENSE_REFS_MAX:
+                self._sense_refs.popitem(last=False)
+        else:
+            self._sense_refs.move_to_end(text)
+        return ref
+
+    def _append_pool(self, raw: bytes) -> Tuple[int, int]:
+        ref = (self._pool_size, len(raw))
+        self._pool.write(raw)
+        self._pool_size += len(raw)
+        return ref
+
+    def add(self, term: str, senses: Iterable[Tuple[str, int]]):
+        raw_term = term.encode("utf-8")
+        if self._last_term is not None and raw_term <= self._last_term:
+            raise ValueError(f"Terms must be added in sorted order: {term!r}")
+        self._last_term = raw_term
+
+        # Tri stable : à poids égal, on garde l'ordre d'origine (comme max())
+        ordered = sorted(senses, key=lambda s: -s[1])
+        if not ordered:
+            return
+        term_off, term_len = self._append_pool(raw_term)
+        self._terms.write(TERM_ROW.pack(term_off, term_len, self._n_senses))
+        for sense, weight in ordered:
+            sense_off, sense_len = self._intern(sense)
+            self._senses.write(SENSE_ROW.pack(sense_off, sense_len, weight))
+        self._n_terms += 1
+        self._n_senses += len(ordered)
+
+    def close(self, last_save: datetime):
+        self._terms.write(TERM_ROW.pack(0, 0, self._n_senses))
+        off_terms = HEADER.size
+        off_senses = off_terms + (self._n_terms + 1) * TERM_ROW.size
+        off_pool = off_senses + self._n_senses * SENSE_ROW.size
+
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(HEADER.pack(
+                MAGIC, self._n_terms, self._n_senses, last_save.timestamp(),
+                off_terms, off_senses, off_pool,
+            ))
+            for part in (self._terms, self._senses, self._pool):
+                part.seek(0)
+                shutil.copyfileobj(part, out)
+                part.close()
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class SenseIndex:
+    """
+    Index de sens ouvert en mmap : rien n'est chargé en mémoire, la recherche
+    d'un terme se fait par dichotomie directement dans le fichier.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._n_terms, self._n_senses, stamp, self._off_terms, self._off_senses, self._off_pool = \
+            HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a sense index")
+        self.last_save = datetime.fromtimestamp(stamp)
+        self._rows = None  # table identifiant de terme -> ligne (attach_vocabulary)
+        self._vocabulary = None  # vocabulaire attaché (traduction des identifiants provisoires)
+        self._top = None  # (sens, poids, gloses) des TOP_K meilleurs sens par ligne
+
+    @classmethod
+    def build(cls, path: Path, data_map: Dict[str, List[Tuple[str, int]]], last_save: datetime) -> "SenseIndex":
+        writer = SenseIndexWriter(path)
+        for term in sorted(data_map):
+            writer.add(term, data_map[term])
+        writer.close(last_save)
+        return cls(path)
+
+    def close(self):
+        self._mm.close()
+
+    def __len__(self) -> int:
+        return self._n_terms
+
+    def __contains__(self, term: str) -> bool:
+        return self._find(term) >= 0
+
+    def _term_row(self, i: int) -> Tuple[int, int, int]:
+        return TERM_ROW.unpack_from(self._mm, self._off_terms + i * TERM_ROW.size)
+
+    def _text(self, off: int, length: int) -> bytes:
+        start = self._off_pool + off
+        return self._mm[start:start + length]
+
+    def _find(self, term: str) -> int:
+        target = term.encode("utf-8")
+        lo, hi = 0, self._n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off, length, _ = self._term_row(mid)
+            current = self._text(off, length)
+            if current < target:
+                lo = mid + 1
+            elif current > target:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def _sense(self, j: int) -> Tuple[str, int]:
+        off, length, weight = SENSE_ROW.unpack_from(self._mm, self._off_senses + j * SENSE_ROW.size)
+        return self._text(off, length).decode("utf-8"), weight
+
+    def get(self, term: str, default=None) -> Optional[List[Tuple[str, int]]]:
+        i = self._find(term)
+        if i < 0:
+            return default
+        first = self._term_row(i)[2]
+        last = self._term_row(i + 1)[2]
+        return [self._sense(j) for j in range(first, last)]
+
+    def best(self, term: str) -> Tuple[str, int]:
+        """
+        Sens le mieux pondéré (précalculé : c'est le premier de la liste).
+        """
+        i = self._find(term)
+        if i < 0:
+            return ("", 0)
+        return self._sense(self._term_row(i)[2])
+
+    # Accès par identifiant de terme
+
+    def _fingerprint(self) -> int:
+        # La table des termes (positions et premiers sens) change à chaque reconstruction
+        terms = self._mm[self._off_terms:self._off_senses]
+        return (zlib.crc32(terms) << 32) | (self._n_senses & 0xFFFFFFFF)
+
+    def attach_vocabulary(self, vocabulary):
+        """
+        Permet les recherches par identifiant de terme : tous les termes de l'index sont
+        écrits dans le vocabulaire (identifiants durables), et la table identifiant -> ligne est gardée dans un
+        fichier .ids (mmap) à côté de l'index, reconstruite seulement si l'index ou le
+        vocabulaire ont changé. Un identifiant au-delà de la table désigne un terme interné
+        après sa construction, donc absent de l'index.
+        """
+        ids_path = self.path.with_suffix(".ids")
+        fingerprint = self._fingerprint()
+        rows = self._load_rows(ids_path, vocabulary.uid, fingerprint)
+        if rows is None:
+            table = array("i")
+            for start in range(0, self._n_terms, IDS_BATCH):
+                stop = min(start + IDS_BATCH, self._n_terms)
+                terms = [self._text(*self._term_row(i)[:2]).decode("utf-8") for i in range(start, stop)]
+                for row, term_id in enumerate(vocabulary.persist_all(terms), start):
+                    if term_id >= len(table):
+                        table.extend([-1] * (term_id + 1 - len(table)))
+                    table[term_id] = row
+            vocabulary.sync()
+            tmp_path = ids_path.with_suffix(".ids.tmp")
+            with open(tmp_path, "wb") as out:
+                out.write(IDS_HEADER.pack(IDS_MAGIC, vocabulary.uid, fingerprint, len(table)))
+                out.write(table.tobytes())
+            os.replace(tmp_path, ids_path)
+            rows = self._load_rows(ids_path, vocabulary.uid, fingerprint)
+        self._rows = rows
+        self._vocabulary = vocabulary
+        if np is not None:
+            topk_path = self.path.with_suffix(".topk")
+            top = self._load_top(topk_path, vocabulary.uid, fingerprint)
+            if top is None:
+                self._write_top(topk_path, vocabulary, fingerprint)
+                top = self._load_top(topk_path, vocabulary.uid, fingerprint)
+            self._top = top
+
+    @staticmethod
+    def _load_rows(ids_path: Path, uid: bytes, fingerprint: int):
+        if not ids_path.exists():
+            return None
+        with open(ids_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, file_uid, file_fingerprint, n = IDS_HEADER.unpack_from(mm, 0)
+        if magic != IDS_MAGIC or file_uid != uid or file_fingerprint != fingerprint:
+            mm.close()
+            return None
+        return memoryview(mm)[IDS_HEADER.size:IDS_HEADER.size + 4 * n].cast("i")
+
+    def _write_top(self, topk_path: Path, vocabulary, fingerprint: int):
+        # Les sens d'un terme sont déjà triés : ses K meilleurs sont les K premiers de sa plage
+        terms = np.frombuffer(self._mm, dtype=TERM_DTYPE, count=self._n_terms + 1, offset=self._off_terms)
+        senses = np.frombuffer(self._mm, dtype=SENSE_DTYPE, count=self._n_senses, offset=self._off_senses)
+        first = terms["first"].astype(np.int64)
+        rank = np.arange(TOP_K)
+        valid = rank < (first[1:] - first[:-1])[:, None]
+        top = np.where(valid, first[:-1, None] + rank, -1)
+        picked = top[valid]
+        weights = np.zeros(top.shape, dtype=np.int32)
+        weights[valid] = senses["weight"][picked]
+        # Une glose par chaîne distincte de la réserve (les chaînes répétées y sont en général partagées)
+        offsets, inverse = np.unique(senses["off"][picked], return_inverse=True)
+        lengths = senses["len"][picked][np.unique(inverse, return_index=True)[1]]
+        glosses = [_gloss(self._text(int(off), int(length)).decode("utf-8")) for off, length in zip(offsets, lengths)]
+        distinct = list(dict.fromkeys(glosses))  # beaucoup de sens partagent une glose
+        by_gloss = dict(zip(distinct, vocabulary.persist_all(distinct)))
+        gloss_ids = np.full(top.shape, -1, dtype=np.int32)
+        gloss_ids[valid] = np.asarray([by_gloss[g] for g in glosses], dtype=np.int32)[inverse.ravel()]
+        vocabulary.sync()
+        tmp_path = topk_path.with_suffix(".topk.tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(TOPK_HEADER.pack(TOPK_MAGIC, vocabulary.uid, fingerprint, self._n_terms, TOP_K))
+            for table in (top.astype(np.int32), weights, gloss_ids):
+                out.write(table.tobytes())
+        os.replace(tmp_path, topk_path)
+
+    @staticmethod
+    def _load_top(topk_path: Path, uid: bytes, fingerprint: int):
+        if not topk_path.exists():
+            return None
+        with open(topk_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, file_uid, file_fingerprint, n, k = TOPK_HEADER.unpack_from(mm, 0)
+        if magic != TOPK_MAGIC or file_uid != uid or file_fingerprint != fingerprint or k != TOP_K:
+            mm.close()
+            return None
+        return tuple(
+            np.frombuffer(mm, dtype=np.int32, count=n * k, offset=TOPK_HEADER.size + part * 4 * n * k).reshape(n, k)
+            for part in range(3)
+        )
+
+    @property
+    def attached(self) -> bool:
+        return self._rows is not None
+
+    def _row_of(self, term_id: int) -> int:
+        rows = self._rows
+        if term_id >= len(rows):  # identifiant provisoire d'un terme écrit depuis (voir MappedVocabulary)
+            term_id = self._vocabulary.stored_id(term_id)
+        return rows[term_id] if 0 <= term_id < len(rows) else -1
+
+    def get_by_id(self, term_id: int, default=None) -> Optional[List[Tuple[str, int]]]:
+        i = self._row_of(term_id)
+        if i < 0:
+            return default
+        return [self._sense(j) for j in range(self._term_row(i)[2], self._term_row(i + 1)[2])]
+
+    def best_by_id(self, term_id: int) -> Tuple[str, int]:
+        """Comme best(), sans recherche dichotomique : une lecture dans la table des identifiants."""
+        i = self._row_of(term_id)
+        if i < 0:
+            return ("", 0)
+        return self._sense(self._term_row(i)[2])
+
+    def top_by_ids(self, term_ids) -> Optional[Tuple]:
+        """
+        Meilleurs sens de plusieurs termes d'un coup : trois tableaux (n, TOP_K) d'indices
+        de sens (-1 : aucun), de poids et d'identifiants de gloses, par poids décroissant.
+        None sans numpy (ou avant attach_vocabulary).
+        """
+        if self._top is None:
+            return None
+        rows_table = np.frombuffer(self._rows, dtype=np.int32)
+        ids = np.asarray(term_ids, dtype=np.int64)
+        if (ids >= len(rows_table)).any():  # identifiants provisoires
+            ids = np.asarray(self._vocabulary.stored_ids(ids.tolist()), dtype=np.int64)
+        known = (ids >= 0) & (ids < len(rows_table))
+        rows = np.full(ids.shape, -1, dtype=np.int64)
+        rows[known] = rows_table[ids[known]]
+        found = rows >= 0
+        senses, weights, glosses = (np.where(found[:, None], table[np.maximum(rows, 0)], fill)
+                                    for table, fill in zip(self._top, (-1, 0, -1)))
+        return senses, weights, glosses
+
+    def sense_at(self, j: int) -> Tuple[str, int]:
+        """Sens d'indice j (ex. un indice renvoyé par top_by_ids)."""
+        return self._sense(j)
+
+
+def _gloss(sense: str) -> str:
+    """Glose d'un raffinement, comparable aux tokens : « chat>Animal » -> « animal »."""
+    return sense.split(">")[1].strip().lower() if ">" in sense else sense.lower()
+
+
+def convert_pickle(pickle_path: Path, index_path: Path) -> SenseIndex:
+    """
+    Convertit un ancien cache senses_cache.pkl en index compact.
+    """
+    with open(pickle_path, "rb") as f:
+        data_map, last_save = pickle.load(f)
+    return SenseIndex.build(index_path, data_map, last_save or datetime.now())
+
+
+class SenseIndexBackend(CacheBackend):
+    """
+    Backend de LexicalSenseStorage : les données sauvegardées deviennent un SenseIndex.
+    L'ancien cache senses_cache.pkl est converti au premier chargement.
+    """
+
+    def __init__(self, path: Path, vocabulary=None):
+        super().__init__(path, vocabulary)
+        self.legacy_path = path.with_name("senses_cache.pkl")
+
+    def load(self) -> Optional[Tuple[SenseIndex, datetime]]:
+        if not self.path.exists() and self.legacy_path.exists():
+            convert_pickle(self.legacy_path, self.path).close()
+        if not self.path.exists():
+            return None
+        index = SenseIndex(self.path)
+        return index, index.last_save
+
+    def save(self, data, last_save: datetime) -> SenseIndex:
+        if isinstance(data, SenseIndex):
+            # Index déjà écrit (construit en flux ou inchangé) : on met juste la date à jour
+            self.touch(last_save)
+            return data
+        return SenseIndex.build(self.path, data, last_save)
+
+    def touch(self, last_save: datetime):
+        with open(self.path, "r+b") as f:
+            fields = list(HEADER.unpack(f.read(HEADER.size)))
+            fields[3] = last_save.timestamp()
+            f.seek(0)
+            f.write(HEADER.pack(*fields))
+
+
+if __name__ == "__main__":
+    # python sense_index.py data/senses_cache.pkl data/senses_index.bin
+    idx = convert_pickle(Path(sys.argv[1]), Path(sys.argv[2]))
+    print(f"{len(idx)} termes écrits dans {idx.path}")
@@ -0,0 +1,141 @@
+# text_tokenizer.py
+
+import re
+from array import array
+from typing import Iterable, List, Optional
+
+from base_store import DATA_REPO
+from vocabulary import MappedVocabulary, Vocabulary, shared_vocabulary
+
+# Apostrophe d'élision : dans un morceau sans espace, la dernière apostrophe qui a au moins
+# un caractère de chaque côté (« l'homme » -> « l » + « homme », « aujourd'hui » -> « aujourd » + « hui »).
+# Elle est remplacée par une espace, ce qui ne change pas les positions dans le texte.
+ELISION_REGEX = re.compile(r"'(?<=\S')(?=[^\s']+'?(?!\S)|'(?!\S))")
+# Caractères retirés des tokens ; un morceau qui n'a que ceux-là disparaît
+CLEAN_REGEX = re.compile(r"[^\w\s'-]+")
+WORD_CHAR_REGEX = re.compile(r"[\w'-]")
+CHUNK_REGEX = re.compile(r"\S+")
+
+# Séparateur des textes d'un lot : c'est un espace pour str.split() et pour les regex
+BATCH_SEPARATOR = "\x1e"
+
+
+def _normalize(text: str):
+    """
+    Tout le texte en quelques opérations globales (aucune boucle Python par token) :
+    minuscules, élisions séparées, ponctuation retirée. Renvoie (texte normalisé, lowered) ;
+    lowered est faux si lower() change la longueur (cas rare comme « İ ») : chaque token
+    sera alors mis en minuscules après nettoyage, comme avant.
+    """
+    lowered = text.lower()
+    is_lowered = len(lowered) == len(text)
+    if not is_lowered:
+        lowered = text
+    if "'" in lowered:
+        lowered = ELISION_REGEX.sub(" ", lowered)
+    return CLEAN_REGEX.sub("", lowered), is_lowered
+
+
+class TokenizedText:
+    """
+    Tokens d'un texte et leurs identifiants dans le vocabulaire.
+    Les positions [début, fin) de chaque token dans le texte d'origine (ponctuation
+    retirée comprise) sont calculées au premier accès à starts / ends / span().
+    """
+
+    __slots__ = ("text", "tokens", "ids", "_starts", "_ends")
+
+    def __init__(self, text: str = "", tokens: Optional[List[str]] = None, ids: Optional[array] = None):
+        self.text = text
+        self.tokens: List[str] = tokens if tokens is not None else []
+        self.ids = ids if ids is not None else array("i")
+        self._starts = self._ends = None
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    @property
+    def starts(self) -> array:
+        if self._starts is None:
+            self._locate()
+        return self._starts
+
+    @property
+    def ends(self) -> array:
+        if self._ends is None:
+            self._locate()
+        return self._ends
+
+    def span(self, i: int):
+        return self.starts[i], self.ends[i]
+
+    def _locate(self):
+        # Même découpage que _normalize, sur le texte d'origine (les élisions gardent les positions)
+        text = ELISION_REGEX.sub(" ", self.text) if "'" in self.text else self.text
+        starts, ends = array("i"), array("i")
+        for m in CHUNK_REGEX.finditer(text):
+            if WORD_CHAR_REGEX.search(m.group()):
+                starts.append(m.start())
+                ends.append(m.end())
+        self._starts, self._ends = starts, ends
+
+    def __getstate__(self):
+        return self.text, self.tokens, self.ids
+
+    def __setstate__(self, state):
+        self.text, self.tokens, self.ids = state
+        self._starts = self._ends = None
+        # Identifiants provisoires d'un autre processus : ils ne valent rien ici
+        if any(i >= MappedVocabulary.TRANSIENT_BASE for i in self.ids):
+            self.ids = array("i", shared_vocabulary(DATA_REPO).intern_all(self.tokens))
+
+
+def _interned(text: str, tokens: List[str], vocabulary: Vocabulary) -> TokenizedText:
+    return TokenizedText(text, tokens, array("i", vocabulary.intern_all(tokens)))
+
+
+def tokenize(text: str, vocabulary: Optional[Vocabulary] = None) -> TokenizedText:
+    """
+    Découpe un texte en un seul passage : tokens en minuscules, ponctuation retirée,
+    élisions séparées, avec leurs identifiants (et leurs positions à la demande).
+    """
+    normalized, lowered = _normalize(text)
+    tokens = normalized.split()
+    if not lowered:
+        tokens = [tk.lower() for tk in tokens]
+    return _interned(text, tokens, shared_vocabulary(DATA_REPO) if vocabulary is None else vocabulary)
+
+
+def tokenize_batch(texts: Iterable[str], vocabulary: Optional[Vocabulary] = None) -> List[TokenizedText]:
+    """
+    Tokenise plusieurs textes (phrases, expressions du lexique...) ensemble :
+    la normalisation est faite une seule fois sur tout le lot.
+    """
+    if vocabulary is None:
+        vocabulary = shared_vocabulary(DATA_REPO)
+    texts = list(texts)
+    # Un texte qui contient lui-même le séparateur est tokenisé à part
+    apart = {i for i, t in enumerate(texts) if BATCH_SEPARATOR in t}
+    normalized, lowered = _normalize(BATCH_SEPARATOR.join("" if i in apart else t for i, t in enumerate(texts)))
+    results = []
+    for i, (text, part) in enumerate(zip(texts, normalized.split(BATCH_SEPARATOR))):
+        if i in apart:
+            results.append(tokenize(text, vocabulary))
+            continue
+        tokens = part.split()
+        if not lowered:
+            tokens = [tk.lower() for tk in tokens]
+        results.append(_interned(text, tokens, vocabulary))
+    return results
+
+
+def custom_tokenize(sentence: str) -> List[str]:
+    """
+    Découpe une phrase en tokens (minuscules, ponctuation retirée, élisions séparées).
+    Partagé entre l'analyseur et la construction de l'automate des mots composés,
+    pour que les deux découpent les expressions de la même façon.
+    """
+    return tokenize(sentence).tokens
@@ -0,0 +1,412 @@
+# vocabulary.py
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+try:
+    import fcntl  # verrou entre processus (POSIX)
+except ImportError:  # Windows : seul le verrou entre threads s'applique
+    fcntl = None
+
+
+class Vocabulary:
+    """
+    Table d'internement des termes : chaque terme distinct reçoit un identifiant entier
+    stable (dans l'ordre de première apparition). Les chaînes sont aussi internées
+    (sys.intern) : toutes les occurrences d'un même token partagent un seul objet,
+    et les recherches dans les dictionnaires indexés par token se font par identité.
+    """
+
+    UNKNOWN = -1
+
+    def __init__(self, terms: Iterable[str] = ()):
+        self._ids: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._lock = threading.Lock()
+        for term in terms:
+            self.intern(term)
+
+    def intern(self, term: str) -> int:
+        i = self._ids.get(term)
+        if i is None:
+            with self._lock:
+                i = self._ids.get(term)
+                if i is None:
+                    term = sys.intern(term)
+                    i = self._ids[term] = len(self._terms)
+                    self._terms.append(term)
+        return i
+
+    def intern_all(self, terms: Iterable[str]) -> List[int]:
+        # Les termes déjà connus sont résolus d'un bloc, sans boucle Python
+        terms = list(terms)
+        ids = list(map(self._ids.get, terms))
+        if None in ids:
+            ids = [self.intern(term) if i is None else i for term, i in zip(terms, ids)]
+        return ids
+
+    def persist_all(self, terms: Iterable[str]) -> List[int]:
+        """Identifiants durables (ici tous le sont), pour les tables et les caches indexés par identifiant."""
+        return self.intern_all(terms)
+
+    def persistent(self, term_id: int) -> int:
+        return term_id
+
+    def stored_id(self, term_id: int) -> int:
+        return term_id
+
+    def stored_ids(self, term_ids):
+        return term_ids
+
+    def terms(self, term_ids: Iterable[int]) -> List[str]:
+        """Chaînes correspondant aux identifiants."""
+        return list(map(self._terms.__getitem__, term_ids))
+
+    def lookup(self, term: str) -> int:
+        """Identifiant du terme, ou UNKNOWN s'il n'a jamais été interné."""
+        return self._ids.get(term, self.UNKNOWN)
+
+    def term(self, term_id: int) -> str:
+        return self._terms[term_id]
+
+    def __contains__(self, term: str) -> bool:
+        return self.lookup(term) != self.UNKNOWN
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+
+# Format du fichier (little-endian) :
+#   en-tête | offsets des termes (Q) | longueurs (I) | table de hachage (I) | réserve | journal
+# Les n premiers termes forment la partie figée, lue en mmap : la table de hachage
+# (adressage ouvert, crc32 du terme en UTF-8) contient id + 1, 0 pour une case vide.
+# Les termes ajoutés ensuite sont écrits à la fin du fichier (journal) :
+# longueur (I) puis le terme. Leur identifiant est n + leur rang dans le journal.
+MAGIC = b"JDMVOCB1"
+HEADER = struct.Struct("<8s16sIIQQQQ")  # magic, uid, n_terms, n_buckets, off_offsets, off_lengths, off_buckets, off_pool
+RECORD = struct.Struct("<I")
+
+
+def _write_frozen(path: Path, uid: bytes, terms: List[bytes]):
+    """Écrit un fichier figé contenant terms (dans l'ordre des identifiants), de façon atomique."""
+    n = len(terms)
+    n_buckets = 1
+    while n_buckets < 2 * n:
+        n_buckets *= 2
+    buckets = [0] * n_buckets
+    mask = n_buckets - 1
+    for i, raw in enumerate(terms):
+        h = zlib.crc32(raw) & mask
+        while buckets[h]:
+            h = (h + 1) & mask
+        buckets[h] = i + 1
+    off_offsets = HEADER.size
+    off_lengths = off_offsets + 8 * n
+    off_buckets = off_lengths + 4 * n
+    off_pool = off_buckets + 4 * n_buckets
+    offsets, pos = [], 0
+    for raw in terms:
+        offsets.append(pos)
+        pos += len(raw)
+
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as out:
+        out.write(HEADER.pack(MAGIC, uid, n, n_buckets, off_offsets, off_lengths, off_buckets, off_pool))
+        out.write(struct.pack(f"<{n}Q", *offsets))
+        out.write(struct.pack(f"<{n}I", *map(len, terms)))
+        out.write(struct.pack(f"<{n_buckets}I", *buckets))
+        for raw in terms:
+            out.write(raw)
+        out.flush()
+        os.fsync(out.fileno())
+    return tmp
+
+
+class MappedVocabulary(Vocabulary):
+    """
+    Vocabulaire persistant, partagé par toutes les ressources lexicales d'un dossier data/.
+
+    La partie figée est lue en mmap : ni dictionnaire ni chaînes Python pour ces termes,
+    les pages sont partagées entre processus. Seuls les termes ajoutés depuis le dernier
+    compactage sont en mémoire. Chaque ajout est écrit dans le journal sous verrou
+    (threads et processus) : deux processus ne donnent jamais deux identifiants
+    au même terme. Le journal est fusionné dans la partie figée (compact()) quand il
+    dépasse la taille de celle-ci ; le fichier est alors remplacé atomiquement
+    et les autres processus le rouvrent à leur prochain ajout.
+
+    uid identifie le fichier : les tables indexées par identifiant (index des sens,
+    automate des mots composés) le mémorisent pour savoir si elles sont encore valables.
+
+    intern / intern_all ne touchent pas au fichier : un terme inconnu (token d'un texte
+    analysé, faute de frappe, nombre...) reçoit un identifiant provisoire, à partir de
+    TRANSIENT_BASE, gardé en mémoire par ce processus seulement. Il n'est écrit dans le
+    fichier (persist_all, persistent) que si une table ou un cache enregistre une clé
+    construite à partir de lui ; stored_id donne l'identifiant durable d'un identifiant
+    provisoire, sans rien écrire. Les tables indexées par identifiant ignorent les
+    identifiants provisoires (au-delà de leur taille).
+    """
+
+    COMPACT_MIN = 4096  # termes dans le journal avant le premier compactage
+    TRANSIENT_BASE = 1 << 30  # premiers identifiants provisoires (jamais atteint par le fichier)
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._transient_ids: Dict[str, int] = {}
+        self._transient_terms: List[str] = []
+        self._pid = None
+        self._file = None
+        self._mm = None
+        self._unsynced = False
+        self._open()
+
+    # Ouverture
+
+    def _open(self):
+        if not self.path.exists():
+            tmp = _write_frozen(self.path, uuid.uuid4().bytes, [])
+            try:
+                os.link(tmp, self.path)  # échoue si un autre processus l'a créé entre-temps
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(tmp)
+        # L'ancien mmap n'est pas fermé : une recherche en cours dans un autre thread peut
+        # encore le lire (les identifiants sont les mêmes dans le nouveau fichier).
+        if self._file is not None:
+            self._file.close()
+        self._pid = os.getpid()
+        self._file = open(self.path, "r+b")
+        mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.uid, n_frozen, n_buckets, off_offsets, off_lengths, off_buckets, off_pool = \
+            HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a vocabulary file")
+        view = memoryview(mm)
+        self._mm = mm
+        self._offsets = view[off_offsets:off_lengths].cast("Q")
+        self._lengths = view[off_lengths:off_buckets].cast("I")
+        self._buckets = view[off_buckets:off_pool].cast("I")
+        self._mask = n_buckets - 1
+        self._off_pool = off_pool
+        self._n_frozen = n_frozen
+        pool_size = self._offsets[-1] + self._lengths[-1] if self._n_frozen else 0
+        self._log_end = off_pool + pool_size
+        # Journal : termes ajoutés depuis le dernier compactage
+        self._ids = {}
+        self._terms = []
+        self._catch_up()
+
+    def _catch_up(self):
+        """Lit les termes ajoutés au journal par d'autres processus."""
+        self._file.seek(self._log_end)
+        data = self._file.read()
+        pos = 0
+        while pos + RECORD.size <= len(data):
+            (length,) = RECORD.unpack_from(data, pos)
+            if pos + RECORD.size + length > len(data):
+                break  # écriture en cours d'un autre processus (hors verrou, ne devrait pas arriver)
+            term = sys.intern(data[pos + RECORD.size:pos + RECORD.size + length].decode("utf-8"))
+            self._terms.append(term)
+            self._ids[term] = self._n_frozen + len(self._terms) - 1
+            pos += RECORD.size + length
+        self._log_end += pos
+
+    @contextmanager
+    def _exclusive(self):
+        """Verrou des ajouts ; rouvre le fichier s'il a été compacté ou si l'on est dans un enfant (fork)."""
+        with self._lock:
+            while True:
+                if self._pid != os.getpid():
+                    self._open()
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+                try:
+                    replaced = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+                except FileNotFoundError:
+                    replaced = True
+                if not replaced:
+                    break
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                self._open()
+            try:
+                self._catch_up()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    # Recherche
+
+    def _raw(self, term_id: int) -> bytes:
+        start = self._off_pool + self._offsets[term_id]
+        return self._mm[start:start + self._lengths[term_id]]
+
+    def _find_frozen(self, raw: bytes) -> int:
+        if not self._n_frozen:
+            return self.UNKNOWN
+        buckets, mask = self._buckets, self._mask
+        h = zlib.crc32(raw) & mask
+        while True:
+            slot = buckets[h]
+            if not slot:
+                return self.UNKNOWN
+            if self._lengths[slot - 1] == len(raw) and self._raw(slot - 1) == raw:
+                return slot - 1
+            h = (h + 1) & mask
+
+    def lookup(self, term: str) -> int:
+        i = self._find_frozen(term.encode("utf-8"))
+        if i < 0:
+            i = self._ids.get(term, self.UNKNOWN)
+        return i
+
+    def term(self, term_id: int) -> str:
+        if term_id >= self.TRANSIENT_BASE:
+            return self._transient_terms[term_id - self.TRANSIENT_BASE]
+        if term_id < self._n_frozen:
+            return self._raw(term_id).decode("utf-8")
+        return self._terms[term_id - self._n_frozen]
+
+    def terms(self, term_ids: Iterable[int]) -> List[str]:
+        return [self.term(i) for i in term_ids]
+
+    def __len__(self) -> int:
+        """Nombre de termes durables (les identifiants provisoires ne comptent pas)."""
+        return self._n_frozen + len(self._terms)
+
+    # Ajout
+
+    def intern(self, term: str) -> int:
+        return self.intern_all((term,))[0]
+
+    def intern_all(self, terms: Iterable[str]) -> List[int]:
+        """Identifiants des termes ; les termes inconnus du fichier reçoivent un identifiant provisoire."""
+        terms = list(terms)
+        ids = [self.lookup(term) for term in terms]
+        if self.UNKNOWN not in ids:
+            return ids
+        with self._lock:
+            for k, term in enumerate(terms):
+                if ids[k] >= 0:
+                    continue
+                i = self._transient_ids.get(term)
+                if i is None:
+                    term = sys.intern(term)
+                    i = self._transient_ids[term] = self.TRANSIENT_BASE + len(self._transient_terms)
+                    self._transient_terms.append(term)
+                ids[k] = i
+        return ids
+
+    def persistent(self, term_id: int) -> int:
+        """Identifiant durable du terme, écrit dans le journal si l'identifiant est provisoire."""
+        if term_id < self.TRANSIENT_BASE:
+            return term_id
+        return self.persist_all((self.term(term_id),))[0]
+
+    def stored_id(self, term_id: int) -> int:
+        """Identifiant durable du terme s'il en a un (UNKNOWN sinon), sans rien écrire."""
+        if term_id < self.TRANSIENT_BASE:
+            return term_id
+        return self.lookup(self.term(term_id))
+
+    def stored_ids(self, term_ids):
+        """
+        Identifiants à utiliser dans une table indexée par identifiant : un identifiant
+        provisoire dont le terme a été écrit depuis (ex. par la construction de la table) est traduit.
+        """
+        if not self._transient_terms:
+            return term_ids
+        base = self.TRANSIENT_BASE
+        return [i if i < base else self.stored_id(i) for i in term_ids]
+
+    def persist_all(self, terms: Iterable[str]) -> List[int]:
+        """
+        Identifiants durables des termes : les termes inconnus sont écrits dans le journal
+        (sous verrou). Les ajouts deviennent sûrs après sync().
+        """
+        terms = list(terms)
+        ids = [self.lookup(term) for term in terms]
+        if self.UNKNOWN not in ids:
+            return ids
+        with self._exclusive():
+            records = []
+            for k, term in enumerate(terms):
+                if ids[k] >= 0:
+                    continue
+                i = self.lookup(term)  # ajouté entre-temps (autre thread, autre processus, doublon)
+                if i < 0:
+                    raw = term.encode("utf-8")
+                    records.append(RECORD.pack(len(raw)) + raw)
+                    term = sys.intern(term)
+                    self._terms.append(term)
+                    i = self._ids[term] = self._n_frozen + len(self._terms) - 1
+                    # Le terme a maintenant un identifiant durable ; l'ancien provisoire reste lisible (term)
+                    self._transient_ids.pop(term, None)
+                ids[k] = i
+            if records:
+                payload = b"".join(records)
+                self._file.seek(0, os.SEEK_END)
+                self._file.write(payload)
+                self._file.flush()
+                self._log_end += len(payload)
+                self._unsynced = True
+        return ids
+
+    def sync(self):
+        """
+        Rend les ajouts durables (à appeler avant d'écrire des données indexées par identifiant)
+        et compacte le fichier si le journal est devenu trop grand.
+        """
+        if not self._unsynced or self._pid != os.getpid():
+            return
+        with self._exclusive():
+            os.fsync(self._file.fileno())
+            self._unsynced = False
+            if len(self._terms) > max(self.COMPACT_MIN, self._n_frozen):
+                self._compact()
+
+    def compact(self):
+        with self._exclusive():
+            self._compact()
+
+    def _compact(self):
+        terms = [self._raw(i) for i in range(self._n_frozen)]
+        terms.extend(term.encode("utf-8") for term in self._terms)
+        tmp = _write_frozen(self.path, self.uid, terms)
+        os.replace(tmp, self.path)
+        # Le verrou est tenu sur l'ancien fichier : les autres processus le voient remplacé
+        self._open()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+VOCABULARY_FILENAME = "vocabulary.bin"
+_SHARED: Dict[str, MappedVocabulary] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_vocabulary(data_dir: Path) -> MappedVocabulary:
+    """Le vocabulaire d'un dossier de données, ouvert une seule fois par processus."""
+    key = os.path.abspath(data_dir)
+    vocabulary = _SHARED.get(key)
+    if vocabulary is None:
+        with _SHARED_LOCK:
+            vocabulary = _SHARED.get(key)
+            if vocabulary is None:
+                os.makedirs(key, exist_ok=True)
+                vocabulary = _SHARED[key] = MappedVocabulary(Path(key) / VOCABULARY_FILENAME)
+    return vocabulary
@@ -0,0 +1,264 @@
+# warmup.py : préchargement des caches JDM et POS, et instantanés des caches pour la production
+#
+#   python warmup.py prefetch corpus.txt autre.txt --frequencies freq.tsv --min-count 2
+#   python warmup.py snapshot caches.tar.gz
+#   python warmup.py restore caches.tar.gz          # puis ANALYSEUR_OFFLINE=1 sur le nœud
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import tarfile
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import base_store
+from jdm_fetcher import JDMFetcher
+from jdm_api import JDMApi
+from semantic_pipeline import GlobalAnalyzer
+from text_tokenizer import tokenize_batch
+from vocabulary import VOCABULARY_FILENAME, shared_vocabulary
+
+PROGRESS_FILENAME = "warmup_progress.json"
+WORDS_FILENAME = "warmup_words.txt"
+MANIFEST_NAME = "manifest.json"
+DOCUMENTS_PER_BATCH = 256
+# Fichiers d'un dossier data/ repris dans un instantané (les dumps téléchargés n'en font pas partie)
+SNAPSHOT_SUFFIXES = (".sqlite", ".pkl", ".bin", ".ids", ".topk")
+# Anciens caches déjà migrés : inutiles si le fichier qui les remplace est présent
+LEGACY_FILES = {"senses_cache.pkl": "senses_index.bin"}
+
+
+def _data_dir() -> Path:
+    return base_store.DATA_REPO
+
+
+# Collecte du vocabulaire
+
+def collect_vocabulary(corpus_paths: Iterable[Path] = (), frequency_lists: Iterable[Path] = (),
+                       min_count: int = 1, top: Optional[int] = None) -> List[str]:
+    """
+    Mots distincts des corpus (tokenisés comme pendant l'analyse) et des listes de fréquences
+    (« mot<TAB>nombre » par ligne, ou un mot seul), du plus fréquent au moins fréquent :
+    un préchargement interrompu a déjà traité les mots les plus utiles.
+    """
+    counts = Counter()
+    for path in corpus_paths:
+        batch = []
+        for document in GlobalAnalyzer._iter_documents(Path(path)):
+            batch.append(document)
+            if len(batch) == DOCUMENTS_PER_BATCH:
+                counts.update(tk for tokenized in tokenize_batch(batch) for tk in tokenized.tokens)
+                batch = []
+        counts.update(tk for tokenized in tokenize_batch(batch) for tk in tokenized.tokens)
+    for path in frequency_lists:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if not fields[0].strip():
+                    continue
+                count = int(fields[1]) if len(fields) > 1 and fields[1].strip().isdigit() else 1
+                # Même normalisation que le texte analysé (minuscules, ponctuation retirée)
+                for tk in tokenize_batch([fields[0]])[0].tokens:
+                    counts[tk] += count
+    words = [w for w, n in counts.most_common() if n >= min_count]
+    return words[:top] if top is not None else words
+
+
+# Préchargement avec reprise
+
+def _sources_fingerprint(corpus_paths, frequency_lists, min_count, top) -> str:
+    h = hashlib.sha1()
+    for path in list(corpus_paths) + list(frequency_lists):
+        st = os.stat(path)
+        h.update(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    h.update(f"{min_count}|{top}".encode())
+    return h.hexdigest()
+
+
+def _read_progress(path: Path) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_progress(path: Path, progress: dict):
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+def prefetch(corpus_paths: Iterable[Path] = (), frequency_lists: Iterable[Path] = (), min_count: int = 1,
+             top: Optional[int] = None, batch_size: int = 500, workers: int = 16,
+             requests_per_second: float = 10.0, restart: bool = False):
+    """
+    Remplit les caches JDM (rezo-dump) et de l'API JDM (POS, sens, genre) pour tout le vocabulaire des sources.
+
+    Les mots sont traités par lots de batch_size, chaque lot téléchargé en parallèle
+    (workers threads) et écrit en un seul commit. La progression est enregistrée dans
+    data/ après chaque lot : relancée avec les mêmes sources, la commande reprend au lot
+    suivant sans relire les corpus. Les mots dont la requête a échoué ne sont pas stockés ;
+    un nouveau passage (restart=True) ne demande que ceux-là.
+    """
+    corpus_paths, frequency_lists = list(corpus_paths), list(frequency_lists)
+    data_dir = _data_dir()
+    data_dir.mkdir(parents=True, exist_ok=True)
+    progress_path, words_path = data_dir / PROGRESS_FILENAME, data_dir / WORDS_FILENAME
+    fingerprint = _sources_fingerprint(corpus_paths, frequency_lists, min_count, top)
+
+    progress = {} if restart else _read_progress(progress_path)
+    if progress.get("fingerprint") == fingerprint and words_path.exists():
+        words = words_path.read_text(encoding="utf-8").split("\n")
+        print(f"Reprise : {progress['done']}/{len(words)} mots déjà traités")
+    else:
+        words = collect_vocabulary(corpus_paths, frequency_lists, min_count, top)
+        words_path.write_text("\n".join(words), encoding="utf-8")
+        progress = {"fingerprint": fingerprint, "done": 0, "total": len(words)}
+        _write_progress(progress_path, progress)
+        print(f"{len(words)} mots distincts à précharger")
+
+    jdm = JDMFetcher(max_workers=workers, requests_per_second=requests_per_second)
+    api = JDMApi(max_workers=workers)
+    start = time.monotonic()
+    done_at_start = progress["done"]
+    for k in range(progress["done"], len(words), batch_size):
+        batch = words[k:k + batch_size]
+        jdm.fetch_entries_for_words(batch)
+        api.fetch_for_words(batch)
+        progress["done"] = k + len(batch)
+        _write_progress(progress_path, progress)
+        rate = (progress["done"] - done_at_start) / max(time.monotonic() - start, 1e-9)
+        print(f"{progress['done']}/{len(words)} mots ({rate:.0f} mots/s)")
+
+
+# Instantanés
+
+def _snapshot_files(data_dir: Path) -> List[Path]:
+    files = []
+    for path in sorted(data_dir.iterdir()):
+        if not path.is_file() or path.suffix not in SNAPSHOT_SUFFIXES:
+            continue
+        if path.suffix == ".pkl" and path.with_suffix(".sqlite").exists():
+            continue  # ancien cache pickle, migré dans la base SQLite
+        if path.name in LEGACY_FILES and (data_dir / LEGACY_FILES[path.name]).exists():
+            continue
+        files.append(path)
+    return files
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def build_snapshot(out_path: Path, data_dir: Optional[Path] = None) -> dict:
+    """
+    Archive tar.gz des caches de data_dir, avec un manifeste (fichiers, tailles, sha256) :
+    un nœud qui la restaure démarre avec des caches chauds, sans accès réseau.
+    Les bases SQLite sont copiées par l'API de sauvegarde (copie cohérente même si
+    une autre analyse écrit pendant ce temps) ; le vocabulaire est synchronisé d'abord.
+    """
+    data_dir = Path(data_dir) if data_dir is not None else _data_dir()
+    shared_vocabulary(data_dir).sync()
+    manifest = {"created": datetime.now().isoformat(), "files": {}}
+    with tempfile.TemporaryDirectory() as tmp, tarfile.open(out_path, "w:gz") as tar:
+        for path in _snapshot_files(data_dir):
+            source = path
+            if path.suffix == ".sqlite":
+                source = Path(tmp) / path.name
+                src, dst = sqlite3.connect(path), sqlite3.connect(source)
+                try:
+                    src.backup(dst)
+                    dst.execute("PRAGMA journal_mode=DELETE")  # un seul fichier, sans -wal
+                finally:
+                    src.close()
+                    dst.close()
+            manifest["files"][path.name] = {"size": source.stat().st_size, "sha256": _sha256(source)}
+            tar.add(source, arcname=path.name)
+        raw = json.dumps(manifest, indent=2).encode("utf-8")
+        manifest_path = Path(tmp) / MANIFEST_NAME
+        manifest_path.write_bytes(raw)
+        tar.add(manifest_path, arcname=MANIFEST_NAME)
+    return manifest
+
+
+def restore_snapshot(snapshot_path: Path, data_dir: Optional[Path] = None, force: bool = False) -> dict:
+    """
+    Installe un instantané dans data_dir, après vérification des sommes sha256.
+    Refuse d'écraser des caches existants sauf avec force=True (les tables indexées par
+    identifiant n'ont de sens qu'avec le vocabulaire de l'instantané).
+    """
+    data_dir = Path(data_dir) if data_dir is not None else _data_dir()
+    data_dir.mkdir(parents=True, exist_ok=True)
+    with tarfile.open(snapshot_path, "r:gz") as tar:
+        manifest = json.load(tar.extractfile(MANIFEST_NAME))
+        names = list(manifest["files"])
+        if VOCABULARY_FILENAME not in names:
+            raise ValueError(f"{snapshot_path}: snapshot has no {VOCABULARY_FILENAME}")
+        existing = [name for name in names if (data_dir / name).exists()]
+        if existing and not force:
+            raise FileExistsError(f"{data_dir} already contains {', '.join(existing)} (use force)")
+        with tempfile.TemporaryDirectory(dir=data_dir) as tmp:
+            for name in names:
+                member = tar.getmember(name)
+                if not member.isfile() or os.path.basename(name) != name:
+                    raise ValueError(f"{snapshot_path}: unexpected member {name!r}")
+                tar.extract(member, tmp)
+                if _sha256(Path(tmp) / name) != manifest["files"][name]["sha256"]:
+                    raise ValueError(f"{snapshot_path}: checksum mismatch for {name}")
+            for name in names:
+                for stale in (name + "-wal", name + "-shm"):
+                    if (data_dir / stale).exists():
+                        os.unlink(data_dir / stale)
+                os.replace(Path(tmp) / name, data_dir / name)
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Préchargement des caches et instantanés pour la production")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("prefetch", help="remplit les caches JDM et POS pour le vocabulaire d'un corpus")
+    p.add_argument("corpus", nargs="*", type=Path, help="fichiers texte (documents séparés par une ligne vide)")
+    p.add_argument("--frequencies", nargs="*", type=Path, default=[], help="listes « mot<TAB>nombre »")
+    p.add_argument("--min-count", type=int, default=1)
+    p.add_argument("--top", type=int, default=None, help="seulement les N mots les plus fréquents")
+    p.add_argument("--batch-size", type=int, default=500)
+    p.add_argument("--workers", type=int, default=16)
+    p.add_argument("--rate", type=float, default=10.0, help="requêtes par seconde vers chaque hôte (0 : sans limite)")
+    p.add_argument("--restart", action="store_true", help="ignore la progression enregistrée")
+
+    s = sub.add_parser("snapshot", help="archive les caches de data/ (tar.gz)")
+    s.add_argument("out", type=Path)
+
+    r = sub.add_parser("restore", help="installe un instantané dans data/")
+    r.add_argument("snapshot", type=Path)
+    r.add_argument("--force", action="store_true", help="remplace les caches existants")
+
+    args = parser.parse_args(argv)
+    if args.command == "prefetch":
+        if not args.corpus and not args.frequencies:
+            parser.error("prefetch needs a corpus or a frequency list")
+        prefetch(args.corpus, args.frequencies, args.min_count, args.top, args.batch_size,
+                 args.workers, args.rate, args.restart)
+    elif args.command == "snapshot":
+        manifest = build_snapshot(args.out)
+        print(f"{len(manifest['files'])} fichiers dans {args.out}")
+    else:
+        manifest = restore_snapshot(args.snapshot, force=args.force)
+        print(f"{len(manifest['files'])} fichiers restaurés (instantané du {manifest['created']})")
+
+
+if __name__ == "__main__":
+    main()